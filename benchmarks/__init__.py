@@ -0,0 +1 @@
+"""Performance benchmarks for RiskLoggr."""
\ No newline at end of file
@@ -0,0 +1,76 @@
+import csv
+import json
+import random
+from typing import Iterator
+
+from src.classification.backends import FakeBackend
+from src.frameworks.framework_router import classify_across_frameworks, format_framework_tags
+from src.models import RiskClassification
+
+# Building blocks of synthetic incident descriptions
+_ACTORS = ["An employee", "A contractor", "A third-party vendor", "An external attacker", "A branch teller",
+           "The payments team", "A trader", "The IT operations team", "A customer", "The back office"]
+_EVENTS = [
+    "sent a file containing personal data to the wrong recipient",
+    "approved a wire transfer without the required second signature",
+    "deployed an untested change that caused a system outage",
+    "was targeted by a phishing email and disclosed credentials",
+    "failed to reconcile the general ledger before the financial reporting deadline",
+    "lost a laptop with unencrypted customer records",
+    "entered a trade with the wrong notional amount",
+    "bypassed access control to view confidential salary data",
+    "missed a regulatory filing deadline",
+    "reported water damage in the primary data center",
+]
+_DETAILS = [
+    "The issue was detected by internal audit two weeks later.",
+    "Customers complained on social media and the press picked up the story.",
+    "The regulator has requested a report on the breach.",
+    "Losses are estimated at {amount} EUR.",
+    "The root cause appears to be inadequate training and missing segregation of duties.",
+    "Monitoring did not raise an alert because the threshold was misconfigured.",
+    "The incident affected {count} clients across {regions} regions.",
+    "Business continuity plans were activated and service was restored after {hours} hours.",
+]
+
+
+def generate_incidents(count: int, seed: int = 42) -> Iterator[str]:
+    """Yields count reproducible synthetic incident descriptions."""
+    rng = random.Random(seed)
+    for index in range(count):
+        details = " ".join(rng.sample(_DETAILS, rng.randint(1, 4)))
+        yield (
+            f"Incident {index}: {rng.choice(_ACTORS)} {rng.choice(_EVENTS)}. "
+            + details.format(amount=rng.randint(1, 500) * 1000, count=rng.randint(2, 5000),
+                             regions=rng.randint(1, 12), hours=rng.randint(1, 72))
+        )
+
+def generate_records(count: int, seed: int = 42) -> Iterator[dict]:
+    """
+    Yields count classification records as produced by the classifier, with framework tags.
+
+    Classifications come from the deterministic FakeBackend response for each incident,
+    so a given (count, seed) always produces the same corpus.
+    """
+    for incident_description in generate_incidents(count, seed):
+        record = json.loads(FakeBackend.fake_response(incident_description))
+        record["incident_description"] = incident_description
+        classification = RiskClassification.model_construct(**record)
+        record["framework_tags"] = format_framework_tags(classify_across_frameworks(classification))
+        yield record
+
+def write_corpus_csv(path: str, records: Iterator[dict]) -> int:
+    """Writes records in the legacy CSV import format and returns the number of rows."""
+    columns = ["incident_description", "basel_ii_category", "severity_score", "root_cause", "control_recommendations",
+               "framework_tags", "inherent_risk", "residual_risk", "likelihood", "impact_type"]
+    count = 0
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(columns)
+        for record in records:
+            writer.writerow([
+                json.dumps(record[column]) if isinstance(record[column], list) else record[column]
+                for column in columns
+            ])
+            count += 1
+    return count
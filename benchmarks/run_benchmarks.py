@@ -0,0 +1,267 @@
+import argparse
+import contextlib
+import itertools
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Callable, Optional
+
+# The benchmarks must never touch the real database, cache or API: point everything at a
+# scratch directory and the instant fake LLM before any src module reads the settings.
+WORK_DIRECTORY = tempfile.mkdtemp(prefix="riskloggr-bench-")
+os.environ["LLM_BACKEND"] = "fake"
+os.environ["FAKE_LLM_PROFILE"] = "instant"
+os.environ["CACHE_DATABASE_FILE"] = os.path.join(WORK_DIRECTORY, "cache.db")
+os.environ["SIMILARITY_THRESHOLD"] = "2" # Measure the LLM path, not near-duplicate reuse
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.corpus import generate_incidents, generate_records, write_corpus_csv
+from src.classification.batch import classify_incidents
+from src.classification.preprocessing import count_tokens
+from src.classification.prompts import PROMPT_TEMPLATES
+from src.data_parser.csv_import import import_legacy_csv
+from src.database import database, rollups
+from src.database.connection import close_all_pools
+from src.frameworks.framework_router import classify_across_frameworks
+from src.models import ClassificationBatch, ClassificationRecord, RiskClassification
+
+database.DATABASE_FILE = os.path.join(WORK_DIRECTORY, "riskloggr.db")
+
+DEFAULT_THRESHOLDS = os.path.join(os.path.dirname(__file__), "thresholds.json")
+INSERT_CHUNK_SIZE = 10000
+SAVE_SAMPLES = 50
+READ_REPEATS = 3 # Read paths report the best of this many runs
+# Absolute differences below these are timer noise and never count as a regression
+NOISE_FLOOR = {"ms": 1.0, "s": 0.005, "us": 1.0}
+
+
+def _metric(value: float, unit: str, better: str) -> dict:
+    return {"value": round(value, 4), "unit": unit, "better": better}
+
+def _throughput(count: int, seconds: float) -> dict:
+    return _metric(count / seconds if seconds else float("inf"), "ops/s", "higher")
+
+def _seconds(function: Callable) -> float:
+    start = time.perf_counter()
+    function()
+    return time.perf_counter() - start
+
+def _best_seconds(function: Callable) -> float:
+    return min(_seconds(function) for _ in range(READ_REPEATS))
+
+def _use_database(name: str) -> None:
+    database.DATABASE_FILE = os.path.join(WORK_DIRECTORY, name)
+    database.initialize_database()
+
+
+def bench_framework_mapping(records: list[dict]) -> dict:
+    classifications = [RiskClassification.model_construct(**record) for record in records]
+    seconds = _seconds(lambda: [classify_across_frameworks(classification) for classification in classifications])
+    return {"classify_across_frameworks.throughput": _throughput(len(classifications), seconds)}
+
+def bench_model_construction(records: list[dict]) -> dict:
+    validated = _seconds(lambda: [RiskClassification.model_validate(record) for record in records])
+    constructed = _seconds(lambda: [RiskClassification.model_construct(**record) for record in records])
+    # Stored rows as the database returns them, for the trusted compact constructors
+    rows = [
+        {**record, "id": index, "timestamp": None, "control_recommendations": "\n".join(record["control_recommendations"]),
+         "framework_tags": json.dumps(record["framework_tags"]), "impact_type": json.dumps(record["impact_type"])}
+        for index, record in enumerate(records, start=1)
+    ]
+    compact = _seconds(lambda: [ClassificationRecord.from_row(row) for row in rows])
+    columnar = _seconds(lambda: ClassificationBatch.from_rows(rows))
+    return {
+        "RiskClassification.model_validate.per_object": _metric(validated / len(records) * 1e6, "us", "lower"),
+        "RiskClassification.model_construct.per_object": _metric(constructed / len(records) * 1e6, "us", "lower"),
+        "ClassificationRecord.from_row.per_object": _metric(compact / len(records) * 1e6, "us", "lower"),
+        "ClassificationBatch.from_rows.per_row": _metric(columnar / len(records) * 1e6, "us", "lower"),
+    }
+
+def bench_prompt_size(count: int, seed: int) -> dict:
+    """Mean prompt tokens per classification for every template, schema included (it is billed as input)."""
+    incidents = list(generate_incidents(count, seed + 1))
+    results = {}
+    for name, template in PROMPT_TEMPLATES.items():
+        schema_tokens = count_tokens(json.dumps(template.response_format, separators=(",", ":"))) if template.response_format else 0
+        tokens = [
+            sum(count_tokens(message["content"]) for message in template.messages(incident)) + schema_tokens
+            for incident in incidents
+        ]
+        results[f"classification_prompt.tokens@{name}"] = _metric(statistics.mean(tokens), "tokens", "lower")
+    return results
+
+def bench_batch_classification(count: int, seed: int) -> dict:
+    incidents = list(generate_incidents(count, seed + 1))
+    seconds = _seconds(lambda: [result for result in classify_incidents(
+        incidents, requests_per_minute=10 ** 9, tokens_per_minute=10 ** 12
+    )])
+    return {"classify_incidents.fake_backend.throughput": _throughput(count, seconds)}
+
+def bench_csv_import(count: int, seed: int) -> dict:
+    path = os.path.join(WORK_DIRECTORY, "corpus.csv")
+    write_corpus_csv(path, generate_records(count, seed + 2))
+    _use_database("csv_import.db")
+    start = time.perf_counter()
+    report = import_legacy_csv(path)
+    seconds = time.perf_counter() - start
+    if report.imported != count:
+        raise RuntimeError(f"CSV import rejected {count - report.imported} synthetic rows")
+    return {"import_legacy_csv.throughput": _throughput(count, seconds)}
+
+def _read_dashboard_rollups() -> None:
+    """Reads every trend aggregate the dashboard shows, as load_trend_rollups in the UI does."""
+    rollups.get_category_trend(granularity="month")
+    rollups.get_severity_histogram()
+    rollups.get_framework_tag_frequencies(limit=15)
+    rollups.get_risk_transitions()
+
+def bench_table_sizes(sizes: list[int], seed: int) -> dict:
+    """Grows one database through every size and measures the read/write paths at each."""
+    _use_database("sizes.db")
+    results = {}
+    stored = 0
+    records = generate_records(max(sizes), seed)
+    probe = RiskClassification.model_validate(next(generate_records(1, seed + 3)))
+    for size in sorted(sizes):
+        while stored < size:
+            chunk = list(itertools.islice(records, min(INSERT_CHUNK_SIZE, size - stored)))
+            database.bulk_insert_classifications(chunk)
+            stored += len(chunk)
+
+        latencies = []
+        for _ in range(SAVE_SAMPLES):
+            latencies.append(_seconds(lambda: database.save_classification_result(probe.incident_description, probe)))
+        stored += SAVE_SAMPLES
+        latencies.sort()
+        results[f"save_classification_result.median_ms@{size}"] = _metric(statistics.median(latencies) * 1000, "ms", "lower")
+        results[f"save_classification_result.p95_ms@{size}"] = _metric(latencies[int(len(latencies) * 0.95) - 1] * 1000, "ms", "lower")
+        results[f"get_all_classifications.seconds@{size}"] = _metric(_best_seconds(database.get_all_classifications), "s", "lower")
+        results[f"load_classification_batch.seconds@{size}"] = _metric(_best_seconds(database.load_classification_batch), "s", "lower")
+        results[f"get_heatmap_cells.seconds@{size}"] = _metric(_best_seconds(database.get_heatmap_cells), "s", "lower")
+        # The dashboard reads the rollup tables; these are the reads the UI makes
+        results[f"get_likelihood_impact_cells.seconds@{size}"] = _metric(
+            _best_seconds(lambda: rollups.get_likelihood_impact_cells(samples_per_cell=3)), "s", "lower"
+        )
+        results[f"dashboard_rollups.seconds@{size}"] = _metric(_best_seconds(_read_dashboard_rollups), "s", "lower")
+        results[f"query_classifications.first_page_ms@{size}"] = _metric(
+            _best_seconds(lambda: database.query_classifications(limit=100)) * 1000, "ms", "lower"
+        )
+    return results
+
+
+def run_benchmarks(sizes: list[int], records: int, seed: int = 42) -> dict:
+    """
+    Runs every benchmark and returns a JSON-serializable report.
+
+    Args:
+        sizes: Table sizes at which the database paths are measured, e.g. [1000, 100000, 1000000].
+        records: Corpus size for the in-memory benchmarks, CSV import and batch classification.
+        seed: Seed of the synthetic corpora.
+
+    Returns:
+        A dict with the run metadata and a "metrics" dict of {name: {value, unit, better}}.
+    """
+    corpus = list(generate_records(records, seed))
+    metrics = {}
+    for name, benchmark in (
+        ("framework mapping", lambda: bench_framework_mapping(corpus)),
+        ("model construction", lambda: bench_model_construction(corpus)),
+        ("prompt size", lambda: bench_prompt_size(min(records, 1000), seed)),
+        ("batch classification", lambda: bench_batch_classification(records, seed)),
+        ("CSV import", lambda: bench_csv_import(records, seed)),
+        ("table sizes", lambda: bench_table_sizes(sizes, seed)),
+    ):
+        print(f"Running {name} benchmark...", file=sys.stderr)
+        metrics.update(benchmark())
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = None
+    return {
+        "commit": commit or None,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "parameters": {"sizes": sizes, "records": records, "seed": seed},
+        "metrics": metrics,
+    }
+
+def check_regressions(metrics: dict, baseline: Optional[dict] = None, tolerance: float = 0.25,
+                      thresholds: Optional[dict] = None) -> list[str]:
+    """
+    Compares metrics against a previous report and against absolute thresholds.
+
+    Args:
+        metrics: The "metrics" dict of the current report.
+        baseline: The "metrics" dict of a previous report, if any.
+        tolerance: Allowed relative change in the worse direction (0.25 = 25%). Changes
+            smaller than NOISE_FLOOR for the metric's unit are ignored.
+        thresholds: {name: {"min": value} or {"max": value}} absolute limits.
+
+    Returns:
+        A description of every regression; empty when the run passes.
+    """
+    failures = []
+    for name, previous in (baseline or {}).items():
+        if name not in metrics or not previous["value"]:
+            continue
+        current = metrics[name]["value"]
+        if abs(current - previous["value"]) < NOISE_FLOOR.get(previous["unit"], 0):
+            continue
+        change = (current - previous["value"]) / previous["value"]
+        if (change < -tolerance) if previous["better"] == "higher" else (change > tolerance):
+            failures.append(f"{name}: {current} {metrics[name]['unit']} vs baseline {previous['value']} ({change:+.0%})")
+    for name, limit in (thresholds or {}).items():
+        if name not in metrics:
+            continue
+        current = metrics[name]["value"]
+        if "min" in limit and current < limit["min"]:
+            failures.append(f"{name}: {current} {metrics[name]['unit']} is below the minimum of {limit['min']}")
+        if "max" in limit and current > limit["max"]:
+            failures.append(f"{name}: {current} {metrics[name]['unit']} is above the maximum of {limit['max']}")
+    return failures
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Run the RiskLoggr benchmarks and report the results as JSON.")
+    parser.add_argument("--sizes", default="1000", help="Comma-separated table sizes, e.g. 1000,100000,1000000")
+    parser.add_argument("--records", type=int, default=10000, help="Corpus size for the in-memory, import and batch benchmarks")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Write the JSON report to this file instead of stdout")
+    parser.add_argument("--baseline", help="JSON report of a previous run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative regression against the baseline")
+    parser.add_argument("--thresholds", default=DEFAULT_THRESHOLDS, help="JSON file with absolute limits ('' to skip)")
+    args = parser.parse_args()
+
+    with contextlib.redirect_stdout(sys.stderr): # Keep progress messages out of the JSON on stdout
+        try:
+            report = run_benchmarks([int(size) for size in args.sizes.split(",")], args.records, args.seed)
+        finally:
+            close_all_pools()
+            shutil.rmtree(WORK_DIRECTORY, ignore_errors=True)
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)["metrics"]
+    thresholds = None
+    if args.thresholds:
+        with open(args.thresholds, encoding="utf-8") as f:
+            thresholds = json.load(f)
+    failures = check_regressions(report["metrics"], baseline, args.tolerance, thresholds)
+    for failure in failures:
+        print(f"REGRESSION {failure}", file=sys.stderr)
+    sys.exit(1 if failures else 0)
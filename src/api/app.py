@@ -0,0 +1,195 @@
+import asyncio
+import json
+import os
+import sqlite3
+import tempfile
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Optional
+
+from fastapi import FastAPI, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel
+from starlette.background import BackgroundTask
+
+from src.api import jobs
+from src.classification.classifier import classify_incident
+from src.classification.similarity import start_similarity_index_load
+from src.config.config import settings
+from src.database import database
+from src.database.export import EXPORT_FORMATS, export_classifications
+from src.logging.metrics import metrics
+from src.models import RiskClassification
+
+class IncidentRequest(BaseModel):
+    incident_description: str
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    database.initialize_database()
+    start_similarity_index_load()
+    jobs.job_workers.start()
+    yield
+    jobs.job_workers.stop()
+
+app = FastAPI(title="RiskLoggr API", lifespan=lifespan)
+
+
+@app.post("/classify")
+def classify(request: IncidentRequest) -> dict:
+    """Classifies an incident synchronously, saves it and returns the stored classification."""
+    classification = classify_incident(request.incident_description)
+    if classification is None:
+        raise HTTPException(status_code=502, detail="Classification failed. Check API key and logs.")
+    row_id = database.save_classification_result(request.incident_description, classification)
+    if row_id is None:
+        raise HTTPException(status_code=500, detail="Classification could not be saved.")
+    return database.get_classification(row_id)
+
+@app.post("/jobs", status_code=202)
+def submit_job(request: IncidentRequest) -> dict:
+    """Queues an incident for asynchronous classification."""
+    job_id = jobs.create_job(request.incident_description)
+    jobs.job_workers.notify()
+    return {"job_id": job_id, "status": jobs.QUEUED}
+
+def _job_payload(job_id: str) -> dict:
+    job = jobs.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    if job["status"] == jobs.SUCCEEDED and job["classification_id"] is not None:
+        job["classification"] = database.get_classification(job["classification_id"])
+    return job
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str) -> dict:
+    """Returns the status of a job, including the classification once it succeeded."""
+    return _job_payload(job_id)
+
+@app.get("/jobs/{job_id}/events")
+async def stream_job(job_id: str, poll_interval: float = Query(0.5, gt=0, le=10)):
+    """Streams job status changes as server-sent events until the job finishes."""
+    payload = await run_in_threadpool(_job_payload, job_id) # 404 before the stream starts
+
+    async def events():
+        nonlocal payload
+        last_status = None
+        while True:
+            if payload["status"] != last_status:
+                last_status = payload["status"]
+                yield f"event: {last_status}\ndata: {json.dumps(payload, default=str)}\n\n"
+            if last_status in (jobs.SUCCEEDED, jobs.FAILED):
+                return
+            await asyncio.sleep(poll_interval)
+            payload = await run_in_threadpool(_job_payload, job_id)
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics() -> PlainTextResponse:
+    """Stage timings, LLM token usage and cost, cache and database metrics in Prometheus text format."""
+    return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
+
+@app.get("/classifications/search")
+def search_classifications(
+    q: str = Query(..., min_length=1, description="Free text; quote phrases with double quotes"),
+    limit: int = Query(20, ge=1, le=200),
+    offset: int = Query(0, ge=0),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    basel_ii_category: Optional[list[str]] = Query(None),
+    severity_score: Optional[list[int]] = Query(None),
+    likelihood: Optional[list[str]] = Query(None),
+    framework: Optional[str] = None,
+) -> dict:
+    """
+    Ranked full-text search with snippets and highlight offsets. Registered before /classifications/{row_id}.
+
+    total counts the ranked matches, at most database.SEARCH_RANK_WINDOW (the newest ones).
+    """
+    results, total = database.search_classifications(
+        q, limit=limit, offset=offset, start=start, end=end, basel_ii_category=basel_ii_category,
+        severity_score=severity_score, likelihood=likelihood, framework=framework
+    )
+    return {"items": results, "total": total, "offset": offset, "limit": limit}
+
+@app.get("/classifications/export")
+def export_classification_history(
+    format: str = Query("csv", description=f"One of: {', '.join(EXPORT_FORMATS)}"),
+    user: str = "api",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    basel_ii_category: Optional[list[str]] = Query(None),
+    severity_score: Optional[list[int]] = Query(None),
+    likelihood: Optional[list[str]] = Query(None),
+    framework: Optional[str] = None,
+) -> FileResponse:
+    """
+    Downloads the classification history of any size. Registered before /classifications/{row_id}.
+
+    The extract is spooled to a temporary file chunk by chunk, sent from disk and deleted
+    once the response has been sent, so neither step holds it in memory.
+    """
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported export format. Choose one of: {', '.join(EXPORT_FORMATS)}")
+    os.makedirs(settings.EXPORT_DIRECTORY, exist_ok=True)
+    with tempfile.NamedTemporaryFile(dir=settings.EXPORT_DIRECTORY, suffix=f".{format}", delete=False) as export_file:
+        path = export_file.name
+        try:
+            export_classifications(
+                export_file, fmt=format, user_identity=user, start=start, end=end,
+                basel_ii_category=basel_ii_category, severity_score=severity_score,
+                likelihood=likelihood, framework=framework
+            )
+        except Exception:
+            export_file.close()
+            os.unlink(path)
+            raise
+    return FileResponse(path, media_type="application/octet-stream", filename=f"classification_history.{format}",
+                        background=BackgroundTask(os.unlink, path))
+
+@app.get("/classifications/{row_id}")
+def get_classification(row_id: int) -> dict:
+    classification = database.get_classification(row_id)
+    if classification is None:
+        raise HTTPException(status_code=404, detail="Classification not found.")
+    return classification
+
+@app.get("/classifications")
+def list_classifications(
+    cursor: Optional[int] = None,
+    limit: int = Query(50, ge=1, le=1000),
+    fields: Optional[str] = Query(None, description="Comma-separated columns to return"),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    basel_ii_category: Optional[list[str]] = Query(None),
+    severity_score: Optional[list[int]] = Query(None),
+    likelihood: Optional[list[str]] = Query(None),
+    framework: Optional[str] = None,
+) -> dict:
+    """Lists classifications newest first with keyset pagination; pass next_cursor to get the next page."""
+    columns = [field.strip() for field in fields.split(",") if field.strip()] if fields else None
+    try:
+        rows, next_cursor = database.query_classifications(
+            columns=columns, after_id=cursor, limit=limit, start=start, end=end,
+            basel_ii_category=basel_ii_category, severity_score=severity_score,
+            likelihood=likelihood, framework=framework
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except sqlite3.OperationalError as e: # e.g. the database is locked; the client can retry the same cursor
+        raise HTTPException(status_code=503, detail=f"Database unavailable: {e}")
+    return {"items": [database.classification_row_to_dict(row) for row in rows], "next_cursor": next_cursor}
+
+@app.put("/classifications/{row_id}")
+def update_classification(row_id: int, classification: RiskClassification) -> dict:
+    """Applies a manual adjustment through update_classification_result."""
+    existing = database.get_classification(row_id)
+    if existing is None:
+        raise HTTPException(status_code=404, detail="Classification not found.")
+    if not classification.incident_description:
+        # update_classification_result overwrites the description; keep the stored one unless a new one is sent
+        classification.incident_description = existing["incident_description"]
+    database.update_classification_result(row_id, classification)
+    return database.get_classification(row_id)
@@ -0,0 +1,227 @@
+import os
+import socket
+import sqlite3
+import threading
+import uuid
+from typing import Optional
+
+from src.classification.batch import is_retryable_error
+from src.classification.classifier import request_classification
+from src.config.config import settings
+from src.database import database
+from src.database.connection import begin_immediate, get_connection
+from src.logging.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Job lifecycle: queued -> running -> succeeded | failed (retryable errors go back to queued)
+QUEUED, RUNNING, SUCCEEDED, FAILED = "queued", "running", "succeeded", "failed"
+
+# A running job is leased to the worker pool that claimed it (worker_id) for as long as that
+# pool keeps refreshing heartbeat_at. Jobs whose lease has expired belong to a pool that died
+# and are requeued by any other pool; live jobs of other processes are left alone.
+
+def create_job(incident_description: str) -> str:
+    """Persists a new queued classification job and returns its id."""
+    job_id = uuid.uuid4().hex
+    with get_connection(database.DATABASE_FILE) as conn:
+        conn.execute(
+            'INSERT INTO classification_jobs (id, status, incident_description) VALUES (?, ?, ?)',
+            (job_id, QUEUED, incident_description)
+        )
+    return job_id
+
+def get_job(job_id: str) -> Optional[dict]:
+    """Returns a job as a dict, or None if it does not exist."""
+    with get_connection(database.DATABASE_FILE) as conn:
+        conn.row_factory = sqlite3.Row
+        row = conn.execute(
+            'SELECT id, status, classification_id, error, attempts, created_at, started_at, finished_at '
+            'FROM classification_jobs WHERE id = ?', (job_id,)
+        ).fetchone()
+    return dict(row) if row is not None else None
+
+def claim_next_job(worker_id: str) -> Optional[tuple[str, str, int]]:
+    """
+    Atomically moves the oldest queued job that is due to running, leased to worker_id.
+
+    Returns:
+        (job_id, incident_description, attempts) or None when no job is due.
+    """
+    with get_connection(database.DATABASE_FILE) as conn:
+        begin_immediate(conn) # Two workers can never claim the same job
+        row = conn.execute(
+            'SELECT id, incident_description, attempts FROM classification_jobs '
+            'WHERE status = ? AND (not_before IS NULL OR not_before <= CURRENT_TIMESTAMP) '
+            'ORDER BY created_at, rowid LIMIT 1', (QUEUED,)
+        ).fetchone()
+        if row is None:
+            return None
+        conn.execute(
+            'UPDATE classification_jobs SET status = ?, attempts = attempts + 1, worker_id = ?, not_before = NULL, '
+            'started_at = CURRENT_TIMESTAMP, heartbeat_at = CURRENT_TIMESTAMP WHERE id = ?',
+            (RUNNING, worker_id, row[0])
+        )
+    return row[0], row[1], row[2] + 1
+
+def finish_job(job_id: str, status: str, classification_id: Optional[int] = None, error: Optional[str] = None,
+               worker_id: Optional[str] = None, retry_after: float = 0.0) -> bool:
+    """
+    Records the outcome of a job and ends its lease.
+
+    Args:
+        status: The new status; QUEUED puts the job back in the queue for a retry.
+        worker_id: If given, the outcome is only recorded while the job is still leased to
+            this worker (its lease may have expired and the job been claimed again).
+        retry_after: With QUEUED, seconds before the job may be claimed again.
+
+    Returns:
+        False if the job was not updated.
+    """
+    condition, params = "id = ?", [job_id]
+    if worker_id is not None:
+        condition += " AND status = ? AND worker_id = ?"
+        params += [RUNNING, worker_id]
+    with get_connection(database.DATABASE_FILE) as conn:
+        return conn.execute(
+            'UPDATE classification_jobs SET status = ?, classification_id = ?, error = ?, worker_id = NULL, '
+            "not_before = CASE WHEN ? > 0 THEN datetime('now', '+' || ? || ' seconds') END, "
+            f'finished_at = CASE WHEN ? = ? THEN NULL ELSE CURRENT_TIMESTAMP END WHERE {condition}',
+            [status, classification_id, error, retry_after, retry_after, status, QUEUED] + params
+        ).rowcount > 0
+
+def renew_job_leases(worker_id: str) -> int:
+    """Refreshes the heartbeat of every job running under worker_id. Returns how many were renewed."""
+    with get_connection(database.DATABASE_FILE) as conn:
+        return conn.execute(
+            'UPDATE classification_jobs SET heartbeat_at = CURRENT_TIMESTAMP WHERE status = ? AND worker_id = ?',
+            (RUNNING, worker_id)
+        ).rowcount
+
+def requeue_expired_jobs(lease_seconds: float, max_attempts: int) -> tuple[int, int]:
+    """
+    Puts running jobs whose worker stopped sending heartbeats back in the queue.
+
+    Jobs left running before leases existed have no heartbeat and count as expired. A job
+    that already had max_attempts attempts is marked failed instead, so that a job which
+    kills or hangs its worker every time is not claimed forever.
+
+    Returns:
+        How many jobs were requeued and how many failed.
+    """
+    expired = "status = ? AND COALESCE(heartbeat_at, '') < datetime('now', '-' || ? || ' seconds')"
+    with get_connection(database.DATABASE_FILE) as conn:
+        begin_immediate(conn)
+        failed = conn.execute(
+            'UPDATE classification_jobs SET status = ?, worker_id = NULL, error = ?, finished_at = CURRENT_TIMESTAMP '
+            f'WHERE {expired} AND attempts >= ?',
+            (FAILED, f"The worker stopped responding in each of {max_attempts} attempts", RUNNING, lease_seconds, max_attempts)
+        ).rowcount
+        requeued = conn.execute(
+            f'UPDATE classification_jobs SET status = ?, worker_id = NULL, started_at = NULL WHERE {expired}',
+            (QUEUED, RUNNING, lease_seconds)
+        ).rowcount
+    return requeued, failed
+
+class JobWorkerPool:
+    """
+    Background threads that drain the classification_jobs table.
+
+    Workers are decoupled from request handling: the API only inserts rows and calls
+    notify(); workers claim jobs, classify them, save the result and record the outcome.
+    Because the queue lives in SQLite, queued jobs survive restarts.
+
+    Several processes (e.g. API replicas) can share one database. Each pool leases the
+    jobs it claims under its own worker_id and refreshes the leases from a heartbeat
+    thread, which also requeues jobs whose lease expired because their process died.
+    Retryable failures are requeued with a not_before delay instead of holding a worker.
+    """
+
+    def __init__(self, workers: int = 4, poll_interval: float = 1.0, max_attempts: int = 3,
+                 lease_seconds: float = 60.0):
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.lease_seconds = lease_seconds
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._threads = []
+
+    def start(self) -> None:
+        self._stopping.clear()
+        self._requeue_expired()
+        heartbeat = threading.Thread(target=self._heartbeat, name="classification-heartbeat", daemon=True)
+        heartbeat.start()
+        self._threads.append(heartbeat)
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"classification-worker-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: float = 30.0) -> None:
+        self._stopping.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def notify(self) -> None:
+        """Wakes idle workers after a job was submitted."""
+        self._wakeup.set()
+
+    def _requeue_expired(self) -> None:
+        try:
+            requeued, failed = requeue_expired_jobs(self.lease_seconds, self.max_attempts)
+        except sqlite3.Error as e:
+            logger.error(f"Database error while requeueing expired jobs: {e}")
+            return
+        if requeued:
+            logger.info(f"Requeued {requeued} classification jobs whose worker stopped responding.")
+        if failed:
+            logger.error(f"Failed {failed} classification jobs whose worker stopped responding in every attempt.")
+
+    def _heartbeat(self) -> None:
+        # Renew well before expiry so that a slow write does not cost the lease
+        while not self._stopping.wait(self.lease_seconds / 3):
+            try:
+                renew_job_leases(self.worker_id)
+            except sqlite3.Error as e:
+                logger.error(f"Database error while renewing job leases: {e}")
+            self._requeue_expired()
+
+    def _run(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                job = claim_next_job(self.worker_id)
+            except sqlite3.Error as e:
+                logger.error(f"Database error while claiming a job: {e}")
+                job = None
+            if job is None:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+                continue
+            self._process(*job)
+
+    def _process(self, job_id: str, incident_description: str, attempts: int) -> None:
+        try:
+            classification = request_classification(incident_description)
+            classification_id = database.save_classification_result(incident_description, classification)
+            if classification_id is None:
+                raise sqlite3.OperationalError("classification could not be saved")
+            if not finish_job(job_id, SUCCEEDED, classification_id=classification_id, worker_id=self.worker_id):
+                logger.warning(f"Lease of classification job {job_id} expired before it finished")
+        except Exception as e:
+            # A locked database is transient, and the retry finds the classification in the cache
+            retryable = is_retryable_error(e) or isinstance(e, sqlite3.OperationalError)
+            try:
+                if retryable and attempts < self.max_attempts:
+                    finish_job(job_id, QUEUED, error=str(e), worker_id=self.worker_id, retry_after=min(2 ** attempts, 30))
+                else:
+                    logger.error(f"Classification job {job_id} failed: {e}")
+                    finish_job(job_id, FAILED, error=str(e), worker_id=self.worker_id)
+            except sqlite3.Error as finish_error:
+                logger.error(f"Could not record the outcome of job {job_id}; its lease will expire: {finish_error}")
+
+
+job_workers = JobWorkerPool(workers=settings.API_JOB_WORKERS, lease_seconds=settings.API_JOB_LEASE_SECONDS)
@@ -0,0 +1,162 @@
+import hashlib
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Optional
+
+from src.database.connection import get_connection
+from src.logging.logger import get_logger
+
+logger = get_logger(__name__)
+
+def normalize_incident_text(incident_description: str) -> str:
+    """
+    Normalizes incident text so that trivially different submissions share a cache entry.
+
+    Applies Unicode NFKC normalization, collapses all runs of whitespace to a single
+    space and strips leading/trailing whitespace. Case is preserved.
+    """
+    normalized = unicodedata.normalize("NFKC", incident_description or "")
+    return " ".join(normalized.split())
+
+def make_cache_key(incident_description: str, prompt_version: str, model: str) -> str:
+    """
+    Builds a content-addressed cache key.
+
+    Args:
+        incident_description: The raw incident text.
+        prompt_version: Version of the prompt used to classify the text.
+        model: Name of the LLM model used to classify the text.
+
+    Returns:
+        A SHA-256 hex digest of the normalized text, prompt version and model.
+    """
+    material = "\x1f".join([prompt_version, model, normalize_incident_text(incident_description)])
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class ClassificationCache:
+    """
+    Two-tier cache for classification payloads.
+
+    The first tier is an in-process LRU held in an OrderedDict. The second tier is a
+    SQLite table that survives restarts, with TTL expiry and size-based eviction of the
+    least recently accessed entries. Values are opaque strings (serialized JSON).
+    """
+
+    def __init__(self, database_file: str, max_memory_entries: int = 256,
+                 max_disk_entries: int = 10000, ttl_seconds: int = 30 * 24 * 3600):
+        self.database_file = database_file
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_entries = max_disk_entries
+        self.ttl_seconds = ttl_seconds
+        self._memory = OrderedDict() # key -> (payload, created_at)
+        self._lock = threading.Lock()
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+        self._initialized = False
+
+    def _ensure_table(self, conn: sqlite3.Connection) -> None:
+        if self._initialized:
+            return
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS classification_cache (
+                cache_key TEXT PRIMARY KEY,
+                payload TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_accessed REAL NOT NULL
+            )
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_classification_cache_last_accessed ON classification_cache (last_accessed)')
+        conn.commit()
+        self._initialized = True
+
+    def _remember(self, key: str, payload: str, created_at: float) -> None:
+        """Inserts into the memory tier, evicting the least recently used entry. Caller holds the lock."""
+        self._memory[key] = (payload, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key: str) -> Optional[str]:
+        """Returns the cached payload for key, or None on a miss or expired entry."""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if now - entry[1] <= self.ttl_seconds:
+                    self._memory.move_to_end(key)
+                    self._stats["memory_hits"] += 1
+                    return entry[0]
+                del self._memory[key]
+
+        try:
+            with get_connection(self.database_file) as conn:
+                self._ensure_table(conn)
+                row = conn.execute(
+                    'SELECT payload, created_at FROM classification_cache WHERE cache_key = ?', (key,)
+                ).fetchone()
+                if row is not None and now - row[1] <= self.ttl_seconds:
+                    conn.execute('UPDATE classification_cache SET last_accessed = ? WHERE cache_key = ?', (now, key))
+                    with self._lock:
+                        self._remember(key, row[0], row[1])
+                        self._stats["disk_hits"] += 1
+                    return row[0]
+                if row is not None:
+                    conn.execute('DELETE FROM classification_cache WHERE cache_key = ?', (key,))
+        except sqlite3.Error as e:
+            logger.error(f"Cache error during lookup: {e}")
+
+        with self._lock:
+            self._stats["misses"] += 1
+        return None
+
+    def set(self, key: str, payload: str) -> None:
+        """Stores payload under key in both tiers and enforces the TTL and size limits."""
+        now = time.time()
+        with self._lock:
+            self._remember(key, payload, now)
+            self._stats["writes"] += 1
+
+        try:
+            with get_connection(self.database_file) as conn:
+                self._ensure_table(conn)
+                conn.execute('''
+                    INSERT OR REPLACE INTO classification_cache (cache_key, payload, created_at, last_accessed)
+                    VALUES (?, ?, ?, ?)
+                ''', (key, payload, now, now))
+                expired = conn.execute(
+                    'DELETE FROM classification_cache WHERE created_at < ?', (now - self.ttl_seconds,)
+                ).rowcount
+                # Keep only the most recently accessed max_disk_entries rows
+                evicted = conn.execute('''
+                    DELETE FROM classification_cache WHERE cache_key IN (
+                        SELECT cache_key FROM classification_cache
+                        ORDER BY last_accessed DESC LIMIT -1 OFFSET ?
+                    )
+                ''', (self.max_disk_entries,)).rowcount
+            with self._lock:
+                self._stats["evictions"] += expired + evicted
+        except sqlite3.Error as e:
+            logger.error(f"Cache error during write: {e}")
+
+    def clear(self) -> None:
+        """Removes every entry from both tiers."""
+        with self._lock:
+            self._memory.clear()
+        try:
+            with get_connection(self.database_file) as conn:
+                self._ensure_table(conn)
+                conn.execute('DELETE FROM classification_cache')
+        except sqlite3.Error as e:
+            logger.error(f"Cache error during clear: {e}")
+
+    def stats(self) -> dict:
+        """Returns hit/miss counters and the overall hit rate."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_entries"] = len(self._memory)
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["memory_hits"] + stats["disk_hits"]) / lookups if lookups else 0.0
+        return stats
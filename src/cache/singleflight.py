@@ -0,0 +1,115 @@
+import threading
+from typing import Any, Callable, Optional
+
+
+class FlightTimeout(TimeoutError):
+    """Raised to a follower that waited longer than its timeout for the in-flight call."""
+
+
+class FlightCancelled(RuntimeError):
+    """Raised to followers when the leading call was interrupted (KeyboardInterrupt, an abandoned generator)."""
+
+
+class Flight:
+    """
+    One in-flight call shared by every caller of the same key.
+
+    The caller that created the flight (the leader) runs the work and resolves or fails
+    it; the other callers (followers) block in wait until then.
+    """
+
+    def __init__(self):
+        self._done = threading.Event()
+        self._result = None
+        self._error: Optional[BaseException] = None
+        self.followers = 0 # Guarded by the owning SingleFlight's lock
+
+    def wait(self, timeout: Optional[float] = None) -> Any:
+        """
+        Waits for the leader and returns its result or raises its error.
+
+        Raises:
+            FlightTimeout: The leader did not finish within timeout seconds. The flight
+                itself keeps running; only this caller gives up.
+        """
+        if not self._done.wait(timeout):
+            raise FlightTimeout(f"Timed out after {timeout} seconds waiting for an identical in-flight request")
+        if self._error is not None:
+            raise self._error
+        return self._result
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key into one execution.
+
+    The first caller of a key runs the function; callers arriving while it runs wait for
+    it and receive the same result, or the same exception. The key is forgotten as soon
+    as the call finishes, so later calls run again (results are cached elsewhere).
+
+    join/finish expose the same protocol for work that is not a single function call,
+    such as a streamed response that the leader consumes piece by piece.
+    """
+
+    def __init__(self):
+        self._flights: dict[str, Flight] = {}
+        self._lock = threading.Lock()
+
+    def join(self, key: str) -> tuple[Flight, bool]:
+        """
+        Returns the flight of key and whether the caller leads it.
+
+        A leader must call finish exactly once, also on failure, or followers wait until
+        their timeout.
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                flight.followers += 1
+                return flight, False
+            flight = self._flights[key] = Flight()
+            return flight, True
+
+    def finish(self, key: str, flight: Flight, result: Any = None, error: Optional[BaseException] = None) -> None:
+        """Publishes the leader's result or error to the followers and forgets the key."""
+        if error is not None and not isinstance(error, Exception):
+            # Interrupts belong to the leader's thread; followers see an ordinary error instead
+            error = FlightCancelled(f"The in-flight request was interrupted ({type(error).__name__})")
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+        flight._result, flight._error = result, error
+        flight._done.set()
+
+    def do(self, key: str, function: Callable[[], Any], timeout: Optional[float] = None) -> tuple[Any, bool]:
+        """
+        Runs function once for all concurrent callers of key.
+
+        Args:
+            key: Identity of the work, e.g. a cache key.
+            function: Called without arguments by the leader only.
+            timeout: Seconds a follower waits for the leader; None waits indefinitely.
+                The leader is bounded by the function's own timeouts.
+
+        Returns:
+            The result and whether it was shared from another caller's execution.
+
+        Raises:
+            Whatever function raised (in the leader and in every follower), or FlightTimeout
+            in a follower that gave up waiting.
+        """
+        flight, leader = self.join(key)
+        if not leader:
+            return flight.wait(timeout), True
+        try:
+            result = function()
+        except BaseException as e:
+            self.finish(key, flight, error=e)
+            raise
+        self.finish(key, flight, result=result)
+        return result, False
+
+    def in_flight(self) -> int:
+        """Returns the number of keys currently being computed."""
+        with self._lock:
+            return len(self._flights)
@@ -0,0 +1,317 @@
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from typing import Iterator, NamedTuple, Optional
+
+import openai
+
+from src.config.config import settings
+
+# The key shipped in the example .env file; treated as missing
+OPENAI_API_KEY_PLACEHOLDER = "your_openai_api_key_here"
+
+
+class Completion(NamedTuple):
+    content: str # The JSON text returned by the model
+    usage: Optional[dict] # prompt_tokens, completion_tokens, total_tokens (and cached_tokens) when the backend reports them
+
+
+class BackendError(Exception):
+    """
+    Error raised by non-OpenAI backends.
+
+    Carries an HTTP-style status_code so that is_retryable_error treats a fake 429 or
+    503 exactly like the real thing.
+    """
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class LLMBackend:
+    """
+    Interface of a chat-completion backend.
+
+    A backend receives the chat messages and the model name and returns the JSON text
+    produced for them, either at once (complete) or as text deltas (stream). An optional
+    OpenAI-style response_format (e.g. a JSON schema) constrains the output; backends that
+    cannot enforce it ignore it.
+    """
+
+    name = "base"
+
+    def is_configured(self) -> bool:
+        """Returns False when the backend cannot be used, e.g. because an API key is missing."""
+        return True
+
+    def cache_namespace(self, model: str) -> str:
+        """Identifies the producer of a result in cache keys, so fake results never mix with real ones."""
+        return f"{self.name}/{model}"
+
+    def complete(self, messages: list[dict], model: str, response_format: Optional[dict] = None) -> Completion:
+        raise NotImplementedError
+
+    def stream(self, messages: list[dict], model: str, usage: Optional[dict] = None,
+               response_format: Optional[dict] = None) -> Iterator[str]:
+        """
+        Yields the response text in pieces. Backends without streaming return it in one piece.
+
+        If a usage dict is given, it is filled with the token usage once the stream ends.
+        """
+        completion = self.complete(messages, model, response_format)
+        if usage is not None and completion.usage:
+            usage.update(completion.usage)
+        yield completion.content
+
+
+def _usage_dict(usage) -> Optional[dict]:
+    if usage is None:
+        return None
+    details = getattr(usage, "prompt_tokens_details", None)
+    return {
+        "prompt_tokens": usage.prompt_tokens,
+        "completion_tokens": usage.completion_tokens,
+        "total_tokens": usage.total_tokens,
+        "cached_tokens": getattr(details, "cached_tokens", None) or 0, # Prompt prefix served from the provider cache
+    }
+
+
+class OpenAIBackend(LLMBackend):
+    """Chat completions in JSON (or JSON schema) mode through the openai package (uses the module-level openai.api_key)."""
+
+    name = "openai"
+
+    def is_configured(self) -> bool:
+        return bool(openai.api_key) and openai.api_key != OPENAI_API_KEY_PLACEHOLDER
+
+    def cache_namespace(self, model: str) -> str:
+        return model # Keeps cache entries written before backends existed valid
+
+    def complete(self, messages: list[dict], model: str, response_format: Optional[dict] = None) -> Completion:
+        response = openai.chat.completions.create(
+            model=model,
+            messages=messages,
+            response_format=response_format or {"type": "json_object"} # Request JSON output
+        )
+        message = response.choices[0].message
+        if message.content is None and getattr(message, "refusal", None):
+            # JSON schema mode reports refusals separately instead of as content
+            raise BackendError(f"The model refused to classify the incident: {message.refusal}")
+        return Completion(message.content, _usage_dict(response.usage))
+
+    def stream(self, messages: list[dict], model: str, usage: Optional[dict] = None,
+               response_format: Optional[dict] = None) -> Iterator[str]:
+        stream = openai.chat.completions.create(
+            model=model,
+            messages=messages,
+            response_format=response_format or {"type": "json_object"},
+            stream=True,
+            stream_options={"include_usage": True} # The last chunk carries the usage
+        )
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+            if usage is not None and getattr(chunk, "usage", None) is not None:
+                usage.update(_usage_dict(chunk.usage))
+
+
+# Values the fake backend draws its classifications from
+_FAKE_CATEGORIES = [
+    "Internal Fraud", "External Fraud", "Employment Practices and Workplace Safety",
+    "Clients, Products and Business Practices", "Damage to Physical Assets",
+    "Business Disruption and System Failures", "Execution, Delivery and Process Management",
+]
+_FAKE_ROOT_CAUSES = [
+    "Weak access control allowed unauthorized access to customer data.",
+    "A software change was deployed without adequate testing.",
+    "Manual processing error in the reconciliation process.",
+    "Third-party vendor failed to meet its service level.",
+    "Phishing email compromised employee credentials.",
+]
+_FAKE_RECOMMENDATIONS = [
+    "Strengthen access reviews for privileged accounts.",
+    "Introduce mandatory testing and approval before deployment.",
+    "Automate the reconciliation and add a four-eyes check.",
+    "Review vendor contracts and monitor service levels.",
+    "Run regular phishing awareness training.",
+    "Document the incident response procedure and test it yearly.",
+]
+_FAKE_RISK_LEVELS = ["Low", "Medium", "High", "Very High"]
+_FAKE_LIKELIHOODS = ["Rare", "Unlikely", "Possible", "Likely", "Certain"]
+_FAKE_IMPACTS = ["Financial", "Legal", "Reputational", "Operational"]
+
+# Named latency/error profiles for FakeBackend: (mean latency in seconds, jitter in seconds, error rate)
+FAKE_PROFILES = {
+    "instant": (0.0, 0.0, 0.0),
+    "fast": (0.05, 0.02, 0.0),
+    "realistic": (4.0, 2.0, 0.01),
+    "flaky": (2.0, 1.5, 0.2),
+}
+
+
+class FakeBackend(LLMBackend):
+    """
+    In-process stand-in for the LLM with configurable latency and error profile.
+
+    Responses are valid classification JSON derived deterministically from the
+    incident text, so repeated runs produce the same results. Each call sleeps for
+    latency ± jitter seconds and fails with probability error_rate, raising a
+    BackendError whose status_code is drawn from error_status_codes.
+    """
+
+    name = "fake"
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0,
+                 error_status_codes: tuple[int, ...] = (429, 500, 503), stream_chunk_size: int = 16,
+                 seed: Optional[int] = None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status_codes = error_status_codes
+        self.stream_chunk_size = stream_chunk_size
+        self._random = random.Random(seed)
+        self._lock = threading.Lock() # random.Random is not thread-safe
+        self.calls = 0
+
+    @classmethod
+    def from_profile(cls, profile: str, **kwargs) -> "FakeBackend":
+        if profile not in FAKE_PROFILES:
+            raise ValueError(f"Unknown fake backend profile '{profile}'. Choose one of: {', '.join(FAKE_PROFILES)}")
+        latency, jitter, error_rate = FAKE_PROFILES[profile]
+        return cls(latency=latency, jitter=jitter, error_rate=error_rate, **kwargs)
+
+    @staticmethod
+    def fake_response(incident_description: str) -> str:
+        """Returns a deterministic classification JSON for the incident text."""
+        digest = hashlib.sha256(incident_description.encode("utf-8")).digest()
+        inherent = digest[3] % len(_FAKE_RISK_LEVELS)
+        return json.dumps({
+            "basel_ii_category": _FAKE_CATEGORIES[digest[0] % len(_FAKE_CATEGORIES)],
+            "severity_score": digest[1] % 5 + 1,
+            "root_cause": _FAKE_ROOT_CAUSES[digest[2] % len(_FAKE_ROOT_CAUSES)],
+            "control_recommendations": [
+                _FAKE_RECOMMENDATIONS[(digest[4] + offset) % len(_FAKE_RECOMMENDATIONS)]
+                for offset in range(digest[5] % 3 + 1)
+            ],
+            "inherent_risk": _FAKE_RISK_LEVELS[inherent],
+            "residual_risk": _FAKE_RISK_LEVELS[digest[6] % (inherent + 1)],
+            "likelihood": _FAKE_LIKELIHOODS[digest[7] % len(_FAKE_LIKELIHOODS)],
+            "impact_type": [impact for bit, impact in enumerate(_FAKE_IMPACTS) if digest[8] >> bit & 1] or ["Operational"],
+        })
+
+    def _simulate_call(self) -> None:
+        with self._lock:
+            self.calls += 1
+            delay = max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter))
+            failed = self._random.random() < self.error_rate
+            status_code = self._random.choice(self.error_status_codes) if failed else None
+        if delay:
+            time.sleep(delay)
+        if failed:
+            raise BackendError(f"Simulated LLM error (status {status_code})", status_code=status_code)
+
+    def complete(self, messages: list[dict], model: str, response_format: Optional[dict] = None) -> Completion:
+        self._simulate_call()
+        content = self.fake_response(messages[-1]["content"])
+        # ~4 characters per token over every message and the schema, like the real prompt size
+        prompt_characters = sum(len(message["content"]) for message in messages)
+        if response_format is not None:
+            prompt_characters += len(json.dumps(response_format))
+        prompt_tokens, completion_tokens = prompt_characters // 4 + 1, len(content) // 4 + 1
+        return Completion(content, {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        })
+
+    def stream(self, messages: list[dict], model: str, usage: Optional[dict] = None,
+               response_format: Optional[dict] = None) -> Iterator[str]:
+        completion = self.complete(messages, model, response_format)
+        if usage is not None:
+            usage.update(completion.usage)
+        content = completion.content
+        for start in range(0, len(content), self.stream_chunk_size):
+            yield content[start:start + self.stream_chunk_size]
+
+
+class ReplayBackend(LLMBackend):
+    """
+    Record/replay backend backed by one JSON file per request.
+
+    Requests are identified by a hash of the model and messages. In "replay" mode
+    responses are served from directory and unknown requests raise a BackendError; in
+    "record" mode every request is sent to the wrapped backend and its response is
+    written to directory, so a session against the real API can later be replayed
+    offline.
+    """
+
+    name = "replay"
+
+    def __init__(self, directory: str, mode: str = "replay", backend: Optional[LLMBackend] = None):
+        if mode not in ("replay", "record"):
+            raise ValueError("mode must be 'replay' or 'record'")
+        if mode == "record" and backend is None:
+            raise ValueError("record mode needs a backend to record from")
+        self.directory = directory
+        self.mode = mode
+        self.backend = backend
+        os.makedirs(directory, exist_ok=True)
+
+    def is_configured(self) -> bool:
+        return self.mode == "replay" or self.backend.is_configured()
+
+    def cache_namespace(self, model: str) -> str:
+        return model # Recordings are real responses for this model
+
+    def _path(self, messages: list[dict], model: str, response_format: Optional[dict] = None) -> str:
+        request = {"model": model, "messages": messages}
+        if response_format is not None: # Recordings made without a response format keep their names
+            request["response_format"] = response_format
+        material = json.dumps(request, sort_keys=True, ensure_ascii=False)
+        return os.path.join(self.directory, hashlib.sha256(material.encode("utf-8")).hexdigest() + ".json")
+
+    def complete(self, messages: list[dict], model: str, response_format: Optional[dict] = None) -> Completion:
+        path = self._path(messages, model, response_format)
+        if self.mode == "replay":
+            try:
+                with open(path, encoding="utf-8") as f:
+                    recording = json.load(f)
+            except FileNotFoundError:
+                raise BackendError(f"No recorded response for this request ({os.path.basename(path)})")
+            return Completion(recording["content"], recording.get("usage"))
+
+        completion = self.backend.complete(messages, model, response_format)
+        temporary_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(temporary_path, "w", encoding="utf-8") as f:
+            json.dump({"model": model, "messages": messages, "content": completion.content, "usage": completion.usage},
+                      f, ensure_ascii=False, indent=2)
+        os.replace(temporary_path, path) # Readers never see a partial recording
+        return completion
+
+
+def get_backend(name: Optional[str] = None) -> LLMBackend:
+    """
+    Creates the backend selected by name (defaults to settings.LLM_BACKEND).
+
+    Args:
+        name: "openai", "fake", "replay" or "record". Record and replay use
+            settings.LLM_REPLAY_DIRECTORY; record wraps the OpenAI backend. The fake backend
+            uses the settings.FAKE_LLM_PROFILE latency/error profile.
+
+    Returns:
+        An LLMBackend instance.
+    """
+    name = name or settings.LLM_BACKEND
+    if name == "openai":
+        return OpenAIBackend()
+    if name == "fake":
+        return FakeBackend.from_profile(settings.FAKE_LLM_PROFILE)
+    if name == "replay":
+        return ReplayBackend(settings.LLM_REPLAY_DIRECTORY, mode="replay")
+    if name == "record":
+        return ReplayBackend(settings.LLM_REPLAY_DIRECTORY, mode="record", backend=OpenAIBackend())
+    raise ValueError(f"Unknown LLM backend '{name}'. Choose one of: openai, fake, replay, record")
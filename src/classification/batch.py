@@ -0,0 +1,145 @@
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Iterable, Iterator, NamedTuple, Optional
+
+import openai
+
+from src.cache.singleflight import FlightCancelled, FlightTimeout
+from src.config.config import settings
+from src.models import RiskClassification
+from .classifier import request_classification
+
+# Rough completion size of a classification response, used for TPM accounting
+ESTIMATED_COMPLETION_TOKENS = 400
+RETRY_BASE_DELAY_SECONDS = 1.0
+RETRY_MAX_DELAY_SECONDS = 60.0
+
+
+class BatchResult(NamedTuple):
+    index: int # Position of the incident in the input iterable
+    incident_description: str
+    classification: Optional[RiskClassification]
+    error: Optional[Exception]
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket that refills continuously at rate_per_minute.
+
+    acquire() blocks until the requested amount is available. Requests larger than the
+    bucket capacity are clamped so they can still proceed once the bucket is full.
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        self.rate_per_second = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, amount: float = 1.0) -> None:
+        amount = min(amount, self.capacity)
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate_per_second)
+                self._updated = now
+                if self._tokens >= amount:
+                    self._tokens -= amount
+                    return
+                wait_seconds = (amount - self._tokens) / self.rate_per_second
+            time.sleep(wait_seconds)
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token) used for rate limiting."""
+    return len(text) // 4 + 1
+
+def is_retryable_error(error: Exception) -> bool:
+    """Returns True for rate-limit (429), server-side (5xx) and transient connection errors."""
+    # A retry after FlightTimeout or FlightCancelled rejoins the identical in-flight request or finds its cached result
+    if isinstance(error, (openai.APIConnectionError, openai.APITimeoutError, FlightTimeout, FlightCancelled)):
+        return True
+    status_code = getattr(error, "status_code", None)
+    return status_code == 429 or (status_code is not None and status_code >= 500)
+
+def _retry_delay(error: Exception, attempt: int) -> float:
+    """Full-jitter exponential backoff, honouring a Retry-After header (up to RETRY_MAX_DELAY_SECONDS) when the API sends one."""
+    response = getattr(error, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    if retry_after:
+        try:
+            delay = float(retry_after)
+        except ValueError:
+            delay = None
+        if delay is not None and delay >= 0: # NaN fails the comparison and falls back to the backoff
+            return min(delay, RETRY_MAX_DELAY_SECONDS)
+    return random.uniform(0, min(RETRY_MAX_DELAY_SECONDS, RETRY_BASE_DELAY_SECONDS * 2 ** attempt))
+
+
+def classify_incidents(
+    incidents: Iterable[str],
+    max_concurrency: Optional[int] = None,
+    requests_per_minute: Optional[int] = None,
+    tokens_per_minute: Optional[int] = None,
+    max_retries: Optional[int] = None,
+) -> Iterator[BatchResult]:
+    """
+    Classifies many incidents concurrently and yields results as they complete.
+
+    Incidents are pulled lazily from the iterable so that at most max_concurrency
+    requests are in flight (plus a small submission buffer). Each API call first takes
+    one request from the RPM bucket and its estimated token count from the TPM bucket.
+    Rate-limit and server errors are retried with jittered exponential backoff; any other
+    error, or exhausting the retries, is reported in the BatchResult.
+
+    Args:
+        incidents: Iterable of incident descriptions.
+        max_concurrency: Number of worker threads (defaults to settings.BATCH_MAX_CONCURRENCY).
+        requests_per_minute: RPM limit (defaults to settings.BATCH_REQUESTS_PER_MINUTE).
+        tokens_per_minute: TPM limit (defaults to settings.BATCH_TOKENS_PER_MINUTE).
+        max_retries: Retries per incident (defaults to settings.BATCH_MAX_RETRIES).
+
+    Yields:
+        BatchResult tuples in completion order; use BatchResult.index to restore input order.
+    """
+    max_concurrency = max_concurrency or settings.BATCH_MAX_CONCURRENCY
+    max_retries = settings.BATCH_MAX_RETRIES if max_retries is None else max_retries
+    request_bucket = TokenBucket(requests_per_minute or settings.BATCH_REQUESTS_PER_MINUTE)
+    token_bucket = TokenBucket(tokens_per_minute or settings.BATCH_TOKENS_PER_MINUTE)
+
+    def before_request(prompt: str) -> None:
+        request_bucket.acquire(1)
+        token_bucket.acquire(estimate_tokens(prompt) + ESTIMATED_COMPLETION_TOKENS)
+
+    def worker(index: int, incident_description: str) -> BatchResult:
+        attempt = 0
+        while True:
+            try:
+                classification = request_classification(incident_description, before_request=before_request)
+                return BatchResult(index, incident_description, classification, None)
+            except Exception as e:
+                if attempt >= max_retries or not is_retryable_error(e):
+                    return BatchResult(index, incident_description, None, e)
+                time.sleep(_retry_delay(e, attempt))
+                attempt += 1
+
+    incident_iter = iter(enumerate(incidents))
+    in_flight = set()
+    with ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="classify") as executor:
+        exhausted = False
+        while True:
+            while not exhausted and len(in_flight) < max_concurrency * 2:
+                try:
+                    index, incident_description = next(incident_iter)
+                except StopIteration:
+                    exhausted = True
+                    break
+                in_flight.add(executor.submit(worker, index, incident_description))
+            if not in_flight:
+                return
+            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
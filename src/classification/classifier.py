@@ -1,16 +1,292 @@
+import time
 import openai
-from typing import Optional
+from typing import Callable, Iterator, NamedTuple, Optional
 from typing import Union
 import json # Import json for parsing the response
 from ..config.config import settings # Import settings from the config module
 from src.models import RiskClassification
+from src.cache.classification_cache import ClassificationCache, make_cache_key
+from src.cache.singleflight import FlightCancelled, FlightTimeout, SingleFlight
+from src.classification.backends import LLMBackend, get_backend
+from src.classification.preprocessing import condense_incident
+from src.classification.prompts import PromptTemplate, get_prompt_template
+from src.classification.similarity import find_near_duplicate
+from src.classification.streaming import IncrementalJSONObjectParser
+from src.database import database
+from src.logging.logger import get_logger
+from src.logging.metrics import metrics, record_token_usage, timed
 
 # Configure the OpenAI API key
 openai.api_key = settings.OPENAI_API_KEY
 
-def classify_incident(incident_description: str) -> Optional[RiskClassification]:
-    from src.frameworks.framework_router import classify_across_frameworks
+MODEL_NAME = "gpt-4o"
+# The classification prompt (see settings.PROMPT_TEMPLATE). Its version is derived from the
+# template contents, so editing a template never reuses results cached for the old one.
+prompt_template: PromptTemplate = get_prompt_template()
+PROMPT_VERSION = prompt_template.version
+# Fields the framework mappers read besides incident_description
+MAPPING_FIELDS = {"basel_ii_category", "root_cause", "control_recommendations"}
+# Required fields are None on partial (streamed) classifications until they arrive
+PARTIAL_DEFAULTS = {name: None for name, field in RiskClassification.model_fields.items() if field.is_required()}
+
+logger = get_logger(__name__)
+
+# The LLM backend used by every classification path (see settings.LLM_BACKEND); replace it with
+# a FakeBackend or ReplayBackend to exercise the pipeline without the API
+backend: LLMBackend = get_backend()
+
+classification_cache = ClassificationCache(
+    settings.CACHE_DATABASE_FILE,
+    max_memory_entries=settings.CACHE_MEMORY_ENTRIES,
+    max_disk_entries=settings.CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.CACHE_TTL_SECONDS,
+)
+
+def _cache_samples() -> list[tuple[str, dict, float]]:
+    stats = classification_cache.stats()
+    return [
+        ("riskloggr_cache_events_total", {"result": "memory_hit"}, stats["memory_hits"]),
+        ("riskloggr_cache_events_total", {"result": "disk_hit"}, stats["disk_hits"]),
+        ("riskloggr_cache_events_total", {"result": "miss"}, stats["misses"]),
+        ("riskloggr_cache_events_total", {"result": "write"}, stats["writes"]),
+        ("riskloggr_cache_events_total", {"result": "eviction"}, stats["evictions"]),
+        ("riskloggr_cache_hit_ratio", {}, stats["hit_rate"]),
+        ("riskloggr_cache_memory_entries", {}, stats["memory_entries"]),
+    ]
+
+metrics.register_collector(_cache_samples)
+
+# Concurrent requests for the same cache key (identical normalized text, prompt and model)
+# share one classification instead of each calling the LLM
+classification_flights = SingleFlight()
+
+class StreamUpdate(NamedTuple):
+    classification: RiskClassification # Built with model_construct until complete is True
+    complete: bool # True only for the final, validated classification
+
 
+def build_classification_messages(incident_description: str) -> list[dict]:
+    """Returns the chat messages sent to the LLM for an incident (stable system prefix, incident last)."""
+    return prompt_template.messages(incident_description)
+
+def _prior_classification(incident_description: str, cache_key: str) -> Optional[RiskClassification]:
+    """Returns a cached classification or the classification of a stored near-duplicate, if any."""
+    from src.frameworks.framework_router import classify_across_frameworks, format_framework_tags
+
+    cached = classification_cache.get(cache_key)
+    if cached is not None:
+        metrics.inc("riskloggr_classifications_reused_total", source="cache")
+        return RiskClassification.model_validate_json(cached)
+
+    near_duplicate = find_near_duplicate(incident_description)
+    if near_duplicate is not None:
+        prior = database.get_classification(near_duplicate[0])
+        if prior is not None:
+            fields = {name: prior[name] for name in RiskClassification.model_fields if name in prior}
+            fields["incident_description"] = incident_description
+            classification_data = RiskClassification.model_validate(fields)
+            # The prior's tags were mapped from its own incident text; map this one's like _finalize_classification
+            with timed("framework_mapping"):
+                classification_data.framework_tags = format_framework_tags(classify_across_frameworks(classification_data))
+            classification_cache.set(cache_key, classification_data.model_dump_json())
+            metrics.inc("riskloggr_classifications_reused_total", source="near_duplicate")
+            logger.info(f"Reused classification {near_duplicate[0]} for a near-duplicate incident",
+                        extra={"similarity": round(near_duplicate[1], 4)})
+            return classification_data
+    return None
+
+def _record_llm_call(seconds: float, usage: Optional[dict], error: Optional[Exception] = None) -> None:
+    """Records the outcome, duration, tokens and cost of one LLM call."""
+    outcome = "success" if error is None else "error"
+    metrics.inc("riskloggr_llm_requests_total", backend=backend.name, model=MODEL_NAME, outcome=outcome)
+    if error is not None:
+        return
+    cost = record_token_usage(backend.name, MODEL_NAME, usage)
+    logger.info("LLM call completed", extra={
+        "backend": backend.name,
+        "model": MODEL_NAME,
+        "prompt_version": PROMPT_VERSION,
+        "seconds": round(seconds, 3),
+        "prompt_tokens": (usage or {}).get("prompt_tokens"),
+        "cached_tokens": (usage or {}).get("cached_tokens"),
+        "completion_tokens": (usage or {}).get("completion_tokens"),
+        "cost_usd": round(cost, 6) if cost is not None else None,
+    })
+
+def _finalize_classification(json_output: str, cache_key: str, incident_description: str) -> RiskClassification:
+    """Validates the LLM output, adds framework tags and caches the result."""
+    from src.frameworks.framework_router import classify_across_frameworks, format_framework_tags
+
+    with timed("validation"):
+        # Parse and validate the JSON output using Pydantic (model_post_init splits string recommendations)
+        classification_data = RiskClassification.model_validate_json(json_output)
+    # The framework rules also scan the incident text; use the full text that gets stored (not a
+    # condensed version), so that retag.compute_tag_masks reproduces these tags from the stored row
+    classification_data.incident_description = incident_description
+    with timed("framework_mapping"):
+        # Perform framework classification
+        framework_mappings = classify_across_frameworks(classification_data)
+        classification_data.framework_tags = format_framework_tags(framework_mappings) # Store as list of strings
+
+    classification_cache.set(cache_key, classification_data.model_dump_json())
+    return classification_data
+
+def request_classification(incident_description: str, before_request: Optional[Callable[[str], None]] = None) -> RiskClassification:
+    """
+    Classifies an operational risk incident using an LLM, raising on failure.
+
+    This is the building block shared by classify_incident and the batch engine. Cached
+    results are returned without contacting the API, and so are near-duplicates of stored
+    incidents (see settings.SIMILARITY_THRESHOLD), which reuse the prior classification.
+    Texts over settings.INCIDENT_TOKEN_BUDGET are condensed with condense_incident first.
+    Callers that ask for the same text while it is being classified wait for that call
+    (up to settings.COALESCE_TIMEOUT_SECONDS) and share its result or its error.
+
+    Args:
+        incident_description: The description of the incident.
+        before_request: Optional callback invoked with the prompt right before the API
+            call is made (used by the batch engine for rate limiting).
+
+    Returns:
+        A RiskClassification object.
+
+    Raises:
+        Any backend (e.g. OpenAI) or validation error raised while classifying, or
+        FlightTimeout when an identical in-flight request did not finish in time.
+    """
+    cache_key = make_cache_key(incident_description, PROMPT_VERSION, backend.cache_namespace(MODEL_NAME))
+    while True:
+        try:
+            classification, shared = classification_flights.do(
+                cache_key,
+                lambda: _prior_classification(incident_description, cache_key)
+                        or _request_from_llm(incident_description, cache_key, before_request),
+                timeout=settings.COALESCE_TIMEOUT_SECONDS,
+            )
+            break
+        except FlightCancelled:
+            # The leader was interrupted (e.g. an abandoned UI stream); rejoin and lead or follow anew
+            continue
+        except FlightTimeout:
+            metrics.inc("riskloggr_coalesced_requests_total", outcome="timeout")
+            raise
+    if shared:
+        metrics.inc("riskloggr_coalesced_requests_total", outcome="shared")
+        classification = classification.model_copy(deep=True) # Every caller gets its own object
+    return classification
+
+def _request_from_llm(incident_description: str, cache_key: str,
+                      before_request: Optional[Callable[[str], None]]) -> RiskClassification:
+    # Craft a prompt for the LLM; oversized reports are condensed to the token budget first
+    messages = build_classification_messages(condense_incident(incident_description, backend, before_request=before_request))
+
+    if before_request is not None:
+        before_request("\n".join(message["content"] for message in messages))
+
+    start = time.perf_counter()
+    try:
+        with timed("llm_call"):
+            completion = backend.complete(messages, MODEL_NAME, prompt_template.response_format)
+    except Exception as e:
+        _record_llm_call(time.perf_counter() - start, None, e)
+        raise
+    _record_llm_call(time.perf_counter() - start, completion.usage)
+    return _finalize_classification(completion.content, cache_key, incident_description)
+
+def stream_classification(incident_description: str) -> Iterator[StreamUpdate]:
+    """
+    Classifies an incident with a streamed completion, yielding partial results as fields arrive.
+
+    The JSON object is parsed incrementally, so basel_ii_category and severity_score are
+    available after the first few tokens. Framework tags are computed as soon as the
+    category, root cause and control recommendations are known, while the risk profile
+    is still streaming. The last update is the validated, cached classification.
+
+    Identical requests already in flight are coalesced as in request_classification;
+    such a follower yields only the complete update. If the leading stream is abandoned
+    (e.g. its Streamlit session reran), a waiting follower takes over and calls the LLM.
+
+    Args:
+        incident_description: The description of the incident.
+
+    Yields:
+        StreamUpdate tuples; partial classifications only carry the fields received so far.
+
+    Raises:
+        Any backend (e.g. OpenAI) or validation error raised while classifying, or
+        FlightTimeout when an identical in-flight request did not finish in time.
+    """
+    cache_key = make_cache_key(incident_description, PROMPT_VERSION, backend.cache_namespace(MODEL_NAME))
+    while True:
+        flight, leader = classification_flights.join(cache_key)
+        if leader:
+            break
+        try:
+            shared = flight.wait(settings.COALESCE_TIMEOUT_SECONDS)
+        except FlightCancelled:
+            continue
+        except FlightTimeout:
+            metrics.inc("riskloggr_coalesced_requests_total", outcome="timeout")
+            raise
+        metrics.inc("riskloggr_coalesced_requests_total", outcome="shared")
+        yield StreamUpdate(shared.model_copy(deep=True), True)
+        return
+
+    try:
+        classification = _prior_classification(incident_description, cache_key)
+        if classification is None:
+            for update in _stream_from_llm(incident_description, cache_key):
+                if update.complete:
+                    classification = update.classification
+                else:
+                    yield update
+    except BaseException as e: # Includes GeneratorExit when the consumer stops iterating
+        classification_flights.finish(cache_key, flight, error=e)
+        raise
+    classification_flights.finish(cache_key, flight, result=classification)
+    yield StreamUpdate(classification, True)
+
+def _stream_from_llm(incident_description: str, cache_key: str) -> Iterator[StreamUpdate]:
+    parser = IncrementalJSONObjectParser()
+    chunks = []
+    framework_tags = None
+    usage = {}
+    start = time.perf_counter()
+    try:
+        messages = build_classification_messages(condense_incident(incident_description, backend))
+        for text in backend.stream(messages, MODEL_NAME, usage, prompt_template.response_format):
+            if not chunks:
+                metrics.observe("riskloggr_stage_duration_seconds", time.perf_counter() - start, stage="llm_first_token")
+            chunks.append(text)
+            if not parser.feed(text):
+                continue
+            partial, framework_tags = _partial_classification(parser.fields, framework_tags, incident_description)
+            yield StreamUpdate(partial, False)
+    except Exception as e:
+        _record_llm_call(time.perf_counter() - start, None, e)
+        raise
+    seconds = time.perf_counter() - start
+    metrics.observe("riskloggr_stage_duration_seconds", seconds, stage="llm_call")
+    _record_llm_call(seconds, usage)
+
+    yield StreamUpdate(_finalize_classification("".join(chunks), cache_key, incident_description), True)
+
+def _partial_classification(fields: dict, framework_tags: Optional[list[str]],
+                            incident_description: str) -> tuple[RiskClassification, Optional[list[str]]]:
+    """Builds a partial classification from the fields streamed so far, mapping frameworks once possible."""
+    from src.frameworks.framework_router import classify_across_frameworks, format_framework_tags
+
+    fields = {**PARTIAL_DEFAULTS, **fields, "incident_description": incident_description}
+    partial = RiskClassification.model_construct(**fields) # model_post_init splits string recommendations
+    if framework_tags is None and all(fields[name] is not None for name in MAPPING_FIELDS):
+        # Everything the framework mappers scan has arrived; map once while the rest streams
+        with timed("framework_mapping"):
+            framework_tags = format_framework_tags(classify_across_frameworks(partial))
+    if framework_tags is not None:
+        partial.framework_tags = framework_tags
+    return partial, framework_tags
+
+def classify_incident(incident_description: str) -> Optional[RiskClassification]:
     """
     Classifies an operational risk incident using an LLM.
 
@@ -20,63 +296,31 @@ def classify_incident(incident_description: str) -> Optional[RiskClassification]
     Returns:
         A RiskClassification object if successful, None otherwise.
     """
-    if not openai.api_key:
-        print("OpenAI API key is not configured.")
+    if not backend.is_configured():
+        logger.error(f"LLM backend '{backend.name}' is not configured. Check the OpenAI API key.")
         return None
 
     try:
-        # Craft a prompt for the LLM
-        prompt = f"""
-        Classify the following operational risk incident, executive summary style.
-        Additionally, estimate the inherent risk, residual risk (assuming control recommendations are implemented), likelihood, and impact type.
-        Return the result as valid JSON with the following keys:
-        - basel_ii_category: string (Based on Basel II operational risk categories)
-        - severity_score: integer (1-5, 1=Low, 5=High)
-        - root_cause: string (natural, plain English)
-        - control_recommendations: list of clearly written, full-sentence recommendations in natural language. DO NOT number them or return an object with keys like 0, 1, 2. Just return a clean JSON list.
-        - inherent_risk: string (Estimate the risk level before controls, e.g., "Low", "Medium", "High", "Very High")
-        - residual_risk: string (Estimate the risk level after implementing control recommendations, e.g., "Low", "Medium", "High", "Very High")
-        - likelihood: string (Estimate the likelihood based on the scale: "Rare", "Unlikely", "Possible", "Likely", "Certain")
-        - impact_type: list of strings (Identify relevant impact types from: "Financial", "Legal", "Reputational", "Operational")
-        Respond only with valid JSON.
-        Incident:
-        {incident_description}
-        """
-
-        # Use the chat completions endpoint
-        response = openai.chat.completions.create(
-            model="gpt-4o", # Using a recent model that supports JSON mode
-            messages=[
-                {"role": "system", "content": "You are an expert in operational risk classification. Provide output strictly as a JSON object."},
-                {"role": "user", "content": prompt}
-            ],
-            response_format={"type": "json_object"} # Request JSON output
-        )
-
-        # Extract the JSON string from the response
-        json_output = response.choices[0].message.content
-
-        # Parse and validate the JSON output using Pydantic
-        classification_data = RiskClassification.model_validate_json(json_output)
-        # Normalize to list if it's a string
-        if isinstance(classification_data.control_recommendations, str):
-            classification_data.control_recommendations = [
-                line.strip("0123456789. ").strip()
-                for line in classification_data.control_recommendations.splitlines()
-                if line.strip()
-            ]
-        if isinstance(classification_data.control_recommendations, str):
-            classification_data.control_recommendations = [
-                rec.strip("0123456789. ").strip()
-                for rec in classification_data.control_recommendations.splitlines()
-                if rec.strip()
-            ]
-        # Perform framework classification
-        framework_mappings = classify_across_frameworks(classification_data)
-        classification_data.framework_tags = [f"{k}: {', '.join(v)}" for k, v in framework_mappings.items() if v] # Store as list of strings
+        return request_classification(incident_description)
+    except Exception as e:
+        logger.error(f"Error during classification: {e}")
+        return None
+def classify_incident_stream(incident_description: str) -> Iterator[StreamUpdate]:
+    """
+    Streaming counterpart of classify_incident.
+
+    Args:
+        incident_description: The description of the incident.
 
-        return classification_data
+    Yields:
+        StreamUpdate tuples from stream_classification. On failure the error is printed
+        and the stream ends without a complete update.
+    """
+    if not backend.is_configured():
+        logger.error(f"LLM backend '{backend.name}' is not configured. Check the OpenAI API key.")
+        return
 
+    try:
+        yield from stream_classification(incident_description)
     except Exception as e:
-        print(f"Error during classification: {e}")
-        return None
\ No newline at end of file
+        logger.error(f"Error during classification: {e}")
@@ -0,0 +1,200 @@
+import json
+import re
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Callable, Optional
+
+from src.classification.backends import LLMBackend
+from src.config.config import settings
+from src.logging.logger import get_logger
+from src.logging.metrics import metrics, record_token_usage, timed
+
+logger = get_logger(__name__)
+
+# Summaries of summaries are produced at most this many times before falling back to truncation
+MAX_REDUCE_ROUNDS = 3
+# Lines repeated at least this often (page headers, footers, disclaimers) are dropped from long reports
+BOILERPLATE_MIN_REPEATS = 3
+BOILERPLATE_MAX_LINE_LENGTH = 200
+
+_SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+")
+_PARAGRAPH_BOUNDARY = re.compile(r"\n\s*\n")
+
+
+@lru_cache(maxsize=None)
+def _encoding():
+    """Returns the tiktoken encoding for the model, or None when tiktoken is not installed."""
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        return tiktoken.encoding_for_model(settings.SUMMARY_MODEL)
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+
+def count_tokens(text: str) -> int:
+    """Counts tokens with tiktoken if available, otherwise estimates ~4 characters per token."""
+    encoding = _encoding()
+    if encoding is None:
+        return (len(text) + 3) // 4
+    return len(encoding.encode(text, disallowed_special=()))
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cuts text to at most max_tokens tokens."""
+    encoding = _encoding()
+    if encoding is None:
+        return text[:max_tokens * 4]
+    return encoding.decode(encoding.encode(text, disallowed_special=())[:max_tokens])
+
+def strip_boilerplate(text: str) -> str:
+    """
+    Removes repeated short lines (page headers/footers, disclaimers) and collapses blank runs.
+
+    Args:
+        text: The extracted report text.
+
+    Returns:
+        The text without lines that occur BOILERPLATE_MIN_REPEATS or more times.
+    """
+    lines = text.splitlines()
+    counts = Counter(line.strip().lower() for line in lines if 0 < len(line.strip()) <= BOILERPLATE_MAX_LINE_LENGTH)
+    repeated = {line for line, count in counts.items() if count >= BOILERPLATE_MIN_REPEATS}
+    kept = [line.rstrip() for line in lines if line.strip().lower() not in repeated]
+    return re.sub(r"\n{3,}", "\n\n", "\n".join(kept)).strip()
+
+def _units(text: str, max_tokens: int) -> list[tuple[str, int]]:
+    """Splits text into (unit, tokens) pairs of at most max_tokens: paragraphs, else sentences, else words."""
+    units = []
+    for paragraph in _PARAGRAPH_BOUNDARY.split(text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        tokens = count_tokens(paragraph)
+        if tokens <= max_tokens:
+            units.append((paragraph, tokens))
+            continue
+        for sentence in _SENTENCE_BOUNDARY.split(paragraph):
+            tokens = count_tokens(sentence)
+            if tokens <= max_tokens:
+                units.append((sentence, tokens))
+                continue
+            words = sentence.split()
+            step = max(1, len(words) * max_tokens // tokens)
+            for start in range(0, len(words), step):
+                piece = " ".join(words[start:start + step])
+                units.append((piece, count_tokens(piece)))
+    return units
+
+def split_into_chunks(text: str, chunk_tokens: int, overlap_tokens: int = 0) -> list[str]:
+    """
+    Packs text into chunks of at most chunk_tokens tokens along paragraph/sentence boundaries.
+
+    Each chunk after the first starts with the trailing units of the previous chunk, up
+    to overlap_tokens, so facts spanning a boundary appear whole in at least one chunk.
+
+    Args:
+        text: The text to split.
+        chunk_tokens: Token budget of a chunk.
+        overlap_tokens: Tokens repeated from the end of the previous chunk.
+
+    Returns:
+        The chunks, in document order.
+    """
+    chunks = []
+    current, current_tokens = [], 0
+    for unit, tokens in _units(text, chunk_tokens):
+        if current and current_tokens + tokens > chunk_tokens:
+            chunks.append("\n\n".join(unit_text for unit_text, _ in current))
+            overlap, overlap_size = [], 0
+            for previous in reversed(current):
+                if overlap_size + previous[1] > overlap_tokens or overlap_size + previous[1] + tokens > chunk_tokens:
+                    break
+                overlap.insert(0, previous)
+                overlap_size += previous[1]
+            current, current_tokens = overlap, overlap_size
+        current.append((unit, tokens))
+        current_tokens += tokens
+    if current:
+        chunks.append("\n\n".join(unit_text for unit_text, _ in current))
+    return chunks
+
+def _summary_messages(chunk: str, index: int, total: int, max_words: int) -> list[dict]:
+    return [
+        {"role": "system", "content": "You extract the facts needed to classify operational risk incidents. Respond only with a JSON object."},
+        {"role": "user", "content": (
+            "Extract from this excerpt of an incident report the facts relevant to classifying the incident: "
+            "what happened and when, root cause, affected processes, systems and clients, financial, legal, "
+            "reputational and operational impact, losses, and which controls failed or exist. Leave out "
+            "boilerplate such as headers, signatures and disclaimers. "
+            f'Use at most {max_words} words. Return {{"key_facts": "<facts>"}}.\n'
+            f"Excerpt {index} of {total}:\n{chunk}"
+        )},
+    ]
+
+def _summarize_chunk(backend: LLMBackend, chunk: str, index: int, total: int, max_tokens: int,
+                     before_request: Optional[Callable[[str], None]]) -> str:
+    messages = _summary_messages(chunk, index, total, max(20, max_tokens * 3 // 4))
+    if before_request is not None:
+        before_request(messages[-1]["content"])
+    try:
+        completion = backend.complete(messages, settings.SUMMARY_MODEL)
+    except Exception:
+        metrics.inc("riskloggr_llm_requests_total", backend=backend.name, model=settings.SUMMARY_MODEL, outcome="error")
+        raise
+    metrics.inc("riskloggr_llm_requests_total", backend=backend.name, model=settings.SUMMARY_MODEL, outcome="success")
+    record_token_usage(backend.name, settings.SUMMARY_MODEL, completion.usage)
+    try:
+        key_facts = json.loads(completion.content).get("key_facts")
+    except (ValueError, AttributeError):
+        key_facts = None
+    if not isinstance(key_facts, str) or not key_facts.strip():
+        # The backend ignored the instructions; keep the start of the excerpt rather than nothing
+        logger.warning(f"No key facts returned for excerpt {index} of {total}; keeping its first {max_tokens} tokens")
+        return truncate_to_tokens(chunk, max_tokens)
+    return truncate_to_tokens(key_facts.strip(), max_tokens)
+
+def condense_incident(incident_description: str, backend: LLMBackend, token_budget: Optional[int] = None,
+                      before_request: Optional[Callable[[str], None]] = None) -> str:
+    """
+    Bounds the size of the incident text sent to the classifier.
+
+    Text within token_budget is returned unchanged. Longer text is stripped of repeated
+    boilerplate lines and, if still too long, split into overlapping chunks whose key
+    facts are extracted in parallel (map) and concatenated (reduce). The reduce output
+    is condensed again if needed, and truncated after MAX_REDUCE_ROUNDS rounds.
+
+    Args:
+        incident_description: The full incident text, e.g. a parsed post-incident report.
+        backend: LLM backend used for the extraction calls.
+        token_budget: Maximum tokens of the returned text (defaults to settings.INCIDENT_TOKEN_BUDGET).
+        before_request: Optional callback invoked with each extraction prompt (rate limiting).
+
+    Returns:
+        Text of at most token_budget tokens.
+    """
+    token_budget = token_budget or settings.INCIDENT_TOKEN_BUDGET
+    original_tokens = count_tokens(incident_description)
+    if original_tokens <= token_budget:
+        return incident_description
+
+    with timed("condense"):
+        text = strip_boilerplate(incident_description)
+        rounds = 0
+        while count_tokens(text) > token_budget and rounds < MAX_REDUCE_ROUNDS:
+            rounds += 1
+            chunks = split_into_chunks(text, settings.CHUNK_TOKENS, settings.CHUNK_OVERLAP_TOKENS)
+            per_chunk_tokens = max(32, token_budget // len(chunks))
+            with ThreadPoolExecutor(max_workers=min(len(chunks), settings.BATCH_MAX_CONCURRENCY)) as executor:
+                summaries = list(executor.map(
+                    lambda item: _summarize_chunk(backend, item[1], item[0] + 1, len(chunks), per_chunk_tokens, before_request),
+                    enumerate(chunks)
+                ))
+            text = "\n\n".join(summaries)
+        if count_tokens(text) > token_budget:
+            text = truncate_to_tokens(text, token_budget)
+
+    logger.info(f"Condensed incident text from {original_tokens} to {count_tokens(text)} tokens",
+                extra={"rounds": rounds, "token_budget": token_budget})
+    return text
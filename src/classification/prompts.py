@@ -0,0 +1,165 @@
+import hashlib
+import json
+import re
+import typing
+from typing import NamedTuple, Optional
+
+from src.config.config import settings
+from src.models import IMPACT_TYPES, LIKELIHOOD_LEVELS, RISK_LEVELS, RiskClassification
+
+# Fields of RiskClassification the LLM fills in (the rest are set by the application), with a
+# description only where the field name and allowed values do not say it all
+LLM_FIELD_DESCRIPTIONS = {
+    "basel_ii_category": "Basel II level 1 event type",
+    "severity_score": "1=low, 5=high",
+    "root_cause": None,
+    "control_recommendations": "full sentences",
+    "inherent_risk": "before controls",
+    "residual_risk": "after controls",
+    "likelihood": None,
+    "impact_type": None,
+}
+# Closed vocabularies of the categorical fields (constants, so the schema and PROMPT_VERSION
+# never depend on runtime data). The seven Basel II event type names would cost more prompt
+# tokens than the rest of the schema, so that field is described instead.
+FIELD_VOCABULARIES = {
+    "severity_score": [1, 2, 3, 4, 5],
+    "inherent_risk": list(RISK_LEVELS),
+    "residual_risk": list(RISK_LEVELS),
+    "likelihood": list(LIKELIHOOD_LEVELS),
+    "impact_type": list(IMPACT_TYPES),
+}
+
+_HORIZONTAL_WHITESPACE = re.compile(r"[ \t\f\v\u00a0]+")
+_BLANK_LINES = re.compile(r"\n{3,}")
+
+
+def compact_whitespace(text: str) -> str:
+    """
+    Collapses runs of spaces and tabs, strips every line and keeps at most one blank line in a row.
+
+    Indentation and padding carry no meaning for the model but are billed as tokens, which
+    adds up for templates written as indented string literals and for text extracted from PDFs.
+    """
+    lines = (_HORIZONTAL_WHITESPACE.sub(" ", line).strip() for line in text.replace("\r\n", "\n").split("\n"))
+    return _BLANK_LINES.sub("\n\n", "\n".join(lines)).strip()
+
+def _json_type(annotation) -> dict:
+    """Maps a RiskClassification field annotation to a JSON schema type."""
+    if annotation is str:
+        return {"type": "string"}
+    if annotation is int:
+        return {"type": "integer"}
+    arguments = typing.get_args(annotation)
+    if typing.get_origin(annotation) is list:
+        return {"type": "array", "items": _json_type(arguments[0])}
+    if typing.get_origin(annotation) is typing.Union:
+        # Optional[str] -> str; Union[str, list[str]] -> list[str], the form the prompt asks for
+        candidates = [argument for argument in arguments if argument is not type(None)]
+        lists = [argument for argument in candidates if typing.get_origin(argument) is list]
+        return _json_type(lists[0] if lists else candidates[0])
+    raise TypeError(f"No JSON schema type for {annotation!r}")
+
+def classification_json_schema() -> dict:
+    """
+    Returns the strict JSON schema of the LLM output, derived from RiskClassification.
+
+    Properties follow the model's field order, so streamed responses start with the
+    category and severity. Categorical fields are restricted to FIELD_VOCABULARIES.
+    """
+    properties = {}
+    for name, field in RiskClassification.model_fields.items():
+        if name not in LLM_FIELD_DESCRIPTIONS:
+            continue
+        schema = _json_type(field.annotation)
+        if name in FIELD_VOCABULARIES:
+            (schema["items"] if schema["type"] == "array" else schema)["enum"] = FIELD_VOCABULARIES[name]
+        if LLM_FIELD_DESCRIPTIONS[name]:
+            schema["description"] = LLM_FIELD_DESCRIPTIONS[name]
+        properties[name] = schema
+    return {"type": "object", "properties": properties, "required": list(properties), "additionalProperties": False}
+
+
+class PromptTemplate(NamedTuple):
+    """
+    A classification prompt: a fixed system prefix followed by the incident text.
+
+    Everything but the incident lives in the system message and the user message ends with
+    the incident, so consecutive calls share the longest possible prefix for provider-side
+    prompt caching.
+    """
+    name: str
+    system: str
+    user: str # Formatted with incident_description
+    response_format: Optional[dict] # Passed to the backend; None means JSON object mode
+    compact: bool = True # Apply compact_whitespace to the incident text
+
+    @property
+    def version(self) -> str:
+        """Name plus a hash of the template contents; used as PROMPT_VERSION in cache keys."""
+        material = json.dumps([self.system, self.user, self.response_format, self.compact], sort_keys=True)
+        return f"{self.name}-{hashlib.sha256(material.encode('utf-8')).hexdigest()[:12]}"
+
+    def messages(self, incident_description: str) -> list[dict]:
+        """Returns the chat messages for an incident."""
+        if self.compact:
+            incident_description = compact_whitespace(incident_description)
+        return [
+            {"role": "system", "content": self.system},
+            {"role": "user", "content": self.user.format(incident_description=incident_description)},
+        ]
+
+
+def _legacy_template() -> PromptTemplate:
+    # The original prompt, kept verbatim so results can be reproduced and compared
+    return PromptTemplate(
+        name="legacy-v1",
+        system="You are an expert in operational risk classification. Provide output strictly as a JSON object.",
+        user="""
+    Classify the following operational risk incident, executive summary style.
+    Additionally, estimate the inherent risk, residual risk (assuming control recommendations are implemented), likelihood, and impact type.
+    Return the result as valid JSON with the following keys:
+    - basel_ii_category: string (Based on Basel II operational risk categories)
+    - severity_score: integer (1-5, 1=Low, 5=High)
+    - root_cause: string (natural, plain English)
+    - control_recommendations: list of clearly written, full-sentence recommendations in natural language. DO NOT number them or return an object with keys like 0, 1, 2. Just return a clean JSON list.
+    - inherent_risk: string (Estimate the risk level before controls, e.g., "Low", "Medium", "High", "Very High")
+    - residual_risk: string (Estimate the risk level after implementing control recommendations, e.g., "Low", "Medium", "High", "Very High")
+    - likelihood: string (Estimate the likelihood based on the scale: "Rare", "Unlikely", "Possible", "Likely", "Certain")
+    - impact_type: list of strings (Identify relevant impact types from: "Financial", "Legal", "Reputational", "Operational")
+    Respond only with valid JSON.
+    Incident:
+    {incident_description}
+    """,
+        response_format=None,
+        compact=False,
+    )
+
+def _compact_template() -> PromptTemplate:
+    # Field descriptions and allowed values travel in the schema, so the instructions stay short
+    return PromptTemplate(
+        name="compact-v2",
+        system=compact_whitespace("""
+            You are an expert in operational risk classification.
+            Classify the incident report in the user message, executive summary style.
+        """),
+        user="{incident_description}",
+        response_format={
+            "type": "json_schema",
+            "json_schema": {"name": "risk_classification", "strict": True, "schema": classification_json_schema()},
+        },
+    )
+
+PROMPT_TEMPLATES = {template.name: template for template in (_legacy_template(), _compact_template())}
+
+def get_prompt_template(name: Optional[str] = None) -> PromptTemplate:
+    """
+    Returns the prompt template selected by name (defaults to settings.PROMPT_TEMPLATE).
+
+    Raises:
+        ValueError: Unknown template name.
+    """
+    name = name or settings.PROMPT_TEMPLATE
+    if name not in PROMPT_TEMPLATES:
+        raise ValueError(f"Unknown prompt template '{name}'. Choose one of: {', '.join(PROMPT_TEMPLATES)}")
+    return PROMPT_TEMPLATES[name]
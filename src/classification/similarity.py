@@ -0,0 +1,276 @@
+import math
+import re
+import sqlite3
+import threading
+import zlib
+from collections import Counter
+from typing import Iterable, Optional
+
+import numpy as np
+
+from src.config.config import settings
+from src.logging.logger import get_logger
+
+logger = get_logger(__name__)
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset("""
+a an and are as at be been by for from has have in into is it its of on or that the their this to was were will with
+""".split())
+
+def _features(text: str) -> Counter:
+    """Unigram and bigram counts of the lowercased text, without stopwords."""
+    tokens = [token for token in _TOKEN_PATTERN.findall((text or "").lower()) if token not in _STOPWORDS]
+    features = Counter(tokens)
+    features.update(f"{first} {second}" for first, second in zip(tokens, tokens[1:]))
+    return features
+
+
+def _idf_weights(document_frequency: np.ndarray, documents: int) -> np.ndarray:
+    return (np.log((1 + documents) / (1 + document_frequency)) + 1).astype(np.float32)
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return (matrix / norms).astype(np.float32)
+
+
+class SimilarityIndex:
+    """
+    In-process nearest-neighbour index over incident descriptions.
+
+    Texts are embedded as TF-IDF vectors with the hashing trick (crc32 of every unigram
+    and bigram into a fixed number of signed dimensions), L2-normalized and stored in a
+    growable float32 matrix, so cosine similarity against every stored incident is a
+    single matrix-vector product. IDF weights are fitted when the index is (re)built and
+    refitted automatically once the index has doubled in size; incremental adds in
+    between use the current weights.
+
+    Only the vectors and per-dimension document frequencies are kept, not the texts: a
+    stored vector is its term frequencies scaled by the IDF weights, so a refit rescales
+    it by new / old weights. Texts are embedded outside the lock, which only guards the
+    matrix updates.
+    """
+
+    def __init__(self, dimensions: int = 1024, max_entries: int = 100000):
+        self.dimensions = dimensions
+        self.max_entries = max_entries
+        self._vectors = np.zeros((0, dimensions), dtype=np.float32)
+        self._ids = np.zeros(0, dtype=np.int64)
+        self._size = 0
+        self._document_frequency = np.zeros(dimensions, dtype=np.int64)
+        self._idf = np.ones(dimensions, dtype=np.float32)
+        self._fitted_size = 0
+        self._lock = threading.RLock()
+        self._backlog = [] # Entries recorded while loading, added once the index is built
+        self.loading = False
+        self.built = False
+
+    def _term_frequencies(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        for feature, count in _features(text).items():
+            hashed = zlib.crc32(feature.encode("utf-8"))
+            sign = 1.0 if hashed & 0x80000000 else -1.0
+            vector[hashed % self.dimensions] += sign * (1.0 + math.log(count))
+        return vector
+
+    def _term_frequency_matrix(self, texts: list[str]) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, self.dimensions), dtype=np.float32)
+        return np.vstack([self._term_frequencies(text) for text in texts])
+
+    def _embed(self, text: str) -> np.ndarray:
+        vector = self._term_frequencies(text) * self._idf
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _refit(self) -> None:
+        """Refits the IDF weights on the stored vectors' document frequencies. Caller holds the lock."""
+        idf = _idf_weights(self._document_frequency, self._size)
+        self._vectors = self._vectors[:self._size]
+        self._ids = self._ids[:self._size]
+        self._vectors = _normalize_rows(self._vectors * (idf / self._idf))
+        self._idf = idf
+        self._fitted_size = self._size
+
+    def _drop_oldest(self, drop: int) -> None:
+        """Removes the first drop entries. Caller holds the lock."""
+        if drop <= 0:
+            return
+        # Vectors are non-zero exactly where their term frequencies are (all IDF weights are >= 1)
+        self._document_frequency -= np.count_nonzero(self._vectors[:drop], axis=0)
+        self._ids, self._vectors = self._ids[drop:self._size], self._vectors[drop:self._size]
+        self._size -= drop
+
+    def build(self, entries: Iterable[tuple[int, str]]) -> None:
+        """Replaces the index contents with (classification id, incident description) pairs."""
+        entries = list(entries)[-self.max_entries:]
+        tf = self._term_frequency_matrix([text or "" for _, text in entries])
+        document_frequency = np.count_nonzero(tf, axis=0).astype(np.int64)
+        idf = _idf_weights(document_frequency, len(entries))
+        vectors = _normalize_rows(tf * idf)
+        del tf
+        ids = np.array([row_id for row_id, _ in entries], dtype=np.int64)
+        with self._lock:
+            self._vectors, self._ids, self._size = vectors, ids, len(entries)
+            self._document_frequency, self._idf, self._fitted_size = document_frequency, idf, len(entries)
+            self.built, self.loading = True, False
+            last_id = int(ids.max()) if len(ids) else 0
+            backlog = [(row_id, text) for row_id, text in self._backlog if row_id > last_id]
+            self._backlog = []
+        self.add_many(backlog)
+
+    def begin_loading(self) -> None:
+        """Buffers the entries passed to record until build is called (or cancel_loading)."""
+        with self._lock:
+            self.loading, self._backlog = True, []
+
+    def cancel_loading(self) -> None:
+        with self._lock:
+            self.loading, self._backlog = False, []
+
+    def record(self, entries: Iterable[tuple[int, str]]) -> None:
+        """Adds newly saved classifications if the index is built, or buffers them while it is loading."""
+        entries = list(entries)
+        with self._lock:
+            if not self.built:
+                if self.loading:
+                    self._backlog.extend(entries)
+                return
+        self.add_many(entries)
+
+    def add(self, row_id: int, text: str) -> None:
+        """Adds one incident; the oldest entry is dropped once max_entries is reached."""
+        tf = self._term_frequencies(text or "")
+        with self._lock:
+            if self._size >= self.max_entries:
+                self._drop_oldest(self._size - self.max_entries // 2) # Amortize the shift over many adds
+            if self._size == len(self._vectors):
+                grown = np.zeros((max(16, 2 * self._size), self.dimensions), dtype=np.float32)
+                grown[:self._size] = self._vectors[:self._size]
+                self._vectors = grown
+                self._ids = np.concatenate([self._ids[:self._size], np.zeros(len(grown) - self._size, dtype=np.int64)])
+            vector = tf * self._idf
+            norm = np.linalg.norm(vector)
+            self._vectors[self._size] = vector / norm if norm else vector
+            self._ids[self._size] = row_id
+            self._document_frequency += tf != 0
+            self._size += 1
+            if self._size >= 2 * max(self._fitted_size, 8):
+                self._refit()
+
+    def add_many(self, entries: Iterable[tuple[int, str]]) -> None:
+        """
+        Adds many incidents at once, e.g. after a bulk import.
+
+        The term frequencies are computed before taking the lock, and the vectors are
+        appended and the IDF weights refitted (if due) once for the whole batch.
+        """
+        entries = list(entries)[-self.max_entries:]
+        if not entries:
+            return
+        tf = self._term_frequency_matrix([text or "" for _, text in entries])
+        with self._lock:
+            if self._size + len(entries) > self.max_entries:
+                self._drop_oldest(self._size - max(0, min(self.max_entries // 2, self.max_entries - len(entries))))
+            self._vectors = np.concatenate([self._vectors[:self._size], _normalize_rows(tf * self._idf)])
+            self._ids = np.concatenate([self._ids[:self._size], np.array([row_id for row_id, _ in entries], dtype=np.int64)])
+            self._document_frequency += np.count_nonzero(tf, axis=0)
+            self._size = len(self._ids)
+            if self._size >= 2 * max(self._fitted_size, 8):
+                self._refit()
+
+    def find_similar(self, text: str) -> Optional[tuple[int, float]]:
+        """Returns (classification id, cosine similarity) of the closest stored incident, or None when empty."""
+        query = self._embed(text)
+        with self._lock:
+            if self._size == 0 or not query.any():
+                return None
+            scores = self._vectors[:self._size] @ query
+            best = int(np.argmax(scores))
+            return int(self._ids[best]), float(scores[best])
+
+    def __len__(self) -> int:
+        return self._size
+
+
+similarity_index = SimilarityIndex(settings.SIMILARITY_DIMENSIONS, settings.SIMILARITY_MAX_ENTRIES)
+_loader: Optional[threading.Thread] = None
+_loader_lock = threading.Lock()
+
+def _load_similarity_index(page_size: int = 5000) -> None:
+    """Builds the shared index from the newest stored classifications; classifications saved meanwhile are kept."""
+    from src.database import database
+
+    similarity_index.begin_loading()
+    try:
+        entries, cursor = [], None
+        while len(entries) < similarity_index.max_entries:
+            rows, cursor = database.query_classifications(
+                columns=["id", "incident_description"], after_id=cursor, limit=page_size
+            )
+            entries.extend((row["id"], row["incident_description"]) for row in rows)
+            if cursor is None:
+                break
+        entries.reverse() # Oldest first, so the newest survive eviction
+        similarity_index.build(entries)
+    except BaseException:
+        similarity_index.cancel_loading()
+        raise
+
+def _run_loader() -> None:
+    try:
+        _load_similarity_index()
+    except sqlite3.Error as e:
+        logger.error(f"Database error while loading the similarity index: {e}")
+        return
+    logger.info(f"Similarity index loaded with {len(similarity_index)} incidents")
+
+def start_similarity_index_load() -> None:
+    """
+    Builds the shared index in a background thread, unless it is built or being built.
+
+    Called at startup so that the first requests do not pay for embedding the stored
+    incidents; safe to call repeatedly.
+    """
+    global _loader
+    if settings.SIMILARITY_THRESHOLD > 1:
+        return # Near-duplicate detection is disabled
+    with _loader_lock:
+        if similarity_index.built or (_loader is not None and _loader.is_alive()):
+            return
+        _loader = threading.Thread(target=_run_loader, name="similarity-index-loader", daemon=True)
+        _loader.start()
+
+def record_classification(row_id: int, incident_description: str) -> None:
+    """Adds a newly saved classification to the shared index if it has been loaded."""
+    similarity_index.record([(row_id, incident_description)])
+
+def record_classifications(entries: Iterable[tuple[int, str]]) -> None:
+    """Adds many newly saved (classification id, incident description) pairs to the shared index if it has been loaded."""
+    similarity_index.record(entries)
+
+def find_near_duplicate(incident_description: str, threshold: float = settings.SIMILARITY_THRESHOLD) -> Optional[tuple[int, float]]:
+    """
+    Looks up the stored incident most similar to incident_description.
+
+    The lookup never waits for the index: until it has been loaded in the background
+    (see start_similarity_index_load), no near-duplicate is reported.
+
+    Args:
+        incident_description: The description of the new incident.
+        threshold: Minimum cosine similarity (0-1) for a stored incident to count as a
+            near-duplicate.
+
+    Returns:
+        (classification id, similarity) of the best match at or above threshold, or None.
+    """
+    if threshold > 1:
+        return None # Disabled: cosine similarity never exceeds 1
+    if not similarity_index.built:
+        start_similarity_index_load()
+        return None
+    match = similarity_index.find_similar(incident_description)
+    if match is None or match[1] < threshold:
+        return None
+    return match
@@ -0,0 +1,91 @@
+import json
+from typing import Any
+
+_WHITESPACE = " \t\n\r"
+_decoder = json.JSONDecoder()
+
+class _NeedMoreText(Exception):
+    pass
+
+
+class IncrementalJSONObjectParser:
+    """
+    Parses a JSON object that arrives in pieces and reports each top-level field as soon
+    as its value is complete.
+
+    Only the top level is tracked: a member is decoded once its whole value is in the
+    buffer, so nested values are always reported complete. Numbers and literals are
+    only accepted once a following delimiter has arrived, since "4" may still become
+    "45". Parsing never rescans members that were already reported.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._position = 0
+        self._started = False
+        self.fields = {}
+        self.finished = False
+
+    def _skip_whitespace(self) -> None:
+        while self._position < len(self._buffer) and self._buffer[self._position] in _WHITESPACE:
+            self._position += 1
+
+    def _decode_at(self, position: int) -> tuple[Any, int]:
+        """Decodes the JSON value starting at position. Raises _NeedMoreText while it may be incomplete."""
+        try:
+            value, end = _decoder.raw_decode(self._buffer, position)
+        except json.JSONDecodeError:
+            # Malformed values also land here; the final model validation reports them
+            raise _NeedMoreText
+        if self._buffer[position] not in '"[{' and end >= len(self._buffer):
+            raise _NeedMoreText
+        return value, end
+
+    def feed(self, text: str) -> dict[str, Any]:
+        """
+        Appends text to the buffer and returns the members completed by it.
+
+        Raises:
+            ValueError: If the buffer can no longer become a JSON object.
+        """
+        self._buffer += text
+        completed = {}
+        while not self.finished:
+            self._skip_whitespace()
+            if self._position >= len(self._buffer):
+                break
+            char = self._buffer[self._position]
+            if not self._started:
+                if char != "{":
+                    raise ValueError(f"Expected a JSON object, got {char!r}")
+                self._started = True
+                self._position += 1
+                continue
+            if char == ",":
+                self._position += 1
+                continue
+            if char == "}":
+                self._position += 1
+                self.finished = True
+                break
+            if char != '"':
+                raise ValueError(f"Expected a member name at offset {self._position}, got {char!r}")
+            try:
+                key, end = self._decode_at(self._position)
+                colon = self._buffer.find(":", end)
+                if colon < 0:
+                    break
+                if self._buffer[end:colon].strip():
+                    raise ValueError(f"Expected ':' after member name {key!r}")
+                start = colon + 1
+                while start < len(self._buffer) and self._buffer[start] in _WHITESPACE:
+                    start += 1
+                if start >= len(self._buffer):
+                    break
+                value, end = self._decode_at(start)
+            except _NeedMoreText:
+                break
+            completed[key] = value
+            self._position = end
+        self.fields.update(completed)
+        return completed
@@ -1,4 +1,5 @@
 import os
+import tempfile
 from dotenv import load_dotenv
 
 env_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", ".env"))
@@ -7,12 +8,75 @@ load_dotenv(dotenv_path=env_path)
 class Settings:
     OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
-settings = Settings()
+    # LLM backend: "openai", "fake" (in-process stand-in), "replay" or "record" (captured responses on disk)
+    LLM_BACKEND = os.getenv("LLM_BACKEND", "openai")
+    LLM_REPLAY_DIRECTORY = os.getenv("LLM_REPLAY_DIRECTORY", "llm_recordings")
+    FAKE_LLM_PROFILE = os.getenv("FAKE_LLM_PROFILE", "fast") # instant, fast, realistic or flaky
+    PROMPT_TEMPLATE = os.getenv("PROMPT_TEMPLATE", "compact-v2") # See src/classification/prompts.py
 
-class Settings:
-    OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-    if not OPENAI_API_KEY or OPENAI_API_KEY == "your_openai_api_key_here":
-        raise ValueError("❌ OPENAI_API_KEY not set properly in .env file!")
+    # Long incident reports are condensed to this many tokens before classification
+    INCIDENT_TOKEN_BUDGET = int(os.getenv("INCIDENT_TOKEN_BUDGET", "3000"))
+    CHUNK_TOKENS = int(os.getenv("CHUNK_TOKENS", "2000"))
+    CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "200"))
+    SUMMARY_MODEL = os.getenv("SUMMARY_MODEL", "gpt-4o-mini") # Model used to extract key facts from chunks
+
+    # Worker processes for CPU-heavy document formats (PDF, DOCX)
+    PARSER_PROCESSES = int(os.getenv("PARSER_PROCESSES", "2"))
+    # Extracted document text cached by file hash (in CACHE_DATABASE_FILE)
+    PARSED_TEXT_CACHE_MAX_ENTRIES = int(os.getenv("PARSED_TEXT_CACHE_MAX_ENTRIES", "1000"))
+    PARSED_TEXT_CACHE_TTL_SECONDS = int(os.getenv("PARSED_TEXT_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+
+    # Classification cache (in-process LRU + persistent SQLite tier)
+    CACHE_DATABASE_FILE = os.getenv("CACHE_DATABASE_FILE", "riskloggr_cache.db")
+    CACHE_MEMORY_ENTRIES = int(os.getenv("CACHE_MEMORY_ENTRIES", "256"))
+    CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "10000"))
+    CACHE_TTL_SECONDS = int(os.getenv("CACHE_TTL_SECONDS", str(30 * 24 * 3600)))
+    # Seconds a request waits for an identical in-flight classification before giving up
+    COALESCE_TIMEOUT_SECONDS = float(os.getenv("COALESCE_TIMEOUT_SECONDS", "120"))
+
+    # Batch classification worker pool
+    BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "8"))
+    BATCH_REQUESTS_PER_MINUTE = int(os.getenv("BATCH_REQUESTS_PER_MINUTE", "500"))
+    BATCH_TOKENS_PER_MINUTE = int(os.getenv("BATCH_TOKENS_PER_MINUTE", "30000"))
+    BATCH_MAX_RETRIES = int(os.getenv("BATCH_MAX_RETRIES", "5"))
+
+    # SQLite connection pool
+    DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "8"))
+    DB_BUSY_TIMEOUT_MS = int(os.getenv("DB_BUSY_TIMEOUT_MS", "5000"))
+    DB_CACHE_SIZE_KB = int(os.getenv("DB_CACHE_SIZE_KB", "16000"))
+    DB_MMAP_SIZE = int(os.getenv("DB_MMAP_SIZE", str(256 * 1024 * 1024)))
+
+    # Near-duplicate pre-classifier (set SIMILARITY_THRESHOLD above 1 to always call the LLM)
+    SIMILARITY_THRESHOLD = float(os.getenv("SIMILARITY_THRESHOLD", "0.92"))
+    SIMILARITY_DIMENSIONS = int(os.getenv("SIMILARITY_DIMENSIONS", "1024"))
+    SIMILARITY_MAX_ENTRIES = int(os.getenv("SIMILARITY_MAX_ENTRIES", "100000"))
+
+    # Logging ("text" or "json" lines on stderr)
+    LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+    LOG_FORMAT = os.getenv("LOG_FORMAT", "text")
+
+    # Ingestion daemon (files dropped into INGEST_DIRECTORY are classified once)
+    INGEST_DIRECTORY = os.getenv("INGEST_DIRECTORY", "incoming")
+    INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))
+    INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "16")) # Discovery blocks when this many files are waiting
+    INGEST_POLL_SECONDS = float(os.getenv("INGEST_POLL_SECONDS", "2"))
+    INGEST_SETTLE_SECONDS = float(os.getenv("INGEST_SETTLE_SECONDS", "1")) # Files must be unchanged this long before they are read
+    INGEST_MAX_ATTEMPTS = int(os.getenv("INGEST_MAX_ATTEMPTS", "3"))
+    INGEST_RETRY_SECONDS = float(os.getenv("INGEST_RETRY_SECONDS", "300")) # Files left pending by retryable errors are resubmitted this often
+
+    # Exports prepared in the UI are written here, kept at most EXPORT_FILE_TTL_SECONDS and offered
+    # for download only up to EXPORT_UI_MAX_MB; larger extracts stream from the API's /classifications/export
+    EXPORT_DIRECTORY = os.getenv("EXPORT_DIRECTORY", os.path.join(tempfile.gettempdir(), "riskloggr-exports"))
+    EXPORT_UI_MAX_MB = int(os.getenv("EXPORT_UI_MAX_MB", "50"))
+    EXPORT_FILE_TTL_SECONDS = int(os.getenv("EXPORT_FILE_TTL_SECONDS", "3600"))
+
+    # HTTP API
+    API_JOB_WORKERS = int(os.getenv("API_JOB_WORKERS", "4"))
+    API_JOB_LEASE_SECONDS = float(os.getenv("API_JOB_LEASE_SECONDS", "60")) # Running jobs without a heartbeat for this long are requeued
+
+settings = Settings()
 
-if not settings.OPENAI_API_KEY:
-    print("Warning: OPENAI_API_KEY not found in environment variables or .env file.")
\ No newline at end of file
+# Only the OpenAI backend needs a key (the fake and replay backends run offline); OpenAIBackend.is_configured
+# reports it as unusable without one
+if settings.LLM_BACKEND in ("openai", "record") and not settings.OPENAI_API_KEY:
+    print("Warning: OPENAI_API_KEY not found in environment variables or .env file.")
@@ -0,0 +1,152 @@
+import argparse
+import json
+import sqlite3
+from typing import Callable, Optional, Union, IO
+
+import pandas as pd
+
+from src.database import database
+from src.logging.logger import get_logger
+
+REQUIRED_COLUMNS = ['incident_description', 'basel_ii_category', 'severity_score', 'root_cause', 'control_recommendations']
+OPTIONAL_COLUMNS = ['timestamp', 'framework_tags', 'inherent_risk', 'residual_risk', 'likelihood', 'impact_type']
+IMPORT_CHUNK_SIZE = 10000
+
+logger = get_logger(__name__)
+
+
+class ImportReport:
+    """Outcome of a CSV import: number of rows imported and the rejected rows with reasons."""
+
+    def __init__(self):
+        self.total_rows = 0
+        self.imported = 0
+        self.rejected = [] # dicts with record, reason and the original values
+
+    def rejected_frame(self) -> pd.DataFrame:
+        return pd.DataFrame(self.rejected, columns=['record', 'reason'] + REQUIRED_COLUMNS + OPTIONAL_COLUMNS)
+
+
+def _parse_list_cell(value) -> list[str]:
+    """Parses a list cell written either as a JSON array or as comma-separated text."""
+    if not isinstance(value, str) or not value.strip():
+        return []
+    value = value.strip()
+    if value.startswith("["):
+        try:
+            parsed = json.loads(value)
+            if isinstance(parsed, list):
+                return [str(item).strip() for item in parsed if str(item).strip()]
+        except ValueError:
+            pass
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+def _validate_chunk(chunk: pd.DataFrame) -> tuple[pd.DataFrame, pd.Series]:
+    """
+    Coerces types and validates a whole chunk column-wise.
+
+    Returns:
+        The coerced chunk and a Series holding a rejection reason per row ("" when valid).
+    """
+    for column in OPTIONAL_COLUMNS:
+        if column not in chunk.columns:
+            chunk[column] = None
+
+    reasons = pd.Series("", index=chunk.index, dtype=object)
+    def reject(mask, reason):
+        reasons[mask & (reasons == "")] = reason
+
+    for column in ['incident_description', 'basel_ii_category', 'root_cause', 'control_recommendations']:
+        text = chunk[column].astype("string").str.strip()
+        reject(text.isna() | (text == ""), f"missing {column}")
+        chunk[column] = text
+
+    severity = pd.to_numeric(chunk['severity_score'], errors='coerce')
+    reject(severity.isna(), "severity_score is not a number")
+    reject(severity.notna() & ((severity % 1 != 0) | ~severity.between(1, 5)), "severity_score must be an integer from 1 to 5")
+    chunk['severity_score'] = severity
+
+    # Offsets are converted to UTC and naive values taken as UTC, so every value parses to the same dtype
+    timestamps = pd.to_datetime(chunk['timestamp'], errors='coerce', utc=True)
+    # The format is inferred from the first value of the chunk; values written differently are parsed one by one
+    retry = chunk['timestamp'].notna() & timestamps.isna()
+    if retry.any():
+        timestamps[retry] = pd.to_datetime(chunk.loc[retry, 'timestamp'], errors='coerce', utc=True, format='mixed')
+    reject(chunk['timestamp'].notna() & timestamps.isna(), "timestamp is not a valid date")
+    chunk['timestamp'] = timestamps.dt.tz_convert(None).dt.strftime("%Y-%m-%d %H:%M:%S")
+    return chunk, reasons
+
+def import_legacy_csv(source: Union[str, IO], chunksize: int = IMPORT_CHUNK_SIZE,
+                      progress: Optional[Callable[[ImportReport], None]] = None) -> ImportReport:
+    """
+    Streams a legacy classifications CSV into the database.
+
+    The file is read in chunks of chunksize rows; each chunk is validated and coerced
+    column-wise and its valid rows are written with bulk_insert_classifications in one
+    transaction. Invalid rows are collected in the report instead of aborting the import.
+
+    Args:
+        source: Path or file-like object of the CSV. It must contain REQUIRED_COLUMNS and
+            may contain OPTIONAL_COLUMNS (list columns as JSON arrays or comma-separated).
+        chunksize: Rows per chunk/transaction.
+        progress: Optional callback invoked with the report after each chunk.
+
+    Returns:
+        An ImportReport.
+
+    Raises:
+        ValueError: If required columns are missing.
+    """
+    report = ImportReport()
+    reader = pd.read_csv(source, chunksize=chunksize, dtype=str, keep_default_na=True)
+    for chunk in reader:
+        missing = [column for column in REQUIRED_COLUMNS if column not in chunk.columns]
+        if missing:
+            raise ValueError(f"CSV must contain the following columns: {', '.join(REQUIRED_COLUMNS)}")
+
+        report.total_rows += len(chunk)
+        original = chunk.copy()
+        chunk, reasons = _validate_chunk(chunk)
+        invalid = reasons != ""
+        if invalid.any():
+            rejected = original.reindex(columns=REQUIRED_COLUMNS + OPTIONAL_COLUMNS).loc[invalid].astype(object)
+            rejected = rejected.where(rejected.notna(), None)
+            rejected.insert(0, 'reason', reasons[invalid])
+            # Quoted fields may span lines, so rows are identified by their 1-based record number (header excluded)
+            rejected.insert(0, 'record', rejected.index + 1)
+            report.rejected.extend(rejected.to_dict('records'))
+
+        valid = chunk.loc[~invalid]
+        if not valid.empty:
+            valid = valid.astype(object).where(valid.notna(), None)
+            valid['severity_score'] = valid['severity_score'].astype(int)
+            valid['impact_type'] = valid['impact_type'].map(_parse_list_cell)
+            valid['framework_tags'] = valid['framework_tags'].map(_parse_list_cell)
+            try:
+                database.bulk_insert_classifications(valid[REQUIRED_COLUMNS + OPTIONAL_COLUMNS].to_dict('records'))
+                report.imported += len(valid)
+            except sqlite3.Error as e:
+                logger.error(f"Database error during CSV import: {e}")
+                for record in (valid.index + 1).tolist():
+                    report.rejected.append({'record': record, 'reason': f"database error: {e}"})
+        if progress:
+            progress(report)
+    return report
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Import legacy classifications from a CSV file.")
+    parser.add_argument("csv_file")
+    parser.add_argument("--chunksize", type=int, default=IMPORT_CHUNK_SIZE)
+    parser.add_argument("--rejects", help="Write rejected rows with reasons to this CSV file.")
+    args = parser.parse_args()
+
+    database.initialize_database()
+    result = import_legacy_csv(
+        args.csv_file, chunksize=args.chunksize,
+        progress=lambda r: print(f"Processed {r.total_rows} rows: {r.imported} imported, {len(r.rejected)} rejected")
+    )
+    if args.rejects and result.rejected:
+        result.rejected_frame().to_csv(args.rejects, index=False)
+        print(f"Rejected rows written to {args.rejects}")
+    print(f"Imported {result.imported} of {result.total_rows} rows.")
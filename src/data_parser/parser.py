@@ -1,24 +1,310 @@
+import hashlib
+import multiprocessing
 import os
+import re
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from email import policy
+from email.parser import BytesParser
+from html import unescape
+from typing import IO, Callable, Iterator, NamedTuple, Optional
+from xml.etree import ElementTree
+
+from src.config.config import settings
+from src.database.connection import get_connection
+from src.logging.logger import get_logger
+from src.logging.metrics import timed
+
+logger = get_logger(__name__)
+
+# Bump whenever an extractor changes so that cached texts are extracted again
+PARSER_VERSION = "1"
+HASH_BLOCK_SIZE = 1024 * 1024
+TEXT_BLOCK_SIZE = 64 * 1024
+
+
+class DocumentParser(NamedTuple):
+    name: str
+    extensions: tuple[str, ...] # Lowercase, including the leading dot
+    mime_types: tuple[str, ...]
+    extract: Callable[[str], Iterator[str]] # Yields the text of a file piece by piece (e.g. page by page)
+    cpu_bound: bool # Extracted in the process pool instead of the calling thread
+
+
+_PARSERS = []
+
+def register_parser(name: str, extensions: tuple[str, ...], mime_types: tuple[str, ...] = (), cpu_bound: bool = False):
+    """Decorator registering a text extractor for the given file extensions and MIME types."""
+    def decorator(extract: Callable[[str], Iterator[str]]) -> Callable[[str], Iterator[str]]:
+        _PARSERS.append(DocumentParser(name, extensions, mime_types, extract, cpu_bound))
+        return extract
+    return decorator
+
+def get_parser(path: Optional[str] = None, mime_type: Optional[str] = None) -> Optional[DocumentParser]:
+    """Returns the parser for a file, looked up by extension first and MIME type second."""
+    extension = os.path.splitext(path)[1].lower() if path else None
+    for parser in _PARSERS:
+        if extension in parser.extensions:
+            return parser
+    for parser in _PARSERS:
+        if mime_type in parser.mime_types:
+            return parser
+    return None
+
+def supported_extensions() -> list[str]:
+    """Extensions (without the dot) of every registered format, e.g. for an upload widget."""
+    return [extension.lstrip(".") for parser in _PARSERS for extension in parser.extensions]
+
+
+@register_parser("text", (".txt", ".text", ".log", ".md"), ("text/plain", "text/markdown"))
+def _extract_plain_text(path: str) -> Iterator[str]:
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        while True:
+            block = f.read(TEXT_BLOCK_SIZE)
+            if not block:
+                return
+            yield block
+
+@register_parser("pdf", (".pdf",), ("application/pdf",), cpu_bound=True)
+def _extract_pdf(path: str) -> Iterator[str]:
+    try:
+        from pypdf import PdfReader
+    except ImportError as e:
+        raise ImportError("PDF parsing requires pypdf (pip install pypdf).") from e
+    with open(path, 'rb') as f:
+        reader = PdfReader(f) # Only the cross-reference table is read here; pages are parsed on access
+        for page in reader.pages:
+            yield (page.extract_text() or "").strip() + "\n\n"
+
+_WORD_NAMESPACE = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+@register_parser("docx", (".docx",), ("application/vnd.openxmlformats-officedocument.wordprocessingml.document",), cpu_bound=True)
+def _extract_docx(path: str) -> Iterator[str]:
+    # A .docx is a zip archive; stream word/document.xml paragraph by paragraph instead of building the whole tree
+    with zipfile.ZipFile(path) as archive, archive.open("word/document.xml") as document:
+        for _, element in ElementTree.iterparse(document, events=("end",)):
+            if element.tag == f"{_WORD_NAMESPACE}p":
+                text = "".join(node.text or "" for node in element.iter(f"{_WORD_NAMESPACE}t"))
+                if text:
+                    yield text + "\n"
+                element.clear()
+
+def _html_to_text(html: str) -> str:
+    html = re.sub(r"(?is)<(script|style).*?</\1>", " ", html)
+    html = re.sub(r"(?i)<br\s*/?>|</p>|</div>|</li>|</tr>", "\n", html)
+    return unescape(re.sub(r"<[^>]+>", "", html))
+
+@register_parser("email", (".eml",), ("message/rfc822",))
+def _extract_email(path: str) -> Iterator[str]:
+    with open(path, 'rb') as f:
+        message = BytesParser(policy=policy.default).parse(f)
+    for header in ("Subject", "From", "To", "Date"):
+        if message[header]:
+            yield f"{header}: {message[header]}\n"
+    body = message.get_body(preferencelist=("plain", "html"))
+    if body is not None:
+        content = body.get_content()
+        yield "\n" + (_html_to_text(content) if body.get_content_subtype() == "html" else content)
+
+@register_parser("outlook", (".msg",), ("application/vnd.ms-outlook",))
+def _extract_outlook_message(path: str) -> Iterator[str]:
+    try:
+        import extract_msg
+    except ImportError as e:
+        raise ImportError("Outlook .msg parsing requires extract-msg (pip install extract-msg).") from e
+    message = extract_msg.Message(path)
+    try:
+        for header, value in (("Subject", message.subject), ("From", message.sender),
+                              ("To", message.to), ("Date", message.date)):
+            if value:
+                yield f"{header}: {value}\n"
+        yield "\n" + (message.body or "")
+    finally:
+        message.close()
+
+
+def iter_document_text(path: str, mime_type: Optional[str] = None) -> Iterator[str]:
+    """
+    Streams the text of a document piece by piece without loading the whole file.
+
+    Args:
+        path: Path of the document.
+        mime_type: Optional MIME type, used when the extension is not recognized.
+
+    Returns:
+        An iterator over text pieces (blocks, pages or paragraphs depending on the format).
+
+    Raises:
+        ValueError: If no parser is registered for the file type.
+    """
+    parser = get_parser(path, mime_type)
+    if parser is None:
+        raise ValueError(f"Unsupported file type: {os.path.basename(path)}")
+    return parser.extract(path)
+
+def _extract_text(path: str, mime_type: Optional[str] = None) -> str:
+    # Module-level so that it can be pickled into the process pool
+    return "".join(iter_document_text(path, mime_type)).strip()
+
+def file_hash(path: str) -> str:
+    """Returns the SHA-256 hex digest of a file's contents, read in blocks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+_process_pool = None
+_process_pool_lock = threading.Lock()
+
+def _get_process_pool() -> ProcessPoolExecutor:
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is None:
+            # Forking a multithreaded process (server threads, SQLite connections) can copy held locks; spawn starts clean
+            _process_pool = ProcessPoolExecutor(max_workers=settings.PARSER_PROCESSES,
+                                                mp_context=multiprocessing.get_context("spawn"))
+        return _process_pool
+
+_text_cache_initialized = False
+
+def _ensure_text_cache_table(conn: sqlite3.Connection) -> None:
+    global _text_cache_initialized
+    if _text_cache_initialized:
+        return
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS parsed_text_cache (
+            cache_key TEXT PRIMARY KEY,
+            parser TEXT NOT NULL,
+            text TEXT NOT NULL,
+            created_at REAL NOT NULL
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_parsed_text_cache_created_at ON parsed_text_cache (created_at)')
+    conn.commit()
+    _text_cache_initialized = True
+
+def _cached_text(cache_key: str) -> Optional[str]:
+    try:
+        with get_connection(settings.CACHE_DATABASE_FILE) as conn:
+            _ensure_text_cache_table(conn)
+            row = conn.execute(
+                'SELECT text FROM parsed_text_cache WHERE cache_key = ? AND created_at >= ?',
+                (cache_key, time.time() - settings.PARSED_TEXT_CACHE_TTL_SECONDS)
+            ).fetchone()
+        return row[0] if row is not None else None
+    except sqlite3.Error as e:
+        logger.error(f"Cache error during parsed text lookup: {e}")
+        return None
+
+def _store_text(cache_key: str, parser: str, text: str) -> None:
+    """Caches extracted text, then drops entries older than the TTL and the oldest beyond the size limit."""
+    now = time.time()
+    try:
+        with get_connection(settings.CACHE_DATABASE_FILE) as conn:
+            _ensure_text_cache_table(conn)
+            conn.execute(
+                'INSERT OR REPLACE INTO parsed_text_cache (cache_key, parser, text, created_at) VALUES (?, ?, ?, ?)',
+                (cache_key, parser, text, now)
+            )
+            conn.execute('DELETE FROM parsed_text_cache WHERE created_at < ?', (now - settings.PARSED_TEXT_CACHE_TTL_SECONDS,))
+            conn.execute('''
+                DELETE FROM parsed_text_cache WHERE cache_key IN (
+                    SELECT cache_key FROM parsed_text_cache ORDER BY created_at DESC LIMIT -1 OFFSET ?
+                )
+            ''', (settings.PARSED_TEXT_CACHE_MAX_ENTRIES,))
+    except sqlite3.Error as e:
+        logger.error(f"Cache error during parsed text write: {e}")
+
+def extract_text(path: str, mime_type: Optional[str] = None) -> str:
+    """
+    Returns the text of a document.
+
+    Extracted text is cached by the SHA-256 of the file contents, so uploading or
+    ingesting the same file again does not parse it again (the cache keeps the newest
+    settings.PARSED_TEXT_CACHE_MAX_ENTRIES files for PARSED_TEXT_CACHE_TTL_SECONDS). CPU-heavy formats (PDF,
+    DOCX) are extracted in a pool of settings.PARSER_PROCESSES processes so that they
+    do not hold the GIL of the calling process.
+
+    Args:
+        path: Path of the document.
+        mime_type: Optional MIME type, used when the extension is not recognized.
+
+    Returns:
+        The extracted text.
+
+    Raises:
+        ValueError: If the file type is not supported.
+        ImportError: If the parser needs an optional package that is not installed.
+    """
+    parser = get_parser(path, mime_type)
+    if parser is None:
+        raise ValueError(f"Unsupported file type: {os.path.basename(path)}")
+    cache_key = f"{PARSER_VERSION}:{file_hash(path)}"
+    text = _cached_text(cache_key)
+    if text is not None:
+        return text
+    if parser.cpu_bound:
+        text = _get_process_pool().submit(_extract_text, path, mime_type).result()
+    else:
+        text = _extract_text(path, mime_type)
+    _store_text(cache_key, parser.name, text)
+    logger.info(f"Extracted {len(text)} characters from {os.path.basename(path)}", extra={"parser": parser.name})
+    return text
+
+def parse_uploaded_file(filename: str, upload: IO[bytes], mime_type: Optional[str] = None) -> str:
+    """
+    Extracts the text of an uploaded file object (e.g. a Streamlit UploadedFile).
+
+    The upload is copied in blocks to a temporary file so that every parser can work
+    from a path.
+
+    Args:
+        filename: Original name of the file; its extension selects the parser.
+        upload: Binary file-like object with the contents.
+        mime_type: Optional MIME type reported by the client.
+
+    Returns:
+        The extracted text.
+
+    Raises:
+        ValueError: If the file type is not supported.
+        ImportError: If the parser needs an optional package that is not installed.
+    """
+    suffix = os.path.splitext(filename)[1].lower()
+    with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as temporary_file:
+        shutil.copyfileobj(upload, temporary_file, HASH_BLOCK_SIZE)
+    try:
+        with timed("parse"):
+            return extract_text(temporary_file.name, mime_type)
+    finally:
+        os.unlink(temporary_file.name)
 
 def parse_input(input_data: str, is_file: bool = False) -> str:
     """
     Parses input data, handling freeform text or file paths.
 
     Args:
-        input_data: The input string, either freeform text or a file path.
+        input_data: The input string, either freeform text or a file path. Files can be
+            in any registered format (plain text, PDF, DOCX, .eml or Outlook .msg).
         is_file: Boolean indicating if input_data is a file path.
 
     Returns:
         The parsed text content.
     """
-    if is_file:
-        if not os.path.exists(input_data):
-            return f"Error: File not found at {input_data}"
-        try:
-            with open(input_data, 'r', encoding='utf-8') as f:
-                content = f.read()
-            return content
-        except Exception as e:
-            return f"Error reading file {input_data}: {e}"
-    else:
-        return input_data
\ No newline at end of file
+    with timed("parse"):
+        if is_file:
+            if not os.path.exists(input_data):
+                return f"Error: File not found at {input_data}"
+            try:
+                return extract_text(input_data)
+            except Exception as e:
+                return f"Error reading file {input_data}: {e}"
+        else:
+            return input_data
@@ -0,0 +1,147 @@
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+from src.config.config import settings
+from src.logging.metrics import metrics
+
+class ConnectionPool:
+    """
+    Thread-safe pool of SQLite connections to a single database file.
+
+    Connections are created lazily up to max_connections, configured once with WAL
+    journaling and tuned pragmas, and reused across threads (check_same_thread=False;
+    the pool guarantees a connection is only used by one borrower at a time).
+    """
+
+    def __init__(self, database_file: str, max_connections: int = 8, busy_timeout_ms: int = 5000,
+                 cache_size_kb: int = 16000, mmap_size: int = 256 * 1024 * 1024):
+        self.database_file = database_file
+        self.max_connections = max_connections
+        self.busy_timeout_ms = busy_timeout_ms
+        self.cache_size_kb = cache_size_kb
+        self.mmap_size = mmap_size
+        self._idle = queue.LifoQueue() # Most recently used first keeps page caches warm
+        self._slots = threading.BoundedSemaphore(max_connections)
+        self._all = []
+        self._lock = threading.Lock()
+
+    def _create_connection(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.database_file, timeout=self.busy_timeout_ms / 1000, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode = WAL') # Readers no longer block the writer
+        conn.execute('PRAGMA synchronous = NORMAL') # Durable across application crashes in WAL mode
+        conn.execute(f'PRAGMA busy_timeout = {int(self.busy_timeout_ms)}')
+        conn.execute(f'PRAGMA cache_size = {-int(self.cache_size_kb)}')
+        conn.execute(f'PRAGMA mmap_size = {int(self.mmap_size)}')
+        conn.execute('PRAGMA temp_store = MEMORY')
+        conn.execute('PRAGMA foreign_keys = ON')
+        with self._lock:
+            self._all.append(conn)
+        return conn
+
+    def acquire(self, timeout: Optional[float] = None) -> sqlite3.Connection:
+        """Borrows a connection, waiting up to timeout seconds (default: busy timeout) for a free slot."""
+        timeout = self.busy_timeout_ms / 1000 if timeout is None else timeout
+        start = time.perf_counter()
+        acquired = self._slots.acquire(timeout=timeout)
+        metrics.observe("riskloggr_db_pool_wait_seconds", time.perf_counter() - start)
+        if not acquired:
+            raise sqlite3.OperationalError(f"Connection pool for {self.database_file} exhausted")
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        try:
+            return self._create_connection()
+        except Exception:
+            self._slots.release()
+            raise
+
+    def release(self, conn: sqlite3.Connection) -> None:
+        """Returns a borrowed connection, rolling back anything left uncommitted."""
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            conn.row_factory = None
+            self._idle.put(conn)
+        except sqlite3.Error:
+            # Broken connection: drop it instead of handing it to the next borrower
+            with self._lock:
+                if conn in self._all:
+                    self._all.remove(conn)
+            conn.close()
+        finally:
+            self._slots.release()
+
+    def close(self) -> None:
+        """Closes every connection owned by the pool."""
+        with self._lock:
+            connections, self._all = self._all, []
+        while True:
+            try:
+                self._idle.get_nowait()
+            except queue.Empty:
+                break
+        for conn in connections:
+            conn.close()
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+def get_pool(database_file: str) -> ConnectionPool:
+    """Returns the shared pool for database_file, creating it on first use."""
+    with _pools_lock:
+        pool = _pools.get(database_file)
+        if pool is None:
+            pool = ConnectionPool(
+                database_file,
+                max_connections=settings.DB_POOL_SIZE,
+                busy_timeout_ms=settings.DB_BUSY_TIMEOUT_MS,
+                cache_size_kb=settings.DB_CACHE_SIZE_KB,
+                mmap_size=settings.DB_MMAP_SIZE,
+            )
+            _pools[database_file] = pool
+        return pool
+
+def close_all_pools() -> None:
+    """Closes every pooled connection (e.g. before deleting or replacing a database file)."""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
+
+def begin_immediate(conn: sqlite3.Connection) -> None:
+    """Starts a write transaction, recording how long it waited for the SQLite write lock."""
+    start = time.perf_counter()
+    conn.execute('BEGIN IMMEDIATE')
+    metrics.observe("riskloggr_db_lock_wait_seconds", time.perf_counter() - start)
+
+@contextmanager
+def get_connection(database_file: str) -> Iterator[sqlite3.Connection]:
+    """
+    Borrows a pooled connection for the duration of a with block.
+
+    The transaction is committed when the block exits normally and rolled back if it
+    raises; the connection is then returned to the pool.
+
+    Example:
+        with get_connection(DATABASE_FILE) as conn:
+            conn.execute('INSERT INTO download_logs (download_type) VALUES (?)', ('csv',))
+    """
+    pool = get_pool(database_file)
+    conn = pool.acquire()
+    try:
+        yield conn
+        if conn.in_transaction:
+            conn.commit()
+    except BaseException:
+        if conn.in_transaction:
+            conn.rollback()
+        raise
+    finally:
+        pool.release(conn)
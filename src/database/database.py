@@ -1,171 +1,749 @@
 import sqlite3
 import os
-from src.models import RiskClassification # Import RiskClassification from models.py
+import re
+from src.models import ClassificationBatch, RiskClassification, split_stored_recommendations # Import RiskClassification from models.py
 import json # Import json for handling JSON strings
-from typing import Optional
+from datetime import date, datetime
+from typing import Iterable, Optional, Union
+from src.classification.similarity import record_classification, record_classifications
+from src.database.connection import begin_immediate, get_connection
+from src.database.rollups import create_rollups, populate_rollups
+from src.logging.logger import get_logger
+from src.logging.metrics import timed
+from src.frameworks.framework_router import FRAMEWORKS, split_framework_tags
 
 DATABASE_FILE = 'riskloggr.db'
 
+logger = get_logger(__name__)
+
+def _recommendation_list(control_recommendations) -> list[str]:
+    """Returns control recommendations as a list, splitting stored newline-joined text on newlines only."""
+    if isinstance(control_recommendations, list):
+        return [rec for rec in control_recommendations if rec]
+    return split_stored_recommendations(control_recommendations or "")
+
+def parse_json_list(value) -> list:
+    """Parses a stored JSON list column, treating NULL and malformed values as empty."""
+    try:
+        parsed = json.loads(value) if value else []
+    except (TypeError, ValueError):
+        return []
+    return parsed if isinstance(parsed, list) else []
+
+def _insert_child_rows(conn: sqlite3.Connection, records: list[tuple]) -> None:
+    """
+    Inserts the normalized impact, framework tag and control rows of many classifications.
+
+    Args:
+        records: (row_id, impact_type list, framework_tags list, control_recommendations) tuples.
+    """
+    impacts, tags, controls = [], [], []
+    for row_id, impact_type, framework_tags, control_recommendations in records:
+        impacts.extend((row_id, impact) for impact in impact_type or [] if impact)
+        tags.extend((row_id, framework, tag) for framework, tag in split_framework_tags(framework_tags))
+        controls.extend((row_id, position, rec) for position, rec in enumerate(_recommendation_list(control_recommendations)))
+    conn.executemany('INSERT OR IGNORE INTO classification_impacts (classification_id, impact_type) VALUES (?, ?)', impacts)
+    conn.executemany('INSERT OR IGNORE INTO classification_framework_tags (classification_id, framework, tag) VALUES (?, ?, ?)', tags)
+    conn.executemany('INSERT INTO classification_controls (classification_id, position, recommendation) VALUES (?, ?, ?)', controls)
+
+def _write_child_rows(conn: sqlite3.Connection, row_id: int, impact_type: list[str],
+                      framework_tags: list[str], control_recommendations) -> None:
+    """Replaces the normalized impact, framework tag and control rows of one classification."""
+    conn.execute('DELETE FROM classification_impacts WHERE classification_id = ?', (row_id,))
+    conn.execute('DELETE FROM classification_framework_tags WHERE classification_id = ?', (row_id,))
+    conn.execute('DELETE FROM classification_controls WHERE classification_id = ?', (row_id,))
+    _insert_child_rows(conn, [(row_id, impact_type, framework_tags, control_recommendations)])
+
+def _migration_1_child_tables(conn: sqlite3.Connection) -> None:
+    """Moves impact types, framework tags and control recommendations into indexed child tables."""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS classification_impacts (
+            classification_id INTEGER NOT NULL REFERENCES classifications (id) ON DELETE CASCADE,
+            impact_type TEXT NOT NULL,
+            PRIMARY KEY (classification_id, impact_type)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_classification_impacts_type ON classification_impacts (impact_type, classification_id)')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS classification_framework_tags (
+            classification_id INTEGER NOT NULL REFERENCES classifications (id) ON DELETE CASCADE,
+            framework TEXT NOT NULL,
+            tag TEXT NOT NULL,
+            PRIMARY KEY (classification_id, framework, tag)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_classification_framework_tags_framework ON classification_framework_tags (framework, classification_id)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_classification_framework_tags_tag ON classification_framework_tags (tag, classification_id)')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS classification_controls (
+            classification_id INTEGER NOT NULL REFERENCES classifications (id) ON DELETE CASCADE,
+            position INTEGER NOT NULL,
+            recommendation TEXT NOT NULL,
+            PRIMARY KEY (classification_id, position)
+        ) WITHOUT ROWID
+    ''')
+
+    # Backfill from the JSON/newline-joined columns in chunks
+    last_id = 0
+    while True:
+        rows = conn.execute('''
+            SELECT id, impact_type, framework_tags, control_recommendations
+            FROM classifications WHERE id > ? ORDER BY id LIMIT 5000
+        ''', (last_id,)).fetchall()
+        if not rows:
+            break
+        _insert_child_rows(conn, [
+            (row_id, parse_json_list(impact_type), parse_json_list(framework_tags), control_recommendations)
+            for row_id, impact_type, framework_tags, control_recommendations in rows
+        ])
+        last_id = rows[-1][0]
+
+def _migration_2_classification_jobs(conn: sqlite3.Connection) -> None:
+    """Adds the persistent job table used by the API's asynchronous classification queue."""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS classification_jobs (
+            id TEXT PRIMARY KEY,
+            status TEXT NOT NULL DEFAULT 'queued',
+            incident_description TEXT NOT NULL,
+            classification_id INTEGER REFERENCES classifications (id) ON DELETE SET NULL,
+            error TEXT,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            started_at DATETIME,
+            finished_at DATETIME
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_classification_jobs_status ON classification_jobs (status, created_at)')
+
+def _migration_3_ingested_files(conn: sqlite3.Connection) -> None:
+    """Adds the manifest of files seen by the ingestion daemon, keyed by content hash."""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS ingested_files (
+            file_hash TEXT PRIMARY KEY,
+            path TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            classification_id INTEGER REFERENCES classifications (id) ON DELETE SET NULL,
+            error TEXT,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            discovered_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            finished_at DATETIME
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_ingested_files_status ON ingested_files (status, discovered_at)')
+
+def _migration_4_full_text_search(conn: sqlite3.Connection) -> None:
+    """Adds an FTS5 index over the free-text columns, kept in sync with classifications by triggers."""
+    # External-content table: the index stores only tokens, snippets are read back from classifications
+    conn.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS classifications_fts USING fts5(
+            incident_description, root_cause, control_recommendations,
+            content='classifications', content_rowid='id', tokenize='porter unicode61 remove_diacritics 2'
+        )
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS classifications_fts_insert AFTER INSERT ON classifications BEGIN
+            INSERT INTO classifications_fts (rowid, incident_description, root_cause, control_recommendations)
+            VALUES (new.id, new.incident_description, new.root_cause, new.control_recommendations);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS classifications_fts_delete AFTER DELETE ON classifications BEGIN
+            INSERT INTO classifications_fts (classifications_fts, rowid, incident_description, root_cause, control_recommendations)
+            VALUES ('delete', old.id, old.incident_description, old.root_cause, old.control_recommendations);
+        END
+    ''')
+    # Only edits of the indexed columns reindex a row (re-tagging framework_tags does not)
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS classifications_fts_update
+        AFTER UPDATE OF incident_description, root_cause, control_recommendations ON classifications BEGIN
+            INSERT INTO classifications_fts (classifications_fts, rowid, incident_description, root_cause, control_recommendations)
+            VALUES ('delete', old.id, old.incident_description, old.root_cause, old.control_recommendations);
+            INSERT INTO classifications_fts (rowid, incident_description, root_cause, control_recommendations)
+            VALUES (new.id, new.incident_description, new.root_cause, new.control_recommendations);
+        END
+    ''')
+    conn.execute("INSERT INTO classifications_fts (classifications_fts) VALUES ('rebuild')") # Index existing rows
+
+def _migration_5_rollups(conn: sqlite3.Connection) -> None:
+    """Adds the dashboard rollup tables (see src.database.rollups) and fills them from the existing rows."""
+    create_rollups(conn)
+    populate_rollups(conn)
+
+def _migration_6_job_leases(conn: sqlite3.Connection) -> None:
+    """Adds worker leases and retry delays to classification_jobs (see src.api.jobs)."""
+    conn.execute('ALTER TABLE classification_jobs ADD COLUMN worker_id TEXT')
+    conn.execute('ALTER TABLE classification_jobs ADD COLUMN heartbeat_at DATETIME')
+    conn.execute('ALTER TABLE classification_jobs ADD COLUMN not_before DATETIME')
+
+# Schema migrations; entry i upgrades the database to schema version i + 1 (PRAGMA user_version)
+SCHEMA_MIGRATIONS = [
+    _migration_1_child_tables,
+    _migration_2_classification_jobs,
+    _migration_3_ingested_files,
+    _migration_4_full_text_search,
+    _migration_5_rollups,
+    _migration_6_job_leases,
+]
+
+def apply_migrations(conn: sqlite3.Connection) -> None:
+    """Applies every pending schema migration, each in its own transaction."""
+    for target_version, migration in enumerate(SCHEMA_MIGRATIONS, start=1):
+        begin_immediate(conn) # Serializes concurrent initializers
+        version = conn.execute('PRAGMA user_version').fetchone()[0]
+        if version >= target_version:
+            conn.commit()
+            continue
+        migration(conn)
+        conn.execute(f'PRAGMA user_version = {target_version}')
+        conn.commit()
+        logger.info(f"Database migrated to schema version {target_version}")
+
 def initialize_database():
     """Initializes the SQLite database and creates the table if it doesn't exist."""
-    conn = None
     try:
-        conn = sqlite3.connect(DATABASE_FILE)
-        cursor = conn.cursor()
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS classifications (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-                basel_ii_category TEXT,
-                severity_score INTEGER,
-                root_cause TEXT,
-                control_recommendations TEXT,
-                incident_description TEXT,
-                framework_tags TEXT,
-                inherent_risk TEXT,
-                residual_risk TEXT,
-                likelihood TEXT,
-                impact_type TEXT
-            )
-        ''')
-
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS download_logs (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-                user_identity TEXT DEFAULT 'anonymous',
-                download_type TEXT
-            )
-        ''')
+        with get_connection(DATABASE_FILE) as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS classifications (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+                    basel_ii_category TEXT,
+                    severity_score INTEGER,
+                    root_cause TEXT,
+                    control_recommendations TEXT,
+                    incident_description TEXT,
+                    framework_tags TEXT,
+                    inherent_risk TEXT,
+                    residual_risk TEXT,
+                    likelihood TEXT,
+                    impact_type TEXT
+                )
+            ''')
 
-        conn.commit()
-        print(f"Database initialized: {DATABASE_FILE}")
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS download_logs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+                    user_identity TEXT DEFAULT 'anonymous',
+                    download_type TEXT
+                )
+            ''')
+
+            # Databases created before the risk profile fields existed lack these columns
+            existing_columns = {row[1] for row in cursor.execute('PRAGMA table_info(classifications)')}
+            for column in ("framework_tags", "inherent_risk", "residual_risk", "likelihood", "impact_type"):
+                if column not in existing_columns:
+                    cursor.execute(f'ALTER TABLE classifications ADD COLUMN {column} TEXT')
+
+            # Indexes backing the filters of query_classifications
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_classifications_timestamp ON classifications (timestamp)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_classifications_category ON classifications (basel_ii_category, id)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_classifications_severity ON classifications (severity_score, id)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_classifications_likelihood ON classifications (likelihood, id)')
+
+            apply_migrations(conn)
+        logger.info(f"Database initialized: {DATABASE_FILE}")
     except sqlite3.Error as e:
-        print(f"Database error during initialization: {e}")
-    finally:
-        if conn:
-            conn.close()
+        logger.error(f"Database error during initialization: {e}")
 
-def save_classification_result(incident_description: str, classification: RiskClassification) -> Optional[int]:
-    """Saves a classification result to the database and returns the row ID."""
-    conn = None
-    row_id = None
-    try:
-        conn = sqlite3.connect(DATABASE_FILE)
-        cursor = conn.cursor()
+def insert_classification(conn: sqlite3.Connection, incident_description: str, classification: RiskClassification) -> int:
+    """
+    Inserts a classification and its child rows on conn and returns the row ID.
 
-        # FIIIXED Extract the field from the object
-        control_recommendations = classification.control_recommendations
-        if isinstance(control_recommendations, list):
-            control_recommendations = "\n".join(control_recommendations)
+    The caller owns the transaction, so the insert can be committed atomically with
+    other writes (e.g. the ingestion manifest). Call record_classification once the
+    transaction has committed.
+    """
+    # FIIIXED Extract the field from the object
+    control_recommendations = classification.control_recommendations
+    if isinstance(control_recommendations, list):
+        control_recommendations = "\n".join(control_recommendations)
 
-        cursor.execute('''
-            INSERT INTO classifications (basel_ii_category, severity_score, root_cause, control_recommendations, incident_description, framework_tags, inherent_risk, residual_risk, likelihood, impact_type)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            classification.basel_ii_category,
-            classification.severity_score,
-            classification.root_cause,
-            control_recommendations,
-            incident_description,
-            json.dumps(classification.framework_tags), # Store list as JSON string
-            classification.inherent_risk,
-            classification.residual_risk,
-            classification.likelihood,
-            json.dumps(classification.impact_type) # Store list as JSON string
-        ))
+    cursor = conn.execute('''
+        INSERT INTO classifications (basel_ii_category, severity_score, root_cause, control_recommendations, incident_description, framework_tags, inherent_risk, residual_risk, likelihood, impact_type)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', (
+        classification.basel_ii_category,
+        classification.severity_score,
+        classification.root_cause,
+        control_recommendations,
+        incident_description,
+        json.dumps(classification.framework_tags), # Store list as JSON string
+        classification.inherent_risk,
+        classification.residual_risk,
+        classification.likelihood,
+        json.dumps(classification.impact_type) # Store list as JSON string
+    ))
+    row_id = cursor.lastrowid
+    _write_child_rows(conn, row_id, classification.impact_type, classification.framework_tags,
+                      classification.control_recommendations)
+    return row_id
 
-        conn.commit()
-        row_id = cursor.lastrowid
-        print(f"Classification result saved to database with ID: {row_id}")
+def save_classification_result(incident_description: str, classification: RiskClassification) -> Optional[int]:
+    """Saves a classification result to the database and returns the row ID."""
+    try:
+        with timed("db_write"), get_connection(DATABASE_FILE) as conn:
+            begin_immediate(conn)
+            row_id = insert_classification(conn, incident_description, classification)
+        record_classification(row_id, incident_description)
+        logger.info(f"Classification result saved to database with ID: {row_id}")
         return row_id
     except sqlite3.Error as e:
-        print(f"Database error during save: {e}")
+        logger.error(f"Database error during save: {e}")
         return None
-    finally:
-        if conn:
-            conn.close()
+
+def bulk_insert_classifications(records: list[dict]) -> list[int]:
+    """
+    Inserts many classifications, with their child rows, in a single transaction.
+
+    Ids are assigned up front under BEGIN IMMEDIATE so that parent and child rows can
+    be written with executemany. Intended for bulk paths such as the legacy CSV import.
+
+    Args:
+        records: Dicts with the classification fields (incident_description,
+            basel_ii_category, severity_score, root_cause, control_recommendations,
+            framework_tags, inherent_risk, residual_risk, likelihood, impact_type and an
+            optional timestamp). List fields are given as Python lists.
+
+    Returns:
+        The ids of the inserted rows, in input order.
+
+    Raises:
+        sqlite3.Error: The whole batch is rolled back.
+    """
+    if not records:
+        return []
+    with timed("db_write"), get_connection(DATABASE_FILE) as conn:
+        begin_immediate(conn)
+        last_id = conn.execute('''
+            SELECT MAX(COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'classifications'), 0),
+                       COALESCE((SELECT MAX(id) FROM classifications), 0))
+        ''').fetchone()[0]
+        row_ids = list(range(last_id + 1, last_id + 1 + len(records)))
+        conn.executemany('''
+            INSERT INTO classifications (id, timestamp, basel_ii_category, severity_score, root_cause, control_recommendations, incident_description, framework_tags, inherent_risk, residual_risk, likelihood, impact_type)
+            VALUES (?, COALESCE(?, CURRENT_TIMESTAMP), ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', [
+            (
+                row_id,
+                record.get("timestamp"),
+                record["basel_ii_category"],
+                record["severity_score"],
+                record["root_cause"],
+                "\n".join(_recommendation_list(record["control_recommendations"])),
+                record["incident_description"],
+                json.dumps(record.get("framework_tags") or []),
+                record.get("inherent_risk"),
+                record.get("residual_risk"),
+                record.get("likelihood"),
+                json.dumps(record.get("impact_type") or []),
+            )
+            for row_id, record in zip(row_ids, records)
+        ])
+        _insert_child_rows(conn, [
+            (row_id, record.get("impact_type"), record.get("framework_tags"), record["control_recommendations"])
+            for row_id, record in zip(row_ids, records)
+        ])
+    record_classifications((row_id, record["incident_description"]) for row_id, record in zip(row_ids, records))
+    return row_ids
+
 def get_all_classifications():
     """Fetches all classification records from the database."""
-    conn = None
     classifications = []
     try:
-        conn = sqlite3.connect(DATABASE_FILE)
-        conn.row_factory = sqlite3.Row # Access columns by name
-        cursor = conn.cursor()
-        cursor.execute('SELECT * FROM classifications')
-        classifications = cursor.fetchall()
+        with get_connection(DATABASE_FILE) as conn:
+            conn.row_factory = sqlite3.Row # Access columns by name
+            classifications = conn.execute('SELECT * FROM classifications').fetchall()
     except sqlite3.Error as e:
-        print(f"Database error during fetch: {e}")
-    finally:
-        if conn:
-            conn.close()
+        logger.error(f"Database error during fetch: {e}")
     return classifications
 
+def get_classification(row_id: int) -> Optional[dict]:
+    """Fetches one classification by id as a dict with list fields decoded, or None if it does not exist."""
+    try:
+        with get_connection(DATABASE_FILE) as conn:
+            conn.row_factory = sqlite3.Row
+            row = conn.execute('SELECT * FROM classifications WHERE id = ?', (row_id,)).fetchone()
+    except sqlite3.Error as e:
+        logger.error(f"Database error during fetch: {e}")
+        return None
+    return classification_row_to_dict(row) if row is not None else None
+
+def classification_row_to_dict(row: sqlite3.Row) -> dict:
+    """Converts a classifications row to a dict, decoding the JSON and newline-joined list columns."""
+    record = dict(row)
+    for column in ("framework_tags", "impact_type"):
+        if column in record:
+            record[column] = parse_json_list(record[column])
+    if "control_recommendations" in record:
+        record["control_recommendations"] = split_stored_recommendations(record["control_recommendations"] or "")
+    return record
+
+CLASSIFICATION_COLUMNS = (
+    "id", "timestamp", "basel_ii_category", "severity_score", "root_cause", "control_recommendations",
+    "incident_description", "framework_tags", "inherent_risk", "residual_risk", "likelihood", "impact_type",
+)
+
+def _format_timestamp(value: Union[str, date, datetime]) -> str:
+    """Converts a date/datetime to the 'YYYY-MM-DD HH:MM:SS' form SQLite's CURRENT_TIMESTAMP stores."""
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%d %H:%M:%S")
+    if isinstance(value, date):
+        return value.strftime("%Y-%m-%d 00:00:00")
+    return str(value)
+
+def _in_clause(column: str, value) -> tuple[str, list]:
+    """Builds `column = ?` for a scalar or `column IN (?, ...)` for a collection."""
+    if isinstance(value, (list, tuple, set)):
+        values = list(value)
+        return f"{column} IN ({', '.join('?' for _ in values)})", values
+    return f"{column} = ?", [value]
+
+def build_classification_filters(start=None, end=None, basel_ii_category=None, severity_score=None,
+                                 likelihood=None, framework=None) -> tuple[list[str], list]:
+    """
+    Builds SQL WHERE conditions for the common classification filters.
+
+    Args:
+        start: Inclusive lower bound on timestamp (date, datetime or SQLite timestamp string).
+        end: Exclusive upper bound on timestamp.
+        basel_ii_category: A category or a collection of categories.
+        severity_score: A score or a collection of scores.
+        likelihood: A likelihood or a collection of likelihoods.
+        framework: Framework name (e.g. "GDPR") or tag prefix (e.g. "GDPR - Article 32").
+
+    Returns:
+        A (conditions, params) tuple; conditions are to be joined with AND.
+    """
+    conditions, params = [], []
+    if start is not None:
+        conditions.append("timestamp >= ?")
+        params.append(_format_timestamp(start))
+    if end is not None:
+        conditions.append("timestamp < ?")
+        params.append(_format_timestamp(end))
+    for column, value in (("basel_ii_category", basel_ii_category), ("severity_score", severity_score), ("likelihood", likelihood)):
+        if value is not None:
+            condition, values = _in_clause(column, value)
+            conditions.append(condition)
+            params.extend(values)
+    if framework is not None:
+        if framework in FRAMEWORKS:
+            conditions.append("id IN (SELECT classification_id FROM classification_framework_tags WHERE framework = ?)")
+            params.append(framework)
+        else:
+            # Tag prefix match as an index range scan
+            conditions.append("id IN (SELECT classification_id FROM classification_framework_tags WHERE tag >= ? AND tag < ?)")
+            params.extend([framework, framework + "\U0010ffff"])
+    return conditions, params
+
+def query_classifications(columns: Optional[Iterable[str]] = None, after_id: Optional[int] = None,
+                          limit: int = 100, descending: bool = True, **filters) -> tuple[list, Optional[int]]:
+    """
+    Fetches one page of classifications using keyset pagination.
+
+    Args:
+        columns: Columns to return (defaults to every column). Only the columns a caller
+            needs should be requested; incident_description in particular can be large.
+        after_id: Cursor returned by the previous page, or None for the first page.
+        limit: Maximum number of rows in the page.
+        descending: Newest first when True, oldest first otherwise.
+        **filters: Filters accepted by build_classification_filters.
+
+    Returns:
+        A (rows, next_cursor) tuple. rows are sqlite3.Row objects; next_cursor is None on
+        the last page.
+
+    Raises:
+        sqlite3.Error: Database errors (e.g. a lock timeout) are raised rather than returned
+            as an empty page, which paging callers would mistake for the end of the data.
+    """
+    columns = list(columns) if columns else list(CLASSIFICATION_COLUMNS)
+    unknown = set(columns) - set(CLASSIFICATION_COLUMNS)
+    if unknown:
+        raise ValueError(f"Unknown classification columns: {', '.join(sorted(unknown))}")
+    if "id" not in columns:
+        columns.insert(0, "id") # Needed for the cursor
+
+    conditions, params = build_classification_filters(**filters)
+    if after_id is not None:
+        conditions.append("id < ?" if descending else "id > ?")
+        params.append(after_id)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    order = "DESC" if descending else "ASC"
+
+    with get_connection(DATABASE_FILE) as conn:
+        conn.row_factory = sqlite3.Row
+        rows = conn.execute(
+            f"SELECT {', '.join(columns)} FROM classifications {where} ORDER BY id {order} LIMIT ?",
+            params + [limit]
+        ).fetchall()
+    next_cursor = rows[-1]["id"] if len(rows) == limit else None
+    return rows, next_cursor
+
+def load_classification_batch(page_size: int = 5000, **filters) -> ClassificationBatch:
+    """
+    Loads every matching classification into a columnar ClassificationBatch, oldest first.
+
+    Rows are trusted and not validated, which makes this the cheap way for bulk
+    consumers (dashboards, analytics, re-processing) to read large result sets.
+
+    Args:
+        page_size: Rows fetched per query.
+        **filters: Filters accepted by build_classification_filters.
+
+    Raises:
+        sqlite3.Error: A page could not be read; no partial batch is returned.
+    """
+    rows, cursor = [], None
+    while True:
+        page, cursor = query_classifications(after_id=cursor, limit=page_size, descending=False, **filters)
+        rows.extend(page)
+        if cursor is None:
+            return ClassificationBatch.from_rows(rows)
+
+def count_classifications(**filters) -> int:
+    """Counts the classifications matching the filters accepted by build_classification_filters."""
+    conditions, params = build_classification_filters(**filters)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    try:
+        with get_connection(DATABASE_FILE) as conn:
+            return conn.execute(f"SELECT COUNT(*) FROM classifications {where}", params).fetchone()[0]
+    except sqlite3.Error as e:
+        logger.error(f"Database error during count: {e}")
+        return 0
+
+def get_heatmap_cells(samples_per_cell: int = 3, sample_length: int = 160, **filters) -> list[dict]:
+    """
+    Aggregates classifications into (likelihood, impact_type) heatmap cells inside SQLite.
+
+    Impact types are joined from classification_impacts, counted per cell and the most
+    recent descriptions of each cell are returned as tooltip samples, so the payload size
+    depends on the number of cells rather than the number of stored incidents.
+
+    Args:
+        samples_per_cell: Number of sample descriptions returned per cell.
+        sample_length: Samples are truncated to this many characters.
+        **filters: Filters accepted by build_classification_filters.
+
+    Returns:
+        A list of dicts with likelihood, impact_type, count and samples keys.
+    """
+    conditions, params = build_classification_filters(**filters)
+    where = "".join(f" AND c.{condition}" for condition in conditions)
+    cells = {}
+    try:
+        with get_connection(DATABASE_FILE) as conn:
+            rows = conn.execute(f'''
+                WITH expanded AS (
+                    SELECT c.id AS id, c.likelihood AS likelihood, i.impact_type AS impact_type,
+                           c.incident_description AS description
+                    FROM classification_impacts i
+                    JOIN classifications c ON c.id = i.classification_id
+                    WHERE 1 = 1{where}
+                ),
+                ranked AS (
+                    SELECT likelihood, impact_type, description,
+                           COUNT(*) OVER (PARTITION BY likelihood, impact_type) AS cell_count,
+                           ROW_NUMBER() OVER (PARTITION BY likelihood, impact_type ORDER BY id DESC) AS sample_rank
+                    FROM expanded
+                )
+                SELECT likelihood, impact_type, cell_count, substr(description, 1, ?)
+                FROM ranked WHERE sample_rank <= ?
+                ORDER BY likelihood, impact_type, sample_rank
+            ''', params + [sample_length, samples_per_cell]).fetchall()
+        for likelihood, impact_type, cell_count, description in rows:
+            cell = cells.setdefault((likelihood, impact_type), {
+                "likelihood": likelihood, "impact_type": impact_type, "count": cell_count, "samples": []
+            })
+            if description:
+                cell["samples"].append(description)
+    except sqlite3.Error as e:
+        logger.error(f"Database error during heatmap aggregation: {e}")
+    return list(cells.values())
+
+# Columns of classifications_fts in index order, with their bm25 weights (matches in the root cause rank highest)
+SEARCH_COLUMNS = ("incident_description", "root_cause", "control_recommendations")
+SEARCH_COLUMN_WEIGHTS = (1.0, 2.0, 0.5)
+# Searches rank and page through at most the newest SEARCH_RANK_WINDOW matches
+SEARCH_RANK_WINDOW = 10000
+_HIGHLIGHT_START, _HIGHLIGHT_END = "\x02", "\x03"
+
+def build_search_query(text: str) -> Optional[str]:
+    """
+    Turns free text into a safe FTS5 query.
+
+    Quoted phrases are kept as phrases and every other word becomes a quoted term, so
+    FTS5 operators and punctuation typed by users can never cause a syntax error. All
+    terms must match. A word ending in * is matched as a prefix (e.g. phish*); prefix
+    terms are slower on very common prefixes, so they are never added implicitly.
+
+    Returns:
+        The MATCH expression, or None when text contains no searchable words.
+    """
+    terms = []
+    for phrase, word in re.findall(r'"([^"]*)"|([^\s"]+)', text or ""):
+        tokens = re.findall(r"\w+", phrase or word)
+        if tokens:
+            terms.append('"' + " ".join(tokens) + '"' + ("*" if word.endswith("*") else ""))
+    return " ".join(terms) if terms else None
+
+def _split_highlights(marked: str) -> tuple[str, list[tuple[int, int]]]:
+    """Removes the highlight markers from a snippet and returns the text with (start, end) offsets of the matches."""
+    text, highlights, start = [], [], None
+    length = 0
+    for part in re.split(f"([{_HIGHLIGHT_START}{_HIGHLIGHT_END}])", marked):
+        if part == _HIGHLIGHT_START:
+            start = length
+        elif part == _HIGHLIGHT_END:
+            if start is not None:
+                highlights.append((start, length))
+            start = None
+        else:
+            text.append(part)
+            length += len(part)
+    return "".join(text), highlights
+
+def search_classifications(query: str, limit: int = 20, offset: int = 0, snippet_tokens: int = 24,
+                           **filters) -> tuple[list[dict], int]:
+    """
+    Ranked full-text search over incident descriptions, root causes and control recommendations.
+
+    Uses the classifications_fts index, so the cost depends on the number of matches
+    rather than the size of the table. Only the newest SEARCH_RANK_WINDOW matches are
+    ranked, and every page is cut from that same ranking, so paging never repeats or
+    skips results.
+
+    Args:
+        query: Free text (see build_search_query); "quoted phrases" are matched as phrases.
+        limit: Maximum number of results in the page.
+        offset: Number of results to skip (page * limit).
+        snippet_tokens: Approximate length of each snippet in tokens.
+        **filters: Filters accepted by build_classification_filters.
+
+    Returns:
+        A (results, total) tuple; total counts the ranked matches, at most
+        SEARCH_RANK_WINDOW. Each result has id, timestamp, basel_ii_category,
+        severity_score, likelihood, score (bm25, lower is better) and snippets: a dict
+        mapping each matching column to {"text": ..., "highlights": [(start, end), ...]},
+        the offsets locating the matched terms in the snippet text.
+    """
+    match = build_search_query(query)
+    if match is None:
+        return [], 0
+    conditions, params = build_classification_filters(**filters)
+    where = "".join(f" AND c.{condition}" for condition in conditions)
+    weights = ", ".join(str(weight) for weight in SEARCH_COLUMN_WEIGHTS)
+    snippets = ", ".join(
+        f"snippet(classifications_fts, {index}, '{_HIGHLIGHT_START}', '{_HIGHLIGHT_END}', '…', {int(snippet_tokens)})"
+        for index in range(len(SEARCH_COLUMNS))
+    )
+    # Filters need the classifications columns; without filters the index alone answers
+    source = "classifications_fts"
+    if conditions:
+        source += " JOIN classifications c ON c.id = classifications_fts.rowid"
+    results, total = [], 0
+    try:
+        with timed("search"), get_connection(DATABASE_FILE) as conn:
+            total = conn.execute(
+                f"SELECT COUNT(*) FROM (SELECT 1 FROM {source} WHERE classifications_fts MATCH ?{where} LIMIT ?)",
+                [match] + params + [SEARCH_RANK_WINDOW + 1]
+            ).fetchone()[0]
+            # BM25 must score every ranked match, so very common terms rank only the newest matches
+            window = ""
+            if total > SEARCH_RANK_WINDOW:
+                total = SEARCH_RANK_WINDOW
+                lowest_id = conn.execute(f'''
+                    SELECT classifications_fts.rowid FROM {source} WHERE classifications_fts MATCH ?{where}
+                    ORDER BY classifications_fts.rowid DESC LIMIT 1 OFFSET ?
+                ''', [match] + params + [SEARCH_RANK_WINDOW - 1]).fetchone()[0]
+                window = f" AND classifications_fts.rowid >= {int(lowest_id)}"
+            if total <= offset:
+                return [], total
+            # Rank first, then build snippets for the page only instead of for every match.
+            # Ties are broken by id so that consecutive pages agree on the order.
+            page = conn.execute(f'''
+                SELECT classifications_fts.rowid, bm25(classifications_fts, {weights}) AS score
+                FROM {source} WHERE classifications_fts MATCH ?{where}{window}
+                ORDER BY score, classifications_fts.rowid DESC LIMIT ? OFFSET ?
+            ''', [match] + params + [limit, offset]).fetchall()
+            scores = dict(page)
+            placeholders = ", ".join("?" for _ in page)
+            rows = conn.execute(f'''
+                SELECT c.id, c.timestamp, c.basel_ii_category, c.severity_score, c.likelihood, {snippets}
+                FROM classifications_fts
+                JOIN classifications c ON c.id = classifications_fts.rowid
+                WHERE classifications_fts MATCH ? AND classifications_fts.rowid IN ({placeholders})
+            ''', [match] + list(scores)).fetchall()
+    except sqlite3.Error as e:
+        logger.error(f"Database error during search: {e}")
+        return [], 0
+    order = {row_id: position for position, row_id in enumerate(scores)}
+    for row_id, timestamp, category, severity_score, likelihood, *marked_snippets in sorted(rows, key=lambda row: order[row[0]]):
+        matched = {}
+        for column, marked in zip(SEARCH_COLUMNS, marked_snippets):
+            text, highlights = _split_highlights(marked or "")
+            if highlights:
+                matched[column] = {"text": text, "highlights": highlights}
+        results.append({
+            "id": row_id, "timestamp": timestamp, "basel_ii_category": category,
+            "severity_score": severity_score, "likelihood": likelihood, "score": scores[row_id], "snippets": matched,
+        })
+    return results, total
+
 def update_classification_result(row_id: int, classification: RiskClassification):
     """Updates an existing classification result in the database."""
-    conn = None
     try:
-        conn = sqlite3.connect(DATABASE_FILE)
-        cursor = conn.cursor()
-
         control_recommendations = classification.control_recommendations
         if isinstance(control_recommendations, list):
             control_recommendations = "\n".join(control_recommendations)
 
-        cursor.execute('''
-            UPDATE classifications
-            SET basel_ii_category = ?,
-                severity_score = ?,
-                root_cause = ?,
-                control_recommendations = ?,
-                incident_description = ?,
-                framework_tags = ?,
-                inherent_risk = ?,
-                residual_risk = ?,
-                likelihood = ?,
-                impact_type = ?
-            WHERE id = ?
-        ''', (
-            classification.basel_ii_category,
-            classification.severity_score,
-            classification.root_cause,
-            control_recommendations,
-            classification.incident_description,
-            json.dumps(classification.framework_tags),
-            classification.inherent_risk,
-            classification.residual_risk,
-            classification.likelihood,
-            json.dumps(classification.impact_type),
-            row_id
-        ))
-
-        conn.commit()
-        print(f"Classification result with ID {row_id} updated in database.")
+        with timed("db_write"), get_connection(DATABASE_FILE) as conn:
+            begin_immediate(conn)
+            conn.execute('''
+                UPDATE classifications
+                SET basel_ii_category = ?,
+                    severity_score = ?,
+                    root_cause = ?,
+                    control_recommendations = ?,
+                    incident_description = ?,
+                    framework_tags = ?,
+                    inherent_risk = ?,
+                    residual_risk = ?,
+                    likelihood = ?,
+                    impact_type = ?
+                WHERE id = ?
+            ''', (
+                classification.basel_ii_category,
+                classification.severity_score,
+                classification.root_cause,
+                control_recommendations,
+                classification.incident_description,
+                json.dumps(classification.framework_tags),
+                classification.inherent_risk,
+                classification.residual_risk,
+                classification.likelihood,
+                json.dumps(classification.impact_type),
+                row_id
+            ))
+            _write_child_rows(conn, row_id, classification.impact_type, classification.framework_tags,
+                              classification.control_recommendations)
+        logger.info(f"Classification result with ID {row_id} updated in database.")
     except sqlite3.Error as e:
-        print(f"Database error during update: {e}")
-    finally:
-        if conn:
-            conn.close()
+        logger.error(f"Database error during update: {e}")
 
 
 def log_download(download_type: str, user_identity: str = 'anonymous'):
     """Logs a download event to the database."""
-    conn = None
     try:
-        conn = sqlite3.connect(DATABASE_FILE)
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO download_logs (user_identity, download_type)
-            VALUES (?, ?)
-        ''', (user_identity, download_type))
-        conn.commit()
-        print(f"Download event logged: Type='{download_type}', User='{user_identity}'")
+        with get_connection(DATABASE_FILE) as conn:
+            conn.execute('''
+                INSERT INTO download_logs (user_identity, download_type)
+                VALUES (?, ?)
+            ''', (user_identity, download_type))
+        logger.info(f"Download event logged: Type='{download_type}', User='{user_identity}'")
     except sqlite3.Error as e:
-        print(f"Database error during download logging: {e}")
-    finally:
-        if conn:
-            conn.close()
+        logger.error(f"Database error during download logging: {e}")
 
 
 if __name__ == '__main__':
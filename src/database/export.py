@@ -0,0 +1,154 @@
+import argparse
+import csv
+import io
+import json
+import os
+import time
+from typing import IO, Iterator, Optional, Union
+
+from src.database import database
+
+EXPORT_FORMATS = ("csv", "jsonl", "parquet")
+EXPORT_CHUNK_SIZE = 5000
+EXPORT_COLUMNS = list(database.CLASSIFICATION_COLUMNS)
+LIST_COLUMNS = ("framework_tags", "impact_type") # Stored as JSON strings
+
+def iter_classification_chunks(chunk_size: int = EXPORT_CHUNK_SIZE, columns: Optional[list[str]] = None,
+                               **filters) -> Iterator[list]:
+    """Yields pages of classifications in id order using keyset pagination, never the whole table."""
+    cursor = None
+    while True:
+        rows, cursor = database.query_classifications(
+            columns=columns or EXPORT_COLUMNS, after_id=cursor, limit=chunk_size, descending=False, **filters
+        )
+        if rows:
+            yield rows
+        if cursor is None:
+            return
+
+def _write_csv(chunks: Iterator[list], columns: list[str], output: IO[bytes]) -> int:
+    text = io.TextIOWrapper(output, encoding="utf-8", newline="", write_through=True)
+    writer = csv.writer(text)
+    writer.writerow(columns)
+    count = 0
+    for rows in chunks:
+        writer.writerows(tuple(row[column] for column in columns) for row in rows)
+        count += len(rows)
+    text.flush()
+    text.detach() # Leave the caller's stream open
+    return count
+
+def _write_jsonl(chunks: Iterator[list], columns: list[str], output: IO[bytes]) -> int:
+    count = 0
+    for rows in chunks:
+        lines = []
+        for row in rows:
+            record = {column: row[column] for column in columns}
+            for column in LIST_COLUMNS:
+                if column in record:
+                    record[column] = database.parse_json_list(record[column])
+            lines.append(json.dumps(record, ensure_ascii=False))
+        output.write(("\n".join(lines) + "\n").encode("utf-8"))
+        count += len(rows)
+    return count
+
+def _write_parquet(chunks: Iterator[list], columns: list[str], output: IO[bytes]) -> int:
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ImportError("Parquet export requires pyarrow (pip install pyarrow).") from e
+
+    types = {"id": pa.int64(), "severity_score": pa.int64()}
+    schema = pa.schema([
+        (column, pa.list_(pa.string()) if column in LIST_COLUMNS else types.get(column, pa.string()))
+        for column in columns
+    ])
+    count = 0
+    with pq.ParquetWriter(output, schema) as writer:
+        for rows in chunks:
+            data = {column: [row[column] for row in rows] for column in columns}
+            for column in LIST_COLUMNS:
+                if column in data:
+                    data[column] = [database.parse_json_list(value) for value in data[column]]
+            writer.write_table(pa.table(data, schema=schema)) # One row group per chunk
+            count += len(rows)
+    return count
+
+_WRITERS = {"csv": _write_csv, "jsonl": _write_jsonl, "parquet": _write_parquet}
+
+def export_classifications(destination: Union[str, IO[bytes]], fmt: str = "csv", chunk_size: int = EXPORT_CHUNK_SIZE,
+                           columns: Optional[list[str]] = None, user_identity: str = 'anonymous', **filters) -> int:
+    """
+    Streams the classification history to CSV, JSON Lines or Parquet.
+
+    Rows are read from SQLite in chunks of chunk_size and written out chunk by chunk, so
+    memory use does not depend on the size of the table. The export is recorded with
+    log_download as "export_<fmt>".
+
+    Args:
+        destination: Output path or binary file object.
+        fmt: One of EXPORT_FORMATS.
+        chunk_size: Rows per database page / Parquet row group.
+        columns: Columns to export (defaults to every column).
+        user_identity: Identity recorded in download_logs.
+        **filters: Filters accepted by database.build_classification_filters, e.g. start,
+            end, basel_ii_category and severity_score.
+
+    Returns:
+        The number of exported rows.
+
+    Raises:
+        sqlite3.Error: A page could not be read. The destination then holds a partial
+            extract that the caller must discard, and the export is not logged.
+    """
+    if fmt not in _WRITERS:
+        raise ValueError(f"Unsupported export format '{fmt}'. Choose one of: {', '.join(EXPORT_FORMATS)}")
+    columns = columns or EXPORT_COLUMNS
+    chunks = iter_classification_chunks(chunk_size, columns, **filters)
+    if isinstance(destination, str):
+        try:
+            with open(destination, "wb") as output:
+                count = _WRITERS[fmt](chunks, columns, output)
+        except Exception:
+            os.unlink(destination) # Never leave a truncated extract behind
+            raise
+    else:
+        count = _WRITERS[fmt](chunks, columns, destination)
+    database.log_download(f"export_{fmt}", user_identity)
+    return count
+
+def prune_export_files(directory: str, max_age_seconds: float) -> int:
+    """Deletes export files in directory older than max_age_seconds and returns how many were removed."""
+    removed = 0
+    cutoff = time.time() - max_age_seconds
+    try:
+        entries = list(os.scandir(directory))
+    except FileNotFoundError:
+        return 0
+    for entry in entries:
+        try:
+            if entry.is_file() and entry.stat().st_mtime < cutoff:
+                os.unlink(entry.path)
+                removed += 1
+        except FileNotFoundError:
+            pass # Removed concurrently by another session
+    return removed
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Export the classification history.")
+    parser.add_argument("destination")
+    parser.add_argument("--format", choices=EXPORT_FORMATS, default="csv")
+    parser.add_argument("--start", help="Inclusive start date, e.g. 2024-01-01")
+    parser.add_argument("--end", help="Exclusive end date, e.g. 2025-01-01")
+    parser.add_argument("--category", action="append", help="Basel II category (repeatable)")
+    parser.add_argument("--severity", type=int, action="append", help="Severity score (repeatable)")
+    parser.add_argument("--user", default="cli")
+    args = parser.parse_args()
+
+    exported = export_classifications(
+        args.destination, fmt=args.format, user_identity=args.user,
+        start=args.start, end=args.end, basel_ii_category=args.category, severity_score=args.severity
+    )
+    print(f"Exported {exported} classifications to {args.destination}")
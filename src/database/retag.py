@@ -0,0 +1,201 @@
+import argparse
+import hashlib
+import json
+import sqlite3
+import time
+from typing import Callable, Optional
+
+import numpy as np
+import pandas as pd
+
+from src.database import database
+from src.database.connection import get_connection
+from src.frameworks.framework_router import FRAMEWORK_RULES
+from src.frameworks.matcher import CATEGORY, CONTROLS, INCIDENT, ROOT_CAUSE, FrameworkRule
+from src.logging.logger import get_logger
+
+RETAG_CHUNK_SIZE = 5000
+
+logger = get_logger(__name__)
+
+def rules_fingerprint(rules: list[FrameworkRule] = FRAMEWORK_RULES) -> str:
+    """Returns a stable hash of a rule table; a rule change produces a new re-tag job."""
+    material = json.dumps([list(rule) for rule in rules], sort_keys=True)
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()[:16]
+
+def compute_tag_masks(chunk: pd.DataFrame, rules: list[FrameworkRule] = FRAMEWORK_RULES) -> dict[str, dict[str, np.ndarray]]:
+    """
+    Evaluates the rule table over a whole chunk of stored classifications.
+
+    Every (field, keyword) pair is evaluated once over the entire column with
+    vectorized substring search and rules are combined as boolean masks.
+
+    Args:
+        chunk: DataFrame with incident_description, root_cause, control_recommendations
+            and basel_ii_category columns.
+        rules: The framework rule table.
+
+    Returns:
+        {framework: {tag: boolean row mask}}, tags in order of first appearance in the table.
+    """
+    rows = len(chunk)
+    fields = {
+        INCIDENT: chunk["incident_description"].fillna("").astype(str).str.lower(),
+        ROOT_CAUSE: chunk["root_cause"].fillna("").astype(str).str.lower(),
+        # Stored newline-joined; classify_incident scans them space-joined
+        CONTROLS: chunk["control_recommendations"].fillna("").astype(str).str.replace("\n", " ", regex=False).str.lower(),
+        CATEGORY: chunk["basel_ii_category"].fillna("").astype(str).str.lower(),
+    }
+
+    keyword_masks = {}
+    def contains(field: str, keyword: str) -> np.ndarray:
+        key = (field, keyword.lower())
+        if key not in keyword_masks:
+            keyword_masks[key] = fields[field].str.contains(key[1], regex=False).to_numpy(dtype=bool)
+        return keyword_masks[key]
+
+    # Combine rule masks per tag, keeping tags in order of first appearance in the table
+    tag_masks = {} # framework -> {tag: mask}
+    for rule in rules:
+        rule_mask = np.zeros(rows, dtype=bool)
+        for field in rule.fields:
+            for keyword in rule.keywords:
+                rule_mask |= contains(field, keyword)
+        framework_tags = tag_masks.setdefault(rule.framework, {})
+        for tag in rule.tags:
+            framework_tags[tag] = framework_tags.get(tag, np.zeros(rows, dtype=bool)) | rule_mask
+    return tag_masks
+
+def compute_framework_tags(tag_masks: dict[str, dict[str, np.ndarray]], rows: int) -> np.ndarray:
+    """
+    Assembles the stored framework_tags JSON column from compute_tag_masks output.
+
+    The "Framework: tag, tag" JSON strings are built column-wise and match what
+    classify_incident stores for the same row: both scan the stored incident_description,
+    root_cause, control_recommendations and basel_ii_category.
+
+    Returns:
+        An object array of JSON strings, one per row.
+    """
+    result = np.full(rows, "", dtype=object)
+    for framework, framework_tags in tag_masks.items():
+        joined = np.full(rows, "", dtype=object)
+        for tag, mask in framework_tags.items():
+            escaped = json.dumps(tag)[1:-1]
+            joined = np.where(mask, np.where(joined == "", escaped, joined + ", " + escaped), joined)
+        entry = np.where(joined != "", np.array([json.dumps(framework + ": ")[:-1]], dtype=object) + joined + '"', "")
+        result = np.where(entry == "", result, np.where(result == "", entry, result + ", " + entry))
+    return "[" + result + "]"
+
+
+def _ensure_job_table(conn: sqlite3.Connection) -> None:
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS retag_jobs (
+            rules_fingerprint TEXT PRIMARY KEY,
+            last_id INTEGER NOT NULL DEFAULT 0,
+            rows_processed INTEGER NOT NULL DEFAULT 0,
+            rows_changed INTEGER NOT NULL DEFAULT 0,
+            started_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            completed_at DATETIME
+        )
+    ''')
+    conn.commit()
+
+def _log_progress(processed: int, total: int, changed: int) -> None:
+    percent = 100.0 * processed / total if total else 100.0
+    logger.info(f"Re-tagged {processed}/{total} rows ({percent:.1f}%), {changed} changed")
+
+def retag_classifications(chunk_size: int = RETAG_CHUNK_SIZE, restart: bool = False,
+                          progress: Optional[Callable[[int, int, int], None]] = _log_progress) -> dict:
+    """
+    Recomputes the stored framework_tags of every classification with the current rules.
+
+    Rows are streamed in id order in chunks of chunk_size. Each chunk is tagged with
+    compute_tag_masks and the changed rows, together with their classification_framework_tags
+    child rows, are written back with executemany in a single transaction that also
+    advances the job checkpoint in retag_jobs. A job is
+    identified by the fingerprint of the rule table, so an interrupted run resumes after
+    the last committed chunk, while editing the rules starts a new job.
+
+    Note that manual framework tag adjustments are overwritten for every row whose
+    computed tags differ.
+
+    Args:
+        chunk_size: Number of rows per chunk/transaction.
+        restart: Discard the checkpoint of the current rules and start from the first row.
+        progress: Callback receiving (rows processed, total rows, rows changed) after each chunk.
+
+    Returns:
+        A summary dict with the fingerprint, rows processed and rows changed.
+    """
+    fingerprint = rules_fingerprint()
+    processed = changed = 0
+    try:
+        with get_connection(database.DATABASE_FILE) as conn:
+            _ensure_job_table(conn)
+            if restart:
+                conn.execute('DELETE FROM retag_jobs WHERE rules_fingerprint = ?', (fingerprint,))
+            conn.execute('INSERT OR IGNORE INTO retag_jobs (rules_fingerprint) VALUES (?)', (fingerprint,))
+            conn.commit()
+
+            last_id, processed, changed, completed_at = conn.execute(
+                'SELECT last_id, rows_processed, rows_changed, completed_at FROM retag_jobs WHERE rules_fingerprint = ?',
+                (fingerprint,)
+            ).fetchone()
+            if completed_at is not None and not restart:
+                logger.info(f"Re-tag job {fingerprint} already completed at {completed_at}.")
+                return {"rules_fingerprint": fingerprint, "rows_processed": processed, "rows_changed": changed}
+
+            total = processed + conn.execute('SELECT COUNT(*) FROM classifications WHERE id > ?', (last_id,)).fetchone()[0]
+            started = time.monotonic()
+            while True:
+                chunk = pd.read_sql_query('''
+                    SELECT id, incident_description, root_cause, control_recommendations, basel_ii_category, framework_tags
+                    FROM classifications WHERE id > ? ORDER BY id LIMIT ?
+                ''', conn, params=(last_id, chunk_size))
+                if chunk.empty:
+                    break
+
+                tag_masks = compute_tag_masks(chunk)
+                new_tags = compute_framework_tags(tag_masks, len(chunk))
+                stale = new_tags != chunk["framework_tags"].fillna("").to_numpy(dtype=object)
+                ids = chunk["id"].to_numpy()
+                stale_ids = ids[stale].tolist()
+                updates = list(zip(new_tags[stale].tolist(), stale_ids))
+                tag_rows = [
+                    (row_id, framework, tag)
+                    for framework, framework_tags in tag_masks.items()
+                    for tag, mask in framework_tags.items()
+                    for row_id in ids[mask & stale].tolist()
+                ]
+                last_id = int(chunk["id"].iloc[-1])
+                processed += len(chunk)
+                changed += len(updates)
+
+                with conn: # One transaction per chunk, checkpoint included
+                    conn.executemany('UPDATE classifications SET framework_tags = ? WHERE id = ?', updates)
+                    conn.executemany('DELETE FROM classification_framework_tags WHERE classification_id = ?',
+                                     [(row_id,) for row_id in stale_ids])
+                    conn.executemany('INSERT INTO classification_framework_tags (classification_id, framework, tag) VALUES (?, ?, ?)',
+                                     tag_rows)
+                    conn.execute('''
+                        UPDATE retag_jobs SET last_id = ?, rows_processed = ?, rows_changed = ?
+                        WHERE rules_fingerprint = ?
+                    ''', (last_id, processed, changed, fingerprint))
+                if progress:
+                    progress(processed, total, changed)
+
+            with conn:
+                conn.execute('UPDATE retag_jobs SET completed_at = CURRENT_TIMESTAMP WHERE rules_fingerprint = ?', (fingerprint,))
+            logger.info(f"Re-tag job {fingerprint} finished in {time.monotonic() - started:.1f}s: {processed} rows, {changed} changed.")
+    except sqlite3.Error as e:
+        logger.error(f"Database error during re-tag: {e}")
+    return {"rules_fingerprint": fingerprint, "rows_processed": processed, "rows_changed": changed}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Recompute stored framework tags after a framework rule change.")
+    parser.add_argument("--chunk-size", type=int, default=RETAG_CHUNK_SIZE)
+    parser.add_argument("--restart", action="store_true", help="Ignore the checkpoint and re-tag every row.")
+    args = parser.parse_args()
+    retag_classifications(chunk_size=args.chunk_size, restart=args.restart)
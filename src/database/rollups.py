@@ -0,0 +1,248 @@
+import argparse
+import sqlite3
+from typing import Optional, Union
+from datetime import date, datetime
+
+from src.database.connection import begin_immediate, get_connection
+from src.logging.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Materialized aggregates of the classifications table: table -> key columns.
+# Keys are NOT NULL; missing values are stored as '' (text) or 0 (severity).
+ROLLUP_TABLES = {
+    "rollup_daily_category": ("day", "basel_ii_category"),
+    "rollup_severity": ("severity_score",),
+    "rollup_likelihood_impact": ("likelihood", "impact_type"),
+    "rollup_framework_tags": ("framework", "tag"),
+    "rollup_risk_transitions": ("inherent_risk", "residual_risk"),
+}
+
+# SQL expressions computing the key columns of each rollup from a classifications row
+def _classification_keys(row: str) -> dict[str, tuple[str, ...]]:
+    return {
+        "rollup_daily_category": (f"COALESCE(date({row}.timestamp), '')", f"COALESCE({row}.basel_ii_category, '')"),
+        "rollup_severity": (f"COALESCE({row}.severity_score, 0)",),
+        "rollup_risk_transitions": (f"COALESCE({row}.inherent_risk, '')", f"COALESCE({row}.residual_risk, '')"),
+    }
+
+def _upsert(table: str, values: tuple[str, ...], delta: int, source: str = "") -> str:
+    """
+    Adds delta to the rollup row with the given key expressions.
+
+    With a source ("FROM ... WHERE ..."), one row per selected source row is adjusted; the
+    source must end in a WHERE clause so that ON CONFLICT is not parsed as a join constraint.
+    """
+    columns = ", ".join(ROLLUP_TABLES[table])
+    select = f"SELECT {', '.join(values)}, {delta} {source}" if source else f"VALUES ({', '.join(values)}, {delta})"
+    return (f"INSERT INTO {table} ({columns}, count) {select} "
+            f"ON CONFLICT ({columns}) DO UPDATE SET count = count + excluded.count;")
+
+def create_rollups(conn: sqlite3.Connection) -> None:
+    """
+    Creates the rollup tables and the triggers that keep them current.
+
+    Triggers on classifications and its impact and framework tag child tables adjust
+    the counts of every write path (single saves, bulk imports, manual updates and
+    re-tagging) inside the writing transaction.
+    """
+    for table, keys in ROLLUP_TABLES.items():
+        key_columns = ", ".join(f"{key} {'INTEGER' if key == 'severity_score' else 'TEXT'} NOT NULL" for key in keys)
+        conn.execute(f'''
+            CREATE TABLE IF NOT EXISTS {table} (
+                {key_columns},
+                count INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY ({", ".join(keys)})
+            ) WITHOUT ROWID
+        ''')
+
+    new_keys, old_keys = _classification_keys("new"), _classification_keys("old")
+    parent_likelihood = "COALESCE((SELECT likelihood FROM classifications WHERE id = {row}.classification_id), '')"
+    impacts_of = "FROM classification_impacts WHERE classification_id = {row}.id"
+    triggers = {
+        "rollups_classification_insert": ("AFTER INSERT ON classifications",
+            [_upsert(table, values, 1) for table, values in new_keys.items()]),
+        # BEFORE DELETE so that the impact rows are still there (they are removed by ON DELETE CASCADE)
+        "rollups_classification_delete": ("BEFORE DELETE ON classifications",
+            [_upsert(table, values, -1) for table, values in old_keys.items()]
+            + [_upsert("rollup_likelihood_impact", ("COALESCE(old.likelihood, '')", "impact_type"), -1, impacts_of.format(row="old"))]),
+        "rollups_classification_update": (
+            "AFTER UPDATE OF timestamp, basel_ii_category, severity_score, inherent_risk, residual_risk, likelihood ON classifications",
+            [_upsert(table, values, -1) for table, values in old_keys.items()]
+            + [_upsert(table, values, 1) for table, values in new_keys.items()]
+            + [_upsert("rollup_likelihood_impact", ("COALESCE(old.likelihood, '')", "impact_type"), -1, impacts_of.format(row="new")),
+               _upsert("rollup_likelihood_impact", ("COALESCE(new.likelihood, '')", "impact_type"), 1, impacts_of.format(row="new"))]),
+        "rollups_impact_insert": ("AFTER INSERT ON classification_impacts",
+            [_upsert("rollup_likelihood_impact", (parent_likelihood.format(row="new"), "new.impact_type"), 1)]),
+        # Skipped when the parent is being deleted; its delete trigger already removed the impacts
+        "rollups_impact_delete": (
+            "AFTER DELETE ON classification_impacts WHEN EXISTS (SELECT 1 FROM classifications WHERE id = old.classification_id)",
+            [_upsert("rollup_likelihood_impact", (parent_likelihood.format(row="old"), "old.impact_type"), -1)]),
+        "rollups_framework_tag_insert": ("AFTER INSERT ON classification_framework_tags",
+            [_upsert("rollup_framework_tags", ("new.framework", "new.tag"), 1)]),
+        "rollups_framework_tag_delete": ("AFTER DELETE ON classification_framework_tags",
+            [_upsert("rollup_framework_tags", ("old.framework", "old.tag"), -1)]),
+    }
+    for name, (event, statements) in triggers.items():
+        body = "\n                ".join(statements)
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {name} {event} BEGIN
+                {body}
+            END
+        ''')
+
+def populate_rollups(conn: sqlite3.Connection) -> dict[str, int]:
+    """Replaces the rollup contents with aggregates of the base tables; the caller owns the transaction."""
+    rebuild_queries = {
+        "rollup_daily_category": '''
+            SELECT COALESCE(date(timestamp), ''), COALESCE(basel_ii_category, ''), COUNT(*)
+            FROM classifications GROUP BY 1, 2
+        ''',
+        "rollup_severity": "SELECT COALESCE(severity_score, 0), COUNT(*) FROM classifications GROUP BY 1",
+        "rollup_likelihood_impact": '''
+            SELECT COALESCE(c.likelihood, ''), i.impact_type, COUNT(*)
+            FROM classification_impacts i JOIN classifications c ON c.id = i.classification_id GROUP BY 1, 2
+        ''',
+        "rollup_framework_tags": "SELECT framework, tag, COUNT(*) FROM classification_framework_tags GROUP BY 1, 2",
+        "rollup_risk_transitions": '''
+            SELECT COALESCE(inherent_risk, ''), COALESCE(residual_risk, ''), COUNT(*)
+            FROM classifications GROUP BY 1, 2
+        ''',
+    }
+    rows = {}
+    for table, query in rebuild_queries.items():
+        conn.execute(f"DELETE FROM {table}")
+        rows[table] = conn.execute(f"INSERT INTO {table} ({', '.join(ROLLUP_TABLES[table])}, count) {query}").rowcount
+    return rows
+
+def rebuild_rollups() -> dict[str, int]:
+    """
+    Recomputes every rollup table from the base tables in one transaction.
+
+    Only needed if the rollups were edited by hand or the triggers were dropped; the
+    triggers keep them current otherwise.
+
+    Returns:
+        The number of rows written per rollup table.
+    """
+    from src.database import database
+
+    with get_connection(database.DATABASE_FILE) as conn:
+        begin_immediate(conn)
+        rows = populate_rollups(conn)
+    logger.info("Rollups rebuilt", extra=rows)
+    return rows
+
+
+def _query(sql: str, params: list = ()) -> list[sqlite3.Row]:
+    from src.database import database
+
+    try:
+        with get_connection(database.DATABASE_FILE) as conn:
+            conn.row_factory = sqlite3.Row
+            return conn.execute(sql, params).fetchall()
+    except sqlite3.Error as e:
+        logger.error(f"Database error during rollup read: {e}")
+        return []
+
+def _day(value: Union[str, date, datetime]) -> str:
+    return value.strftime("%Y-%m-%d") if isinstance(value, (date, datetime)) else str(value)[:10]
+
+def get_category_trend(start: Optional[Union[str, date]] = None, end: Optional[Union[str, date]] = None,
+                       granularity: str = "month") -> list[dict]:
+    """
+    Returns classification counts per period and Basel II category from the daily rollup.
+
+    Args:
+        start: Inclusive first day.
+        end: Exclusive last day.
+        granularity: "day", "month" or "year".
+
+    Returns:
+        Dicts with period, basel_ii_category and count keys, oldest first.
+    """
+    length = {"day": 10, "month": 7, "year": 4}.get(granularity)
+    if length is None:
+        raise ValueError("granularity must be 'day', 'month' or 'year'")
+    conditions, params = ["count > 0", "day != ''"], []
+    if start is not None:
+        conditions.append("day >= ?")
+        params.append(_day(start))
+    if end is not None:
+        conditions.append("day < ?")
+        params.append(_day(end))
+    rows = _query(f'''
+        SELECT substr(day, 1, {length}) AS period, basel_ii_category, SUM(count) AS count
+        FROM rollup_daily_category WHERE {" AND ".join(conditions)}
+        GROUP BY period, basel_ii_category ORDER BY period, basel_ii_category
+    ''', params)
+    return [dict(row) for row in rows]
+
+def get_severity_histogram() -> list[dict]:
+    """Returns dicts with severity_score and count keys (severity 0 means missing)."""
+    return [dict(row) for row in _query('SELECT severity_score, count FROM rollup_severity WHERE count > 0 ORDER BY severity_score')]
+
+def get_likelihood_impact_cells(samples_per_cell: int = 3, sample_length: int = 160) -> list[dict]:
+    """
+    Returns the likelihood x impact heatmap cells from the rollup.
+
+    Counts come from rollup_likelihood_impact; the tooltip samples are fetched per cell
+    with an indexed LIMIT query, so the cost depends on the number of cells only.
+
+    Returns:
+        Dicts with likelihood, impact_type, count and samples keys, like get_heatmap_cells.
+    """
+    cells = [
+        {"likelihood": row["likelihood"] or None, "impact_type": row["impact_type"], "count": row["count"], "samples": []}
+        for row in _query('SELECT likelihood, impact_type, count FROM rollup_likelihood_impact WHERE count > 0')
+    ]
+    if samples_per_cell <= 0:
+        return cells
+    from src.database import database
+
+    try:
+        with get_connection(database.DATABASE_FILE) as conn:
+            for cell in cells:
+                rows = conn.execute('''
+                    SELECT substr(c.incident_description, 1, ?)
+                    FROM classification_impacts i JOIN classifications c ON c.id = i.classification_id
+                    WHERE i.impact_type = ? AND COALESCE(c.likelihood, '') = ?
+                    ORDER BY i.classification_id DESC LIMIT ?
+                ''', (sample_length, cell["impact_type"], cell["likelihood"] or "", samples_per_cell)).fetchall()
+                cell["samples"] = [description for description, in rows if description]
+    except sqlite3.Error as e:
+        logger.error(f"Database error during heatmap sampling: {e}")
+    return cells
+
+def get_framework_tag_frequencies(framework: Optional[str] = None, limit: Optional[int] = None) -> list[dict]:
+    """Returns dicts with framework, tag and count keys, most frequent first."""
+    conditions, params = ["count > 0"], []
+    if framework is not None:
+        conditions.append("framework = ?")
+        params.append(framework)
+    params.append(limit if limit is not None else -1)
+    rows = _query(f'''
+        SELECT framework, tag, count FROM rollup_framework_tags
+        WHERE {" AND ".join(conditions)} ORDER BY count DESC, framework, tag LIMIT ?
+    ''', params)
+    return [dict(row) for row in rows]
+
+def get_risk_transitions() -> list[dict]:
+    """Returns dicts with inherent_risk, residual_risk and count keys ('' means not assessed)."""
+    return [dict(row) for row in _query(
+        'SELECT inherent_risk, residual_risk, count FROM rollup_risk_transitions WHERE count > 0 ORDER BY count DESC'
+    )]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Maintain the dashboard rollup tables.")
+    parser.add_argument("--rebuild", action="store_true", help="Recompute every rollup from the classifications table.")
+    args = parser.parse_args()
+    if args.rebuild:
+        from src.database import database
+
+        database.initialize_database()
+        for table, rows in rebuild_rollups().items():
+            print(f"{table}: {rows} rows")
+    else:
+        parser.print_help()
@@ -1,36 +1,39 @@
 # COSO framework mapper
 
 from src.models import RiskClassification
+from .matcher import CATEGORY, CONTROLS, INCIDENT, ROOT_CAUSE, FrameworkRule, KeywordMatcher
 
-def map_to_coso(classification: RiskClassification) -> list[str]:
-    """
-    Maps a RiskClassification to relevant COSO framework principles/components.
-    Enhances placeholder logic based on incident details.
-    """
-    coso_tags = set() # Use a set to avoid duplicate tags
-
-    incident_lower = classification.incident_description.lower()
-    root_cause_lower = classification.root_cause.lower()
-    control_recs_lower = " ".join(classification.control_recommendations).lower() if isinstance(classification.control_recommendations, list) else ""
-
+COSO_RULES = [
     # Mapping based on the provided blueprint descriptions
-    if any(keyword in incident_lower or keyword in root_cause_lower for keyword in ["incomplete analysis", "missing analysis", "inadequate assessment"]):
-        coso_tags.add("COSO - Risk Assessment")
-
-    if any(keyword in incident_lower or keyword in root_cause_lower or keyword in control_recs_lower for keyword in ["control not followed", "misconfigured control", "control failure", "policy violation"]):
-        coso_tags.add("COSO - Control Activities")
-
-    if any(keyword in incident_lower or keyword in root_cause_lower for keyword in ["not detected", "issue missed", "monitoring failure", "untimely detection"]):
-        coso_tags.add("COSO - Monitoring Activities")
+    FrameworkRule("COSO", ("COSO - Risk Assessment",),
+                  ("incomplete analysis", "missing analysis", "inadequate assessment"),
+                  (INCIDENT, ROOT_CAUSE)),
+    FrameworkRule("COSO", ("COSO - Control Activities",),
+                  ("control not followed", "misconfigured control", "control failure", "policy violation"),
+                  (INCIDENT, ROOT_CAUSE, CONTROLS)),
+    FrameworkRule("COSO", ("COSO - Monitoring Activities",),
+                  ("not detected", "issue missed", "monitoring failure", "untimely detection"),
+                  (INCIDENT, ROOT_CAUSE)),
 
     # Retain some of the original placeholder logic for broader coverage
-    if "fraud" in incident_lower or "fraud" in classification.basel_ii_category.lower():
-         coso_tags.add("COSO - Control Environment")
-         coso_tags.add("COSO - Risk Assessment") # Keep Risk Assessment as fraud often implies assessment failure
-
-    if "system" in incident_lower or "technology" in classification.basel_ii_category.lower():
-         coso_tags.add("COSO - Information & Communication")
-         coso_tags.add("COSO - Monitoring Activities") # Keep Monitoring as system issues can be detection failures
+    # Keep Risk Assessment as fraud often implies assessment failure
+    FrameworkRule("COSO", ("COSO - Control Environment", "COSO - Risk Assessment"),
+                  ("fraud",),
+                  (INCIDENT, CATEGORY)),
+    # Keep Monitoring as system issues can be detection failures
+    FrameworkRule("COSO", ("COSO - Information & Communication", "COSO - Monitoring Activities"),
+                  ("system",),
+                  (INCIDENT,)),
+    FrameworkRule("COSO", ("COSO - Information & Communication", "COSO - Monitoring Activities"),
+                  ("technology",),
+                  (CATEGORY,)),
+]
+
+_matcher = KeywordMatcher(COSO_RULES)
 
-    # Convert set back to list before returning
-    return list(coso_tags)
\ No newline at end of file
+def map_to_coso(classification: RiskClassification) -> list[str]:
+    """
+    Maps a RiskClassification to relevant COSO framework principles/components.
+    Evaluates COSO_RULES with the compiled keyword matcher.
+    """
+    return _matcher.match(classification)["COSO"]
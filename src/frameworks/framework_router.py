@@ -1,21 +1,60 @@
 # Framework router
 
 from src.models import RiskClassification
-from .coso import map_to_coso
-from .iso31000 import map_to_iso31000
-from .sox import map_to_sox
-from .gdpr import map_to_gdpr
+from .matcher import KeywordMatcher
+from .coso import COSO_RULES
+from .iso31000 import ISO31000_RULES
+from .sox import SOX_RULES
+from .gdpr import GDPR_RULES
+
+# Declarative rule table for every supported framework, in display order
+FRAMEWORK_RULES = COSO_RULES + ISO31000_RULES + SOX_RULES + GDPR_RULES
+
+# Built once at import; scans each field of an incident a single time for all frameworks
+_matcher = KeywordMatcher(FRAMEWORK_RULES)
 
 def classify_across_frameworks(classification: RiskClassification) -> dict[str, list[str]]:
     """
     Classifies a RiskClassification across multiple frameworks.
     """
-    framework_mappings = {}
+    return _matcher.match(classification)
+
+
+# Known tags per framework, longest first so that no tag is consumed by a shorter one
+_KNOWN_TAGS = {}
+for _rule in FRAMEWORK_RULES:
+    for _tag in _rule.tags:
+        _KNOWN_TAGS.setdefault(_rule.framework, [])
+        if _tag not in _KNOWN_TAGS[_rule.framework]:
+            _KNOWN_TAGS[_rule.framework].append(_tag)
+for _tags in _KNOWN_TAGS.values():
+    _tags.sort(key=len, reverse=True)
 
-    # Call each framework mapper
-    framework_mappings["COSO"] = map_to_coso(classification)
-    framework_mappings["ISO 31000"] = map_to_iso31000(classification)
-    framework_mappings["SOX"] = map_to_sox(classification)
-    framework_mappings["GDPR"] = map_to_gdpr(classification)
+FRAMEWORKS = list(_KNOWN_TAGS)
 
-    return framework_mappings
\ No newline at end of file
+def format_framework_tags(framework_mappings: dict[str, list[str]]) -> list[str]:
+    """Formats classify_across_frameworks output as the stored "Framework: tag, tag" strings."""
+    return [f"{k}: {', '.join(v)}" for k, v in framework_mappings.items() if v]
+
+def split_framework_tags(framework_tags: list[str]) -> list[tuple[str, str]]:
+    """
+    Splits stored "Framework: tag, tag" strings back into (framework, tag) pairs.
+
+    Known tags are recognised by name (some contain commas themselves); any remaining
+    text is split on commas. Entries without a known framework prefix, such as manual
+    edits, are returned under the "Other" framework.
+    """
+    pairs = []
+    for entry in framework_tags or []:
+        entry = entry.strip()
+        framework, separator, remainder = entry.partition(": ")
+        if not separator or framework not in _KNOWN_TAGS:
+            if entry:
+                pairs.append(("Other", entry))
+            continue
+        for tag in _KNOWN_TAGS[framework]:
+            if tag in remainder:
+                pairs.append((framework, tag))
+                remainder = remainder.replace(tag, "")
+        pairs.extend((framework, leftover.strip()) for leftover in remainder.split(",") if leftover.strip())
+    return list(dict.fromkeys(pairs))
@@ -1,35 +1,40 @@
 # GDPR framework mapper
 
 from src.models import RiskClassification
+from .matcher import CATEGORY, CONTROLS, INCIDENT, ROOT_CAUSE, FrameworkRule, KeywordMatcher
 
-def map_to_gdpr(classification: RiskClassification) -> list[str]:
-    """
-    Maps a RiskClassification to relevant GDPR articles/principles.
-    Enhances placeholder logic based on incident details.
-    """
-    gdpr_tags = set() # Use a set to avoid duplicate tags
-
-    incident_lower = classification.incident_description.lower()
-    root_cause_lower = classification.root_cause.lower()
-    control_recs_lower = " ".join(classification.control_recommendations).lower() if isinstance(classification.control_recommendations, list) else ""
-
+GDPR_RULES = [
     # Mapping based on the provided blueprint descriptions
-    if any(keyword in incident_lower or keyword in root_cause_lower for keyword in ["access breach", "confidentiality breach", "data leak", "unauthorized access"]):
-        gdpr_tags.add("GDPR - Article 5: Integrity & Confidentiality")
-
-    if any(keyword in incident_lower or keyword in root_cause_lower for keyword in ["unauthorized processing", "lack of consent", "non-compliant processing"]):
-        gdpr_tags.add("GDPR - Article 6: Lawful Basis")
-
-    if any(keyword in incident_lower or keyword in root_cause_lower or keyword in control_recs_lower for keyword in ["security failure", "no encryption", "inadequate security measures"]):
-        gdpr_tags.add("GDPR - Article 32: Security of Processing")
+    FrameworkRule("GDPR", ("GDPR - Article 5: Integrity & Confidentiality",),
+                  ("access breach", "confidentiality breach", "data leak", "unauthorized access"),
+                  (INCIDENT, ROOT_CAUSE)),
+    FrameworkRule("GDPR", ("GDPR - Article 6: Lawful Basis",),
+                  ("unauthorized processing", "lack of consent", "non-compliant processing"),
+                  (INCIDENT, ROOT_CAUSE)),
+    FrameworkRule("GDPR", ("GDPR - Article 32: Security of Processing",),
+                  ("security failure", "no encryption", "inadequate security measures"),
+                  (INCIDENT, ROOT_CAUSE, CONTROLS)),
 
     # Retain some of the original placeholder logic for broader coverage
-    if "data breach" in incident_lower or "privacy" in classification.basel_ii_category.lower():
-         gdpr_tags.add("GDPR - Article 33: Notification of a personal data breach to the supervisory authority")
-         gdpr_tags.add("GDPR - Article 34: Communication of a personal data breach to the data subject")
-
-    if "personal data" in incident_lower:
-         gdpr_tags.add("GDPR - Article 5: Principles relating to processing of personal data") # Keep for broader Article 5 relevance
+    FrameworkRule("GDPR", ("GDPR - Article 33: Notification of a personal data breach to the supervisory authority",
+                           "GDPR - Article 34: Communication of a personal data breach to the data subject"),
+                  ("data breach",),
+                  (INCIDENT,)),
+    FrameworkRule("GDPR", ("GDPR - Article 33: Notification of a personal data breach to the supervisory authority",
+                           "GDPR - Article 34: Communication of a personal data breach to the data subject"),
+                  ("privacy",),
+                  (CATEGORY,)),
+    # Keep for broader Article 5 relevance
+    FrameworkRule("GDPR", ("GDPR - Article 5: Principles relating to processing of personal data",),
+                  ("personal data",),
+                  (INCIDENT,)),
+]
+
+_matcher = KeywordMatcher(GDPR_RULES)
 
-    # Convert set back to list before returning
-    return list(gdpr_tags)
\ No newline at end of file
+def map_to_gdpr(classification: RiskClassification) -> list[str]:
+    """
+    Maps a RiskClassification to relevant GDPR articles/principles.
+    Evaluates GDPR_RULES with the compiled keyword matcher.
+    """
+    return _matcher.match(classification)["GDPR"]
@@ -0,0 +1,79 @@
+# Compiled keyword matcher shared by all framework mappers
+
+import re
+from typing import NamedTuple
+
+from src.models import RiskClassification
+
+# Text fields a rule can scan. Every field is lowercased exactly once per incident.
+INCIDENT = "incident" # incident_description
+ROOT_CAUSE = "root_cause"
+CONTROLS = "controls" # control_recommendations joined with spaces
+CATEGORY = "category" # basel_ii_category
+
+FIELDS = (INCIDENT, ROOT_CAUSE, CONTROLS, CATEGORY)
+
+class FrameworkRule(NamedTuple):
+    """A declarative mapping rule: if any keyword occurs in any of the fields, add the tags."""
+    framework: str
+    tags: tuple[str, ...]
+    keywords: tuple[str, ...]
+    fields: tuple[str, ...]
+
+def extract_fields(classification: RiskClassification) -> dict[str, str]:
+    """Returns the lowercased text of every scannable field of a classification."""
+    control_recommendations = classification.control_recommendations
+    return {
+        INCIDENT: (classification.incident_description or "").lower(),
+        ROOT_CAUSE: (classification.root_cause or "").lower(),
+        CONTROLS: " ".join(control_recommendations).lower() if isinstance(control_recommendations, list) else "",
+        CATEGORY: (classification.basel_ii_category or "").lower(),
+    }
+
+
+class KeywordMatcher:
+    """
+    Matches a whole rule table against an incident in a single pass per field.
+
+    All keywords are compiled into one regex of the form (?=(kw1|kw2|...)), ordered
+    longest first, so the regex engine reports the longest keyword starting at every
+    position. Shorter keywords starting at the same position are necessarily prefixes of
+    that match and are added from a precomputed prefix table, which gives exactly the
+    same results as running `keyword in text` for every keyword.
+    """
+
+    def __init__(self, rules: list[FrameworkRule]):
+        self.rules = list(rules)
+        self.frameworks = list(dict.fromkeys(rule.framework for rule in self.rules))
+        keywords = sorted({keyword.lower() for rule in self.rules for keyword in rule.keywords}, key=lambda k: (-len(k), k))
+        self._pattern = re.compile("(?=(" + "|".join(re.escape(keyword) for keyword in keywords) + "))")
+        self._implied = {
+            keyword: frozenset(other for other in keywords if keyword.startswith(other))
+            for keyword in keywords
+        }
+        self._rule_keywords = [frozenset(keyword.lower() for keyword in rule.keywords) for rule in self.rules]
+        # Tags are reported in order of first appearance in the rule table, whichever rule fired
+        self.tag_order = {}
+        for rule in self.rules:
+            for tag in rule.tags:
+                self.tag_order.setdefault(tag, len(self.tag_order))
+
+    def scan(self, text: str) -> set[str]:
+        """Returns every keyword that occurs in text."""
+        found = set()
+        for match in self._pattern.finditer(text):
+            found |= self._implied[match.group(1)]
+        return found
+
+    def match_fields(self, fields: dict[str, str]) -> dict[str, list[str]]:
+        """Evaluates every rule against pre-extracted lowercase fields."""
+        found = {field: self.scan(text) for field, text in fields.items() if text}
+        tags = {framework: set() for framework in self.frameworks}
+        for rule, rule_keywords in zip(self.rules, self._rule_keywords):
+            if any(not rule_keywords.isdisjoint(found.get(field, ())) for field in rule.fields):
+                tags[rule.framework].update(rule.tags)
+        return {framework: sorted(framework_tags, key=self.tag_order.__getitem__) for framework, framework_tags in tags.items()}
+
+    def match(self, classification: RiskClassification) -> dict[str, list[str]]:
+        """Returns the tags of every framework for a classification."""
+        return self.match_fields(extract_fields(classification))
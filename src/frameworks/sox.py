@@ -1,32 +1,32 @@
 # SOX framework mapper
 
 from src.models import RiskClassification
+from .matcher import CATEGORY, CONTROLS, INCIDENT, ROOT_CAUSE, FrameworkRule, KeywordMatcher
 
-def map_to_sox(classification: RiskClassification) -> list[str]:
-    """
-    Maps a RiskClassification to relevant SOX framework sections.
-    Enhances placeholder logic based on incident details.
-    """
-    sox_tags = set() # Use a set to avoid duplicate tags
-
-    incident_lower = classification.incident_description.lower()
-    root_cause_lower = classification.root_cause.lower()
-    control_recs_lower = " ".join(classification.control_recommendations).lower() if isinstance(classification.control_recommendations, list) else ""
-
+SOX_RULES = [
     # Mapping based on the provided blueprint descriptions
-    if any(keyword in incident_lower or keyword in root_cause_lower or keyword in control_recs_lower for keyword in ["disclosure control", "unauthorized access", "data leak"]):
-        sox_tags.add("SOX - Section 302")
-
-    if any(keyword in incident_lower or keyword in root_cause_lower or keyword in control_recs_lower for keyword in ["financial control failure", "lack of testing", "control weakness", "audit finding"]):
-        sox_tags.add("SOX - Section 404")
+    FrameworkRule("SOX", ("SOX - Section 302",),
+                  ("disclosure control", "unauthorized access", "data leak"),
+                  (INCIDENT, ROOT_CAUSE, CONTROLS)),
+    FrameworkRule("SOX", ("SOX - Section 404",),
+                  ("financial control failure", "lack of testing", "control weakness", "audit finding"),
+                  (INCIDENT, ROOT_CAUSE, CONTROLS)),
 
     # Retain some of the original placeholder logic for broader coverage
-    if "financial" in incident_lower or "financial" in classification.basel_ii_category.lower():
-         sox_tags.add("SOX - Section 302")
-         sox_tags.add("SOX - Section 404")
+    FrameworkRule("SOX", ("SOX - Section 302", "SOX - Section 404"),
+                  ("financial",),
+                  (INCIDENT, CATEGORY)),
+    # Section 906 relates to corporate responsibility for financial reports
+    FrameworkRule("SOX", ("SOX - Section 906",),
+                  ("reporting",),
+                  (INCIDENT,)),
+]
 
-    if "reporting" in incident_lower:
-         sox_tags.add("SOX - Section 906") # Section 906 relates to corporate responsibility for financial reports
+_matcher = KeywordMatcher(SOX_RULES)
 
-    # Convert set back to list before returning
-    return list(sox_tags)
\ No newline at end of file
+def map_to_sox(classification: RiskClassification) -> list[str]:
+    """
+    Maps a RiskClassification to relevant SOX framework sections.
+    Evaluates SOX_RULES with the compiled keyword matcher.
+    """
+    return _matcher.match(classification)["SOX"]
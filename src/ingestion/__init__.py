@@ -0,0 +1 @@
+"""Ingestion module for RiskLoggr (watched-directory intake)."""
\ No newline at end of file
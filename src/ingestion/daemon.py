@@ -0,0 +1,297 @@
+import argparse
+import os
+import queue
+import signal
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+from src.classification.batch import is_retryable_error
+from src.classification.classifier import request_classification
+from src.classification.similarity import record_classification
+from src.config.config import settings
+from src.data_parser.parser import file_hash, parse_input
+from src.database import database
+from src.database.connection import begin_immediate, get_connection
+from src.ingestion.watcher import DirectoryWatcher
+from src.logging.logger import get_logger
+from src.logging.metrics import metrics
+from src.models import RiskClassification
+
+logger = get_logger(__name__)
+
+# Manifest lifecycle: pending -> processing -> done | failed (retryable errors go back to pending)
+PENDING, PROCESSING, DONE, FAILED = "pending", "processing", "done", "failed"
+
+# parse_input reports unreadable files through its return value
+PARSE_ERROR_PREFIXES = ("Error: File not found", "Error reading file")
+
+def claim_file(digest: str, path: str) -> Optional[int]:
+    """
+    Atomically marks a file as processing in the ingestion manifest.
+
+    Files are identified by content hash, so a file that was renamed, copied or dropped
+    again is not classified twice.
+
+    Returns:
+        The attempt number, or None if the content was already ingested, failed, or is
+        being processed by another worker.
+    """
+    with get_connection(database.DATABASE_FILE) as conn:
+        begin_immediate(conn) # Two workers can never claim the same content
+        row = conn.execute('SELECT status, attempts FROM ingested_files WHERE file_hash = ?', (digest,)).fetchone()
+        if row is None:
+            conn.execute(
+                'INSERT INTO ingested_files (file_hash, path, status, attempts) VALUES (?, ?, ?, 1)',
+                (digest, path, PROCESSING)
+            )
+            return 1
+        if row[0] != PENDING:
+            return None
+        conn.execute(
+            'UPDATE ingested_files SET path = ?, status = ?, attempts = attempts + 1 WHERE file_hash = ?',
+            (path, PROCESSING, digest)
+        )
+    return row[1] + 1
+
+def complete_file(digest: str, incident_description: str, classification: RiskClassification) -> Optional[int]:
+    """
+    Saves the classification and marks the file done in one transaction.
+
+    Because both writes commit together, a crash either leaves the file in the manifest
+    as processing with no classification (it is retried after requeue_interrupted_files)
+    or records both; a file can never be saved twice.
+
+    Returns:
+        The classification ID, or None if the file is no longer claimed.
+    """
+    with get_connection(database.DATABASE_FILE) as conn:
+        begin_immediate(conn)
+        row = conn.execute('SELECT status FROM ingested_files WHERE file_hash = ?', (digest,)).fetchone()
+        if row is None or row[0] != PROCESSING:
+            return None
+        row_id = database.insert_classification(conn, incident_description, classification)
+        conn.execute(
+            'UPDATE ingested_files SET status = ?, classification_id = ?, error = NULL, finished_at = CURRENT_TIMESTAMP '
+            'WHERE file_hash = ?', (DONE, row_id, digest)
+        )
+    record_classification(row_id, incident_description)
+    return row_id
+
+def release_file(digest: str, status: str, error: str) -> None:
+    """Records a failed attempt; status PENDING leaves the file to be retried by the daemon's pending sweep."""
+    with get_connection(database.DATABASE_FILE) as conn:
+        conn.execute(
+            'UPDATE ingested_files SET status = ?, error = ?, '
+            'finished_at = CASE WHEN ? = ? THEN NULL ELSE CURRENT_TIMESTAMP END WHERE file_hash = ?',
+            (status, error, status, PENDING, digest)
+        )
+
+def pending_file_paths() -> list[str]:
+    """Returns the last known paths of the files waiting for a retry, oldest first."""
+    with get_connection(database.DATABASE_FILE) as conn:
+        rows = conn.execute(
+            'SELECT path FROM ingested_files WHERE status = ? ORDER BY discovered_at', (PENDING,)
+        ).fetchall()
+    return [path for path, in rows]
+
+def requeue_interrupted_files() -> int:
+    """Puts files left processing by a previous process back to pending. Returns how many were requeued."""
+    with get_connection(database.DATABASE_FILE) as conn:
+        return conn.execute(
+            'UPDATE ingested_files SET status = ? WHERE status = ?', (PENDING, PROCESSING)
+        ).rowcount
+
+
+class IngestionDaemon:
+    """
+    Classifies incident files dropped into a directory, each exactly once.
+
+    A DirectoryWatcher feeds settled files into a bounded queue drained by worker
+    threads. When the workers fall behind, the queue fills up and discovery blocks
+    instead of buffering an unbounded backlog. Workers parse each file with
+    parse_input, classify it and write the classification together with its manifest
+    entry, so restarts never repeat finished work. Files that failed with a retryable
+    error stay pending in the manifest; an idle worker resubmits them every
+    retry_interval seconds.
+    """
+
+    def __init__(self, directory: str, workers: int = 2, queue_size: int = 16, poll_interval: float = 2.0,
+                 settle_seconds: float = 1.0, max_attempts: int = 3, use_watchdog: bool = True,
+                 retry_interval: float = 300.0):
+        self.directory = directory
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.retry_interval = retry_interval
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._stopping = threading.Event()
+        self._threads = []
+        self._next_sweep = 0.0
+        self._sweep_lock = threading.Lock()
+        self.watcher = DirectoryWatcher(directory, self.submit, poll_interval=poll_interval,
+                                        settle_seconds=settle_seconds, use_watchdog=use_watchdog)
+
+    def start(self, watch: bool = True) -> None:
+        requeued = requeue_interrupted_files()
+        if requeued:
+            logger.info(f"Requeued {requeued} files interrupted by a previous run.")
+        self._stopping.clear()
+        self._next_sweep = time.monotonic() + self.retry_interval # The first scan already covers pending files
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"ingestion-worker-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        if watch:
+            self.watcher.start()
+
+    def stop(self, timeout: float = 60.0) -> None:
+        """Stops discovery and waits for the files being processed; queued files are picked up on the next start."""
+        self._stopping.set()
+        self.watcher.stop()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def submit(self, path: str) -> bool:
+        """Queues a file, blocking while the queue is full. Returns False if the daemon is stopping."""
+        while not self._stopping.is_set():
+            try:
+                self._queue.put(path, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def ingest_existing(self) -> None:
+        """Queues every file currently in the directory and waits until all are processed."""
+        self.watcher.settle_seconds = 0
+        self.watcher.scan()
+        self._queue.join()
+
+    def _resubmit_pending(self) -> None:
+        """Queues the files left pending by retryable errors, at most once per retry_interval."""
+        with self._sweep_lock:
+            now = time.monotonic()
+            if now < self._next_sweep:
+                return
+            self._next_sweep = now + self.retry_interval
+        try:
+            paths = pending_file_paths()
+        except sqlite3.Error as e:
+            logger.error(f"Database error while listing pending files: {e}")
+            return
+        for path in paths:
+            if not os.path.isfile(path):
+                continue # Moved or deleted; the watcher reports it under its new name
+            try:
+                self._queue.put_nowait(path)
+            except queue.Full:
+                return # The rest follow on the next sweep
+
+    def _run(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                path = self._queue.get(timeout=0.5)
+            except queue.Empty:
+                self._resubmit_pending()
+                continue
+            try:
+                self._process(path)
+            except Exception as e:
+                logger.error(f"Unexpected error while ingesting {path}: {e}", exc_info=True)
+            finally:
+                self._queue.task_done()
+
+    def _process(self, path: str) -> None:
+        try:
+            digest = file_hash(path)
+        except OSError as e:
+            logger.warning(f"Skipping {path}: {e}")
+            return
+        try:
+            attempts = claim_file(digest, path)
+        except sqlite3.Error as e:
+            logger.error(f"Database error while claiming {path}: {e}")
+            self.watcher.forget(path) # Nothing was recorded, so only the watcher can bring it back
+            return
+        if attempts is None:
+            logger.debug(f"Skipping {path}: content already ingested")
+            metrics.inc("riskloggr_ingested_files_total", outcome="duplicate")
+            return
+        try:
+            self._classify(path, digest, attempts)
+        except Exception as e:
+            # Never leave a claimed file processing; database errors (usually locks) are retried by the sweep
+            status = PENDING if isinstance(e, sqlite3.Error) else FAILED
+            logger.error(f"Ingestion of {path} failed: {e}", exc_info=True)
+            try:
+                release_file(digest, status, str(e))
+            except sqlite3.Error as release_error:
+                logger.error(f"Could not release {path}; it is requeued on the next start: {release_error}")
+            metrics.inc("riskloggr_ingested_files_total", outcome="retry_later" if status == PENDING else "failed")
+
+    def _classify(self, path: str, digest: str, attempts: int) -> None:
+        incident_description = parse_input(path, is_file=True)
+        if incident_description.startswith(PARSE_ERROR_PREFIXES) or not incident_description.strip():
+            error = incident_description or "No text could be extracted"
+            logger.error(f"Ingestion of {path} failed: {error}")
+            release_file(digest, FAILED, error)
+            metrics.inc("riskloggr_ingested_files_total", outcome="failed")
+            return
+
+        while True:
+            try:
+                classification = request_classification(incident_description)
+                break
+            except Exception as e:
+                retryable = is_retryable_error(e)
+                if retryable and attempts < self.max_attempts and not self._stopping.is_set():
+                    self._stopping.wait(min(2 ** attempts, 30))
+                    attempts += 1
+                    continue
+                logger.error(f"Classification of {path} failed: {e}", extra={"attempts": attempts})
+                release_file(digest, PENDING if retryable else FAILED, str(e))
+                metrics.inc("riskloggr_ingested_files_total", outcome="retry_later" if retryable else "failed")
+                return
+
+        row_id = complete_file(digest, incident_description, classification)
+        if row_id is not None:
+            logger.info(f"Ingested {os.path.basename(path)} as classification {row_id}")
+            metrics.inc("riskloggr_ingested_files_total", outcome="classified")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Classify incident files dropped into a directory, each exactly once.")
+    parser.add_argument("directory", nargs="?", default=settings.INGEST_DIRECTORY)
+    parser.add_argument("--workers", type=int, default=settings.INGEST_WORKERS)
+    parser.add_argument("--poll", action="store_true", help="Rescan the directory instead of using filesystem events.")
+    parser.add_argument("--once", action="store_true", help="Process the files present now and exit.")
+    args = parser.parse_args()
+
+    database.initialize_database()
+    daemon = IngestionDaemon(
+        args.directory,
+        workers=args.workers,
+        queue_size=settings.INGEST_QUEUE_SIZE,
+        poll_interval=settings.INGEST_POLL_SECONDS,
+        settle_seconds=settings.INGEST_SETTLE_SECONDS,
+        max_attempts=settings.INGEST_MAX_ATTEMPTS,
+        use_watchdog=not args.poll,
+        retry_interval=settings.INGEST_RETRY_SECONDS,
+    )
+    if args.once:
+        daemon.start(watch=False)
+        daemon.ingest_existing()
+        daemon.stop()
+    else:
+        stop_requested = threading.Event()
+        signal.signal(signal.SIGTERM, lambda signum, frame: stop_requested.set())
+        daemon.start()
+        try:
+            while not stop_requested.wait(1.0):
+                pass
+        except KeyboardInterrupt:
+            pass
+        logger.info("Stopping ingestion daemon...")
+        daemon.stop()
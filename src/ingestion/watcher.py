@@ -0,0 +1,164 @@
+import os
+import threading
+import time
+from typing import Callable, Optional
+
+from src.data_parser.parser import get_parser
+from src.logging.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+def is_candidate_file(path: str) -> bool:
+    """True for files in a registered document format, skipping hidden and Office lock/temporary files."""
+    name = os.path.basename(path)
+    if name.startswith((".", "~$")) or name.endswith((".tmp", ".part")):
+        return False
+    return get_parser(path) is not None
+
+
+class DirectoryWatcher:
+    """
+    Reports files in a directory once they have stopped changing.
+
+    With watchdog installed, filesystem events (inotify on Linux) mark files to check,
+    and the whole directory is only rescanned every rescan_interval seconds to catch
+    missed events. Without watchdog, or with use_watchdog=False, the directory is
+    rescanned every poll_interval seconds.
+
+    A file is reported to on_file once its size and modification time have been stable
+    for settle_seconds, so copies still in progress are not read. Each version of a
+    file is reported once; on_file may block, which pauses discovery (backpressure).
+    """
+
+    def __init__(self, directory: str, on_file: Callable[[str], None], poll_interval: float = 2.0,
+                 settle_seconds: float = 1.0, use_watchdog: bool = True, rescan_interval: float = 60.0):
+        self.directory = directory
+        self.on_file = on_file
+        self.poll_interval = poll_interval
+        self.settle_seconds = settle_seconds
+        self.use_watchdog = use_watchdog
+        self.rescan_interval = rescan_interval
+        self._pending = {} # path -> ((size, mtime_ns), first seen with that signature)
+        self._reported = {} # path -> (size, mtime_ns) last passed to on_file
+        self._changed = set() # Paths reported by filesystem events since the last check
+        self._forgotten = set() # Paths to report again, see forget
+        self._changed_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._observer = None
+        self._thread = None
+
+    def _start_observer(self) -> bool:
+        try:
+            from watchdog.events import FileSystemEventHandler
+            from watchdog.observers import Observer
+        except ImportError:
+            logger.info("watchdog is not installed; polling the ingestion directory (pip install watchdog).")
+            return False
+
+        watcher = self
+
+        class _Handler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                if event.is_directory:
+                    return
+                paths = [event.src_path, getattr(event, "dest_path", None)]
+                with watcher._changed_lock:
+                    watcher._changed.update(os.fsdecode(path) for path in paths if path)
+                watcher._wakeup.set()
+
+        try:
+            observer = Observer()
+            observer.schedule(_Handler(), self.directory, recursive=False)
+            observer.start()
+        except OSError as e: # e.g. the inotify watch limit is reached
+            logger.warning(f"Filesystem events unavailable ({e}); polling the ingestion directory.")
+            return False
+        self._observer = observer
+        return True
+
+    def start(self) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        self._stopping.clear()
+        events = self.use_watchdog and self._start_observer()
+        self._thread = threading.Thread(target=self._run, args=(events,), name="ingestion-watcher", daemon=True)
+        self._thread.start()
+        logger.info(f"Watching {os.path.abspath(self.directory)} ({'filesystem events' if events else 'polling'})")
+
+    def stop(self, timeout: float = 10.0) -> None:
+        self._stopping.set()
+        self._wakeup.set()
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join(timeout)
+            self._observer = None
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def forget(self, path: str) -> None:
+        """Reports path again once it has settled, even if it has not changed. Safe to call from any thread."""
+        with self._changed_lock:
+            self._forgotten.add(path)
+        self._wakeup.set()
+
+    def _check(self, path: str, now: float) -> None:
+        if not is_candidate_file(path):
+            return
+        try:
+            stat = os.stat(path)
+        except OSError: # Deleted or moved away
+            self._pending.pop(path, None)
+            self._reported.pop(path, None)
+            return
+        signature = (stat.st_size, stat.st_mtime_ns)
+        if self._reported.get(path) == signature:
+            return
+        previous = self._pending.get(path)
+        if previous is None or previous[0] != signature:
+            if self.settle_seconds > 0:
+                self._pending[path] = (signature, now)
+                return
+        elif now - previous[1] < self.settle_seconds:
+            return
+        self._pending.pop(path, None)
+        self._reported[path] = signature
+        self.on_file(path)
+
+    def scan(self) -> None:
+        """Checks every file in the directory, reporting those that have settled."""
+        now = time.monotonic()
+        try:
+            with os.scandir(self.directory) as entries:
+                paths = [entry.path for entry in entries if entry.is_file()]
+        except OSError as e:
+            logger.error(f"Cannot list ingestion directory {self.directory}: {e}")
+            return
+        for path in sorted(paths):
+            if self._stopping.is_set():
+                return
+            self._check(path, now)
+
+    def _run(self, events: bool) -> None:
+        rescan_interval = self.rescan_interval if events else self.poll_interval
+        # Wake often enough to report settled files promptly
+        tick = min(rescan_interval, max(self.settle_seconds / 2, 0.1))
+        next_scan = 0.0
+        while not self._stopping.is_set():
+            now = time.monotonic()
+            if now >= next_scan:
+                self.scan()
+                next_scan = now + rescan_interval
+            with self._changed_lock:
+                changed, self._changed = self._changed, set()
+                forgotten, self._forgotten = self._forgotten, set()
+            for path in forgotten:
+                self._reported.pop(path, None)
+            changed |= forgotten
+            for path in sorted(changed | set(self._pending)):
+                if self._stopping.is_set():
+                    return
+                self._check(path, time.monotonic())
+            self._wakeup.wait(tick)
+            self._wakeup.clear()
@@ -0,0 +1,70 @@
+import json
+import logging
+import sys
+import threading
+
+from src.config.config import settings
+
+ROOT_LOGGER_NAME = "riskloggr"
+# Attributes every LogRecord has; anything else was passed through extra= and is emitted as a field
+_RECORD_ATTRIBUTES = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+_configured = False
+_configure_lock = threading.Lock()
+
+
+class JSONFormatter(logging.Formatter):
+    """Formats records as one JSON object per line, including the fields passed with extra=."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        entry.update({key: value for key, value in vars(record).items() if key not in _RECORD_ATTRIBUTES})
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class KeyValueFormatter(logging.Formatter):
+    """Human-readable format that appends the extra= fields as key=value pairs."""
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        text = super().format(record)
+        fields = [f"{key}={value}" for key, value in vars(record).items() if key not in _RECORD_ATTRIBUTES]
+        return f"{text} {' '.join(fields)}" if fields else text
+
+
+def _configure() -> None:
+    global _configured
+    with _configure_lock:
+        if _configured:
+            return
+        handler = logging.StreamHandler(sys.stderr)
+        handler.setFormatter(JSONFormatter() if settings.LOG_FORMAT == "json" else KeyValueFormatter())
+        root = logging.getLogger(ROOT_LOGGER_NAME)
+        root.addHandler(handler)
+        root.setLevel(settings.LOG_LEVEL.upper())
+        root.propagate = False
+        _configured = True
+
+def get_logger(name: str) -> logging.Logger:
+    """
+    Returns the application logger for a module, configuring the handler on first use.
+
+    Args:
+        name: Usually __name__; "src." is replaced by the riskloggr root logger name.
+
+    Returns:
+        A logging.Logger below the "riskloggr" logger.
+    """
+    _configure()
+    if name.startswith("src."):
+        name = name[len("src."):]
+    return logging.getLogger(f"{ROOT_LOGGER_NAME}.{name}")
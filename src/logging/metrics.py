@@ -0,0 +1,205 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterable, Iterator, Optional
+
+# Upper bounds (seconds) of the histogram buckets used for every duration metric
+DURATION_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# USD per million (input, output) tokens, used to estimate the cost of every LLM call
+MODEL_PRICES_PER_MILLION_TOKENS = {
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4o-mini": (0.15, 0.60),
+}
+
+# Prometheus type and help text of every metric the application records
+METRIC_DESCRIPTIONS = {
+    "riskloggr_stage_duration_seconds": ("histogram", "Duration of a classification pipeline stage."),
+    "riskloggr_llm_requests_total": ("counter", "LLM calls by backend, model and outcome."),
+    "riskloggr_llm_tokens_total": ("counter", "Tokens reported by the LLM backend."),
+    "riskloggr_llm_cost_usd_total": ("counter", "Estimated LLM spend in US dollars."),
+    "riskloggr_classifications_reused_total": ("counter", "Classifications served without an LLM call, by source."),
+    "riskloggr_cache_events_total": ("counter", "Classification cache lookups and writes by result."),
+    "riskloggr_cache_hit_ratio": ("gauge", "Share of classification cache lookups that were hits."),
+    "riskloggr_cache_memory_entries": ("gauge", "Entries in the in-process classification cache tier."),
+    "riskloggr_coalesced_requests_total": ("counter", "Classification requests that waited for an identical in-flight request, by outcome."),
+    "riskloggr_db_lock_wait_seconds": ("histogram", "Time spent waiting for the SQLite write lock."),
+    "riskloggr_db_pool_wait_seconds": ("histogram", "Time spent waiting for a pooled SQLite connection."),
+    "riskloggr_ingested_files_total": ("counter", "Files handled by the ingestion daemon by outcome."),
+}
+
+
+class Histogram:
+    """Cumulative-bucket histogram with count, sum and max."""
+
+    def __init__(self, buckets: tuple[float, ...] = DURATION_BUCKETS):
+        self.buckets = buckets
+        self.bucket_counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.bucket_counts[index] += 1
+                break
+
+
+def _label_key(labels: dict) -> tuple:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+def _format_labels(labels: Iterable[tuple[str, str]]) -> str:
+    labels = list(labels)
+    if not labels:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in labels)
+    return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(labels, escaped)) + "}"
+
+
+class MetricsRegistry:
+    """
+    Thread-safe in-process store of counters and histograms.
+
+    Metrics are identified by name plus keyword labels, e.g.
+    metrics.inc("riskloggr_llm_tokens_total", 812, kind="prompt"). Collectors registered
+    with register_collector are called at read time to add gauges for state owned by
+    other objects (such as the classification cache statistics).
+    """
+
+    def __init__(self):
+        self._counters = {}
+        self._histograms = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, value: float = 1.0, **labels) -> None:
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0.0) + value
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        key = (name, _label_key(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def register_collector(self, collector: Callable[[], Iterable[tuple[str, dict, float]]]) -> None:
+        """Registers a callable returning (name, labels, value) gauge samples."""
+        with self._lock:
+            self._collectors.append(collector)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def snapshot(self) -> dict:
+        """
+        Returns a copy of every metric for display.
+
+        Returns:
+            {"counters": [(name, labels, value)], "histograms": [(name, labels, count, sum, max)],
+            "gauges": [(name, labels, value)]} with labels as dicts.
+        """
+        with self._lock:
+            counters = [(name, dict(labels), value) for (name, labels), value in self._counters.items()]
+            histograms = [
+                (name, dict(labels), histogram.count, histogram.sum, histogram.max)
+                for (name, labels), histogram in self._histograms.items()
+            ]
+            collectors = list(self._collectors)
+        gauges = [sample for collector in collectors for sample in collector()]
+        return {"counters": counters, "histograms": histograms, "gauges": gauges}
+
+    def render_prometheus(self) -> str:
+        """Renders every metric in the Prometheus text exposition format (version 0.0.4)."""
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(
+                ((key, histogram.buckets, list(histogram.bucket_counts), histogram.count, histogram.sum)
+                 for key, histogram in self._histograms.items()),
+                key=lambda item: item[0]
+            )
+            collectors = list(self._collectors)
+        gauges = sorted((name, _label_key(labels), value) for collector in collectors for name, labels, value in collector())
+
+        lines = []
+        described = set()
+
+        def describe(name: str, default_type: str) -> None:
+            if name not in described:
+                described.add(name)
+                metric_type, help_text = METRIC_DESCRIPTIONS.get(name, (default_type, name))
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {metric_type}")
+
+        for (name, labels), value in counters:
+            describe(name, "counter")
+            lines.append(f"{name}{_format_labels(labels)} {value:g}")
+        for name, labels, value in gauges:
+            describe(name, "gauge")
+            lines.append(f"{name}{_format_labels(labels)} {value:g}")
+        for (name, labels), buckets, bucket_counts, count, total in histograms:
+            describe(name, "histogram")
+            cumulative = 0
+            for bound, bucket_count in zip(buckets, bucket_counts):
+                cumulative += bucket_count
+                lines.append(f"{name}_bucket{_format_labels(labels + (('le', f'{bound:g}'),))} {cumulative}")
+            lines.append(f"{name}_bucket{_format_labels(labels + (('le', '+Inf'),))} {count}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {total:g}")
+            lines.append(f"{name}_count{_format_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+@contextmanager
+def timed(stage: str, **labels) -> Iterator[None]:
+    """Records the duration of the with block as riskloggr_stage_duration_seconds{stage=...}."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.observe("riskloggr_stage_duration_seconds", time.perf_counter() - start, stage=stage, **labels)
+
+def record_token_usage(backend: str, model: str, usage: Optional[dict]) -> Optional[float]:
+    """
+    Records the tokens of one LLM call and returns its estimated cost in USD.
+
+    Args:
+        backend: Name of the LLM backend that served the call.
+        model: Model name, looked up in MODEL_PRICES_PER_MILLION_TOKENS.
+        usage: Dict with prompt_tokens, completion_tokens and optionally cached_tokens, or None if not reported.
+
+    Returns:
+        The estimated cost, or None when the usage or the model price is unknown.
+    """
+    if not usage:
+        return None
+    prompt_tokens = usage.get("prompt_tokens") or 0
+    completion_tokens = usage.get("completion_tokens") or 0
+    metrics.inc("riskloggr_llm_tokens_total", prompt_tokens, backend=backend, model=model, kind="prompt")
+    metrics.inc("riskloggr_llm_tokens_total", completion_tokens, backend=backend, model=model, kind="completion")
+    if usage.get("cached_tokens"):
+        # Part of prompt_tokens; counted separately to show how often the provider reused the prompt prefix
+        metrics.inc("riskloggr_llm_tokens_total", usage["cached_tokens"], backend=backend, model=model, kind="cached_prompt")
+    prices = MODEL_PRICES_PER_MILLION_TOKENS.get(model)
+    if prices is None or backend != "openai": # Fake and replayed calls cost nothing
+        return None
+    cost = (prompt_tokens * prices[0] + completion_tokens * prices[1]) / 1_000_000
+    metrics.inc("riskloggr_llm_cost_usd_total", cost, backend=backend, model=model)
+    return cost
+
+def write_prometheus_file(path: str) -> None:
+    """Writes the current metrics to path atomically, e.g. for the node_exporter textfile collector."""
+    temporary_path = f"{path}.tmp"
+    with open(temporary_path, "w", encoding="utf-8") as f:
+        f.write(metrics.render_prometheus())
+    os.replace(temporary_path, path)
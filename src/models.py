@@ -1,8 +1,25 @@
+import json
+import threading
+from functools import lru_cache
+from typing import Any, Iterable, Iterator, Mapping, Optional, Union
+
+import numpy as np
 from pydantic import BaseModel
-from typing import Optional, Union, Any
+
+def split_recommendations(control_recommendations: str) -> list[str]:
+    """Splits newline-joined, optionally numbered recommendations ("1. Do X") into a list."""
+    return [
+        line.strip("0123456789. ").strip()
+        for line in control_recommendations.splitlines()
+        if line.strip()
+    ]
+
+def split_stored_recommendations(stored: str) -> list[str]:
+    """Splits stored recommendations (one per line) into a list without changing their text."""
+    return [line for line in stored.split("\n") if line.strip()]
 
 class RiskClassification(BaseModel):
-    incident_description: Optional[str] = "" 
+    incident_description: Optional[str] = ""
     basel_ii_category: str
     severity_score: int
     root_cause: str
@@ -15,8 +32,366 @@ class RiskClassification(BaseModel):
 
     def model_post_init(self, _context: Any) -> None:
         if isinstance(self.control_recommendations, str):
-            self.control_recommendations = [
-                line.strip("0123456789. ").strip()
-                for line in self.control_recommendations.splitlines()
-                if line.strip()
-            ]
+            self.control_recommendations = split_recommendations(self.control_recommendations)
+
+
+# Cap of each Categories registry; codes are stored as int16 in ClassificationBatch
+MAX_CATEGORY_CODES = 1024
+
+
+class Categories:
+    """
+    Interns the values of a categorical field as small integer codes.
+
+    The expected values get fixed codes in declaration order. Values outside the
+    vocabulary (free-form LLM output, legacy imports) are appended on first sight, so
+    they round-trip, until the registry holds max_size values; later unknown values all
+    share the code of overflow. The registries are process-global, so the cap keeps
+    arbitrary stored data from growing them, and the codes, without bound. Code -1
+    stands for None.
+    """
+
+    def __init__(self, values: Iterable[str], max_size: int = MAX_CATEGORY_CODES, overflow: str = "Other"):
+        self.values = list(values)
+        self.max_size = max_size
+        self.overflow = overflow
+        self._codes = {value: code for code, value in enumerate(self.values)}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def code(self, value: Optional[str]) -> int:
+        if value is None:
+            return -1
+        code = self._codes.get(value)
+        if code is None:
+            with self._lock:
+                code = self._codes.get(value)
+                if code is None:
+                    if len(self.values) >= self.max_size - 1 and value != self.overflow:
+                        # The last free code is reserved for the overflow value
+                        code = self._codes.get(self.overflow)
+                        if code is not None:
+                            return code
+                        value = self.overflow
+                    code = len(self.values)
+                    self.values.append(value)
+                    self._codes[value] = code
+        return code
+
+    def value(self, code: int) -> Optional[str]:
+        return self.values[code] if code >= 0 else None
+
+
+# Closed vocabularies of the categorical fields. The prompt schema and the Categories
+# registries below are built from these, so they do not change with runtime data.
+BASEL_II_CATEGORIES = (
+    "Internal Fraud", "External Fraud", "Employment Practices and Workplace Safety",
+    "Clients, Products and Business Practices", "Damage to Physical Assets",
+    "Business Disruption and System Failures", "Execution, Delivery and Process Management",
+)
+RISK_LEVELS = ("Low", "Medium", "High", "Very High") # Shared by inherent_risk and residual_risk
+LIKELIHOOD_LEVELS = ("Rare", "Unlikely", "Possible", "Likely", "Certain")
+IMPACT_TYPES = ("Financial", "Legal", "Reputational", "Operational")
+
+BASEL_CATEGORY_CODES = Categories(BASEL_II_CATEGORIES)
+RISK_LEVEL_CODES = Categories(RISK_LEVELS)
+LIKELIHOOD_CODES = Categories(LIKELIHOOD_LEVELS)
+# Impact types are bits of an int64 mask, so codes must stay below 63
+IMPACT_TYPE_CODES = Categories(IMPACT_TYPES, max_size=63)
+
+def impact_mask(impact_types: Iterable[str]) -> int:
+    """Encodes a list of impact types as a bit mask of their IMPACT_TYPE_CODES codes."""
+    mask = 0
+    for impact in impact_types:
+        if impact:
+            mask |= 1 << IMPACT_TYPE_CODES.code(impact)
+    return mask
+
+def impact_types(mask: int) -> list[str]:
+    """Decodes an impact bit mask into impact types, in code order."""
+    return [IMPACT_TYPE_CODES.values[code] for code in range(mask.bit_length()) if mask >> code & 1]
+
+@lru_cache(maxsize=4096)
+def _stored_impact_mask(stored: Optional[str]) -> int:
+    # Stored impact lists repeat a handful of combinations, so each JSON string is decoded once
+    try:
+        parsed = json.loads(stored) if stored else []
+    except ValueError:
+        return 0
+    return impact_mask(parsed) if isinstance(parsed, list) else 0
+
+def _decode_json_list(stored) -> list:
+    if isinstance(stored, list):
+        return stored
+    try:
+        parsed = json.loads(stored) if stored else []
+    except (TypeError, ValueError):
+        return []
+    return parsed if isinstance(parsed, list) else []
+
+
+class ClassificationRecord:
+    """
+    Compact, validation-free classification for bulk code paths.
+
+    Categorical fields are held as codes (see Categories) and the impact types as a bit
+    mask. Control recommendations and framework tags stay in their stored form
+    (newline-joined text, JSON) until first read. Attribute names match
+    RiskClassification, so the framework mappers accept either. Use from_row for
+    trusted database rows and to_model/from_model at the API edge.
+    """
+
+    __slots__ = ("id", "timestamp", "incident_description", "severity_score", "root_cause",
+                 "basel_category_code", "inherent_risk_code", "residual_risk_code", "likelihood_code",
+                 "impact_mask", "_control_recommendations", "_framework_tags")
+
+    def __init__(self, basel_ii_category: str, severity_score: int, root_cause: str,
+                 control_recommendations: Union[str, list[str]], incident_description: Optional[str] = "",
+                 framework_tags: Union[str, list[str], None] = None, inherent_risk: Optional[str] = None,
+                 residual_risk: Optional[str] = None, likelihood: Optional[str] = None,
+                 impact_type: Optional[list[str]] = None, id: Optional[int] = None, timestamp: Optional[str] = None):
+        self.id = id
+        self.timestamp = timestamp
+        self.incident_description = incident_description
+        self.severity_score = severity_score
+        self.root_cause = root_cause
+        self.basel_category_code = BASEL_CATEGORY_CODES.code(basel_ii_category)
+        self.inherent_risk_code = RISK_LEVEL_CODES.code(inherent_risk)
+        self.residual_risk_code = RISK_LEVEL_CODES.code(residual_risk)
+        self.likelihood_code = LIKELIHOOD_CODES.code(likelihood)
+        self.impact_mask = impact_mask(impact_type or [])
+        self._control_recommendations = control_recommendations
+        self._framework_tags = framework_tags
+
+    @classmethod
+    def from_row(cls, row: Mapping) -> "ClassificationRecord":
+        """
+        Builds a record from a stored classifications row without validation.
+
+        Args:
+            row: A sqlite3.Row or dict with every column of the classifications table.
+        """
+        record = cls.__new__(cls)
+        record.id = row["id"]
+        record.timestamp = row["timestamp"]
+        record.incident_description = row["incident_description"]
+        record.severity_score = row["severity_score"]
+        record.root_cause = row["root_cause"]
+        record.basel_category_code = BASEL_CATEGORY_CODES.code(row["basel_ii_category"])
+        record.inherent_risk_code = RISK_LEVEL_CODES.code(row["inherent_risk"])
+        record.residual_risk_code = RISK_LEVEL_CODES.code(row["residual_risk"])
+        record.likelihood_code = LIKELIHOOD_CODES.code(row["likelihood"])
+        record.impact_mask = _stored_impact_mask(row["impact_type"])
+        record._control_recommendations = row["control_recommendations"]
+        record._framework_tags = row["framework_tags"]
+        return record
+
+    @classmethod
+    def from_model(cls, classification: RiskClassification, id: Optional[int] = None,
+                   timestamp: Optional[str] = None) -> "ClassificationRecord":
+        return cls(
+            basel_ii_category=classification.basel_ii_category,
+            severity_score=classification.severity_score,
+            root_cause=classification.root_cause,
+            control_recommendations=classification.control_recommendations,
+            incident_description=classification.incident_description,
+            framework_tags=list(classification.framework_tags),
+            inherent_risk=classification.inherent_risk,
+            residual_risk=classification.residual_risk,
+            likelihood=classification.likelihood,
+            impact_type=classification.impact_type,
+            id=id,
+            timestamp=timestamp,
+        )
+
+    @property
+    def basel_ii_category(self) -> Optional[str]:
+        return BASEL_CATEGORY_CODES.value(self.basel_category_code)
+
+    @property
+    def inherent_risk(self) -> Optional[str]:
+        return RISK_LEVEL_CODES.value(self.inherent_risk_code)
+
+    @property
+    def residual_risk(self) -> Optional[str]:
+        return RISK_LEVEL_CODES.value(self.residual_risk_code)
+
+    @property
+    def likelihood(self) -> Optional[str]:
+        return LIKELIHOOD_CODES.value(self.likelihood_code)
+
+    @property
+    def impact_type(self) -> list[str]:
+        return impact_types(self.impact_mask)
+
+    @property
+    def control_recommendations(self) -> list[str]:
+        if not isinstance(self._control_recommendations, list):
+            self._control_recommendations = split_stored_recommendations(self._control_recommendations or "")
+        return self._control_recommendations
+
+    @property
+    def framework_tags(self) -> list[str]:
+        if not isinstance(self._framework_tags, list):
+            self._framework_tags = _decode_json_list(self._framework_tags)
+        return self._framework_tags
+
+    def to_dict(self) -> dict:
+        """Returns the fields as a dict with list fields decoded, like classification_row_to_dict."""
+        return {
+            "id": self.id,
+            "timestamp": self.timestamp,
+            "basel_ii_category": self.basel_ii_category,
+            "severity_score": self.severity_score,
+            "root_cause": self.root_cause,
+            "control_recommendations": self.control_recommendations,
+            "incident_description": self.incident_description,
+            "framework_tags": self.framework_tags,
+            "inherent_risk": self.inherent_risk,
+            "residual_risk": self.residual_risk,
+            "likelihood": self.likelihood,
+            "impact_type": self.impact_type,
+        }
+
+    def to_model(self) -> RiskClassification:
+        """Converts to a RiskClassification without re-validating (the record came from trusted data)."""
+        return RiskClassification.model_construct(
+            incident_description=self.incident_description,
+            basel_ii_category=self.basel_ii_category,
+            severity_score=self.severity_score,
+            root_cause=self.root_cause,
+            control_recommendations=list(self.control_recommendations),
+            framework_tags=list(self.framework_tags),
+            inherent_risk=self.inherent_risk,
+            residual_risk=self.residual_risk,
+            likelihood=self.likelihood,
+            impact_type=self.impact_type,
+        )
+
+    def __repr__(self) -> str:
+        return (f"ClassificationRecord(id={self.id!r}, basel_ii_category={self.basel_ii_category!r}, "
+                f"severity_score={self.severity_score!r}, likelihood={self.likelihood!r})")
+
+
+class ClassificationBatch:
+    """
+    Struct-of-arrays view of many classifications.
+
+    Codes, severity scores and impact masks are NumPy columns, so counts and filters run
+    without creating a Python object per row; text columns are plain lists. Indexing
+    returns a ClassificationRecord.
+    """
+
+    def __init__(self, ids: np.ndarray, timestamps: list, incident_descriptions: list, severity_scores: np.ndarray,
+                 root_causes: list, basel_category_codes: np.ndarray, inherent_risk_codes: np.ndarray,
+                 residual_risk_codes: np.ndarray, likelihood_codes: np.ndarray, impact_masks: np.ndarray,
+                 control_recommendations: list, framework_tags: list):
+        self.ids = ids
+        self.timestamps = timestamps
+        self.incident_descriptions = incident_descriptions
+        self.severity_scores = severity_scores
+        self.root_causes = root_causes
+        self.basel_category_codes = basel_category_codes
+        self.inherent_risk_codes = inherent_risk_codes
+        self.residual_risk_codes = residual_risk_codes
+        self.likelihood_codes = likelihood_codes
+        self.impact_masks = impact_masks
+        self.control_recommendations = control_recommendations # Stored form, decoded per record
+        self.framework_tags = framework_tags
+
+    @classmethod
+    def from_rows(cls, rows: list) -> "ClassificationBatch":
+        """
+        Builds a batch from stored classifications rows without validation.
+
+        Args:
+            rows: sqlite3.Row objects (or dicts) with every column of the classifications table.
+        """
+        def column(name: str) -> list:
+            return [row[name] for row in rows]
+
+        def codes(categories: Categories, name: str) -> np.ndarray:
+            return np.fromiter((categories.code(row[name]) for row in rows), dtype=np.int16, count=len(rows))
+
+        return cls(
+            ids=np.fromiter((row["id"] or 0 for row in rows), dtype=np.int64, count=len(rows)),
+            timestamps=column("timestamp"),
+            incident_descriptions=column("incident_description"),
+            # 0 marks a missing score (valid scores are 1-5)
+            severity_scores=np.fromiter((row["severity_score"] or 0 for row in rows), dtype=np.int16, count=len(rows)),
+            root_causes=column("root_cause"),
+            basel_category_codes=codes(BASEL_CATEGORY_CODES, "basel_ii_category"),
+            inherent_risk_codes=codes(RISK_LEVEL_CODES, "inherent_risk"),
+            residual_risk_codes=codes(RISK_LEVEL_CODES, "residual_risk"),
+            likelihood_codes=codes(LIKELIHOOD_CODES, "likelihood"),
+            impact_masks=np.fromiter((_stored_impact_mask(row["impact_type"]) for row in rows), dtype=np.int64, count=len(rows)),
+            control_recommendations=column("control_recommendations"),
+            framework_tags=column("framework_tags"),
+        )
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __getitem__(self, index: int) -> ClassificationRecord:
+        record = ClassificationRecord.__new__(ClassificationRecord)
+        record.id = int(self.ids[index])
+        record.timestamp = self.timestamps[index]
+        record.incident_description = self.incident_descriptions[index]
+        record.severity_score = int(self.severity_scores[index])
+        record.root_cause = self.root_causes[index]
+        record.basel_category_code = int(self.basel_category_codes[index])
+        record.inherent_risk_code = int(self.inherent_risk_codes[index])
+        record.residual_risk_code = int(self.residual_risk_codes[index])
+        record.likelihood_code = int(self.likelihood_codes[index])
+        record.impact_mask = int(self.impact_masks[index])
+        record._control_recommendations = self.control_recommendations[index]
+        record._framework_tags = self.framework_tags[index]
+        return record
+
+    def __iter__(self) -> Iterator[ClassificationRecord]:
+        return (self[index] for index in range(len(self)))
+
+    def value_counts(self, field: str) -> dict[str, int]:
+        """
+        Counts rows per value of a categorical field.
+
+        Args:
+            field: "basel_ii_category", "inherent_risk", "residual_risk", "likelihood" or
+                "impact_type" (a row counts once for each of its impact types).
+        """
+        if field == "impact_type":
+            return {
+                impact: int(np.count_nonzero(self.impact_masks >> code & 1))
+                for code, impact in enumerate(list(IMPACT_TYPE_CODES.values))
+                if np.any(self.impact_masks >> code & 1)
+            }
+        categories, codes = {
+            "basel_ii_category": (BASEL_CATEGORY_CODES, self.basel_category_codes),
+            "inherent_risk": (RISK_LEVEL_CODES, self.inherent_risk_codes),
+            "residual_risk": (RISK_LEVEL_CODES, self.residual_risk_codes),
+            "likelihood": (LIKELIHOOD_CODES, self.likelihood_codes),
+        }[field]
+        counts = np.bincount(codes[codes >= 0], minlength=len(categories))
+        return {categories.value(code): int(count) for code, count in enumerate(counts) if count}
+
+    def to_frame(self):
+        """Returns a pandas DataFrame with categorical dtypes for the coded columns."""
+        import pandas as pd
+
+        def categorical(codes: np.ndarray, categories: Categories):
+            return pd.Categorical.from_codes(codes, categories=list(categories.values))
+
+        return pd.DataFrame({
+            "id": self.ids,
+            "timestamp": self.timestamps,
+            "basel_ii_category": categorical(self.basel_category_codes, BASEL_CATEGORY_CODES),
+            "severity_score": self.severity_scores,
+            "root_cause": self.root_causes,
+            "inherent_risk": categorical(self.inherent_risk_codes, RISK_LEVEL_CODES),
+            "residual_risk": categorical(self.residual_risk_codes, RISK_LEVEL_CODES),
+            "likelihood": categorical(self.likelihood_codes, LIKELIHOOD_CODES),
+            "impact_type": [impact_types(int(mask)) for mask in self.impact_masks],
+            "incident_description": self.incident_descriptions,
+        })
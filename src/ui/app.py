@@ -2,22 +2,54 @@ import sys
 import os
 import pandas as pd
 import io
+import html
+import tempfile
 from datetime import datetime
 import altair as alt # Import altair for visualization
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
-from src.data_parser.parser import parse_input
 import json
 import streamlit as st
-from src.models import RiskClassification # Import RiskClassification from models.py
-from src.data_parser.parser import parse_input
-from src.classification.classifier import classify_incident # Import classify_incident
-from src.database.database import initialize_database, save_classification_result, log_download, update_classification_result, get_all_classifications # Import database functions
+from src.models import IMPACT_TYPES, LIKELIHOOD_LEVELS, RISK_LEVELS, RiskClassification # Import RiskClassification from models.py
+from src.data_parser.parser import parse_input, parse_uploaded_file, supported_extensions
+from src.data_parser.csv_import import import_legacy_csv
+from src.database.export import EXPORT_FORMATS, export_classifications, prune_export_files
+from src.classification.classifier import classify_incident_stream
+from src.classification.similarity import start_similarity_index_load
+from src.database.database import initialize_database, save_classification_result, log_download, update_classification_result, search_classifications, SEARCH_RANK_WINDOW # Import database functions
+from src.database.rollups import get_category_trend, get_framework_tag_frequencies, get_likelihood_impact_cells, get_risk_transitions, get_severity_histogram
 
 from src.config.config import settings
+from src.logging.metrics import metrics
 # print("DEBUG: API key loaded ->", settings.OPENAI_API_KEY) # Commented out for cleaner output
 
+@st.cache_resource
+def init_database() -> bool:
+    """Runs schema creation/migrations once per server process instead of on every rerun."""
+    initialize_database()
+    start_similarity_index_load()
+    return True
+
+@st.cache_data(show_spinner=False)
+def load_heatmap_cells() -> list[dict]:
+    """Heatmap cells, cached across reruns and cleared whenever classifications are written."""
+    return get_likelihood_impact_cells(samples_per_cell=3)
+
+@st.cache_data(show_spinner=False)
+def load_trend_rollups() -> dict[str, list[dict]]:
+    """Dashboard aggregates read from the rollup tables, so they cost the same for any history length."""
+    return {
+        "categories": get_category_trend(granularity="month"),
+        "severity": get_severity_histogram(),
+        "framework_tags": get_framework_tag_frequencies(limit=15),
+        "transitions": get_risk_transitions(),
+    }
+
+def invalidate_classification_data() -> None:
+    load_heatmap_cells.clear()
+    load_trend_rollups.clear()
+
 # Initialize the database when the app starts
-initialize_database()
+init_database()
 
 st.markdown("""
     <style>
@@ -84,13 +116,37 @@ is_file_input = False
 if input_method == "Enter Text":
     incident_input = st.text_area("Enter Incident Description:", height=200)
 elif input_method == "Upload File":
-    uploaded_file = st.file_uploader("Upload Incident File:", type=['txt'])
+    uploaded_file = st.file_uploader("Upload Incident File:", type=supported_extensions())
     if uploaded_file is not None:
-        # Streamlit file uploader provides a file-like object
-        # For simplicity, read content directly here.
-        # In a more complex app, you might save and parse the path.
-        incident_input = uploaded_file.getvalue().decode("utf-8")
-        is_file_input = False # We have the content, not a path
+        # Extract the text once per upload (PDF, DOCX, e-mail, ...); the parser also caches it by file hash
+        if st.session_state.get('parsed_upload_id') != uploaded_file.file_id:
+            try:
+                st.session_state.parsed_upload_text = parse_uploaded_file(uploaded_file.name, uploaded_file, uploaded_file.type)
+            except Exception as e:
+                st.session_state.parsed_upload_text = None
+                st.error(f"Error reading file {uploaded_file.name}: {e}")
+            st.session_state.parsed_upload_id = uploaded_file.file_id
+        incident_input = st.session_state.parsed_upload_text
+        is_file_input = False # We have the extracted content, not a path
+
+
+def render_partial_classification(placeholder, partial: RiskClassification) -> None:
+    """Shows the fields of a classification that have arrived so far."""
+    fields = partial.__dict__
+    lines = ["###  Classifying..."]
+    for label, name in (("Basel II Category", "basel_ii_category"), ("Severity Score", "severity_score"),
+                        ("Root Cause", "root_cause"), ("Inherent Risk", "inherent_risk"),
+                        ("Residual Risk", "residual_risk"), ("Likelihood", "likelihood")):
+        if fields.get(name) is not None:
+            lines.append(f"**{label}:** {fields[name]}")
+    if isinstance(fields.get("control_recommendations"), list):
+        lines.append("**🛡 Control Recommendations:**")
+        lines.extend(f"- {rec}" for rec in fields["control_recommendations"])
+    if fields.get("impact_type"):
+        lines.append(f"**Impact Type(s):** {', '.join(fields['impact_type'])}")
+    if fields.get("framework_tags"):
+        lines.append("**Framework Mappings:** " + "; ".join(fields["framework_tags"]))
+    placeholder.markdown("\n\n".join(lines))
 
 if st.button("Classify Incident"):
     if incident_input:
@@ -101,159 +157,30 @@ if st.button("Classify Incident"):
         if parsed_content.startswith("Error:"):
             st.error(parsed_content)
         else:
-            st.info("Classifying incident...")
-            classification_result = classify_incident(parsed_content)
+            # Render fields as they stream in instead of waiting for the whole completion
+            classification_result = None
+            partial_placeholder = st.empty()
+            with st.spinner("Classifying incident..."):
+                for update in classify_incident_stream(parsed_content):
+                    if update.complete:
+                        classification_result = update.classification
+                    else:
+                        render_partial_classification(partial_placeholder, update.classification)
+            partial_placeholder.empty()
 
             if classification_result:
-                st.markdown("###  Classification Result")
-
-                st.markdown(f"** Basel II Category:** {classification_result.basel_ii_category}")
-                st.markdown(f"** Severity Score:** {classification_result.severity_score}")
-                st.markdown(f"** Root Cause:** {classification_result.root_cause}")
-
-                st.markdown("**🛡 Control Recommendations:**")
-                if isinstance(classification_result.control_recommendations, list):
-                    for rec in classification_result.control_recommendations:
-                        st.markdown(f"- {rec}")
-                else:
-                    st.markdown(classification_result.control_recommendations)
-
-                st.markdown("### Risk Profile")
-                st.markdown(f"**Inherent Risk:** {classification_result.inherent_risk}")
-                st.markdown(f"**Residual Risk:** {classification_result.residual_risk}")
-                st.markdown(f"**Likelihood:** {classification_result.likelihood}")
-                st.markdown(f"**Impact Type(s):** {', '.join(classification_result.impact_type)}")
-
-                st.markdown("### Framework Mappings")
-                if classification_result.framework_tags:
-                    for tag in classification_result.framework_tags:
-                        st.markdown(f"- {tag}")
-                else:
-                    st.info("No framework mappings found.")
-
                 # Save the classification result to the database and get the ID
                 row_id = save_classification_result(incident_input, classification_result)
+                invalidate_classification_data()
 
-                st.markdown("---")
-                st.markdown("### Manually Adjust Risk Profile and Framework Mappings")
-
-                # Store classification in session state for editing, including the database ID
-                if 'editable_classification' not in st.session_state or st.session_state.editable_classification.get('db_id') != row_id:
-                     st.session_state.editable_classification = {
-                        "db_id": row_id, # Store the database ID
-                        "incident_description": incident_input,
-                        "basel_ii_category": classification_result.basel_ii_category,
-                        "severity_score": classification_result.severity_score,
-                        "root_cause": classification_result.root_cause,
-                        "control_recommendations": classification_result.control_recommendations,
-                        "framework_tags": classification_result.framework_tags,
-                        "inherent_risk": classification_result.inherent_risk,
-                        "residual_risk": classification_result.residual_risk,
-                        "likelihood": classification_result.likelihood,
-                        "impact_type": classification_result.impact_type
-                    }
-
-                # Editable widgets for new fields
-                # Need to store the classification result ID to update the correct row
-                # This will require modifying save_classification_result or querying the DB
-                # For now, we'll just display the widgets with current values
-
-                # Using st.session_state to hold editable values
-                if 'editable_classification' not in st.session_state or st.session_state.editable_classification['incident_description'] != incident_input:
-                     st.session_state.editable_classification = {
-                        "incident_description": incident_input,
-                        "basel_ii_category": classification_result.basel_ii_category,
-                        "severity_score": classification_result.severity_score,
-                        "root_cause": classification_result.root_cause,
-                        "control_recommendations": classification_result.control_recommendations,
-                        "framework_tags": classification_result.framework_tags,
-                        "inherent_risk": classification_result.inherent_risk,
-                        "residual_risk": classification_result.residual_risk,
-                        "likelihood": classification_result.likelihood,
-                        "impact_type": classification_result.impact_type
-                    }
-
-
-                st.session_state.editable_classification['inherent_risk'] = st.selectbox(
-                    "Inherent Risk:",
-                    ["Low", "Medium", "High", "Very High"],
-                    index=["Low", "Medium", "High", "Very High"].index(st.session_state.editable_classification['inherent_risk']) if st.session_state.editable_classification['inherent_risk'] in ["Low", "Medium", "High", "Very High"] else 0,
-                    key='edit_inherent_risk'
-                )
-
-                st.session_state.editable_classification['residual_risk'] = st.selectbox(
-                    "Residual Risk:",
-                    ["Low", "Medium", "High", "Very High"],
-                     index=["Low", "Medium", "High", "Very High"].index(st.session_state.editable_classification['residual_risk']) if st.session_state.editable_classification['residual_risk'] in ["Low", "Medium", "High", "Very High"] else 0,
-                    key='edit_residual_risk'
-                )
-
-                st.session_state.editable_classification['likelihood'] = st.selectbox(
-                    "Likelihood:",
-                    ["Rare", "Unlikely", "Possible", "Likely", "Certain"],
-                    index=["Rare", "Unlikely", "Possible", "Likely", "Certain"].index(st.session_state.editable_classification['likelihood']) if st.session_state.editable_classification['likelihood'] in ["Rare", "Unlikely", "Possible", "Likely", "Certain"] else 0,
-                    key='edit_likelihood'
-                )
-
-                impact_options = ["Financial", "Legal", "Reputational", "Operational"]
-                st.session_state.editable_classification['impact_type'] = st.multiselect(
-                    "Impact Type(s):",
-                    impact_options,
-                    default=st.session_state.editable_classification['impact_type'],
-                    key='edit_impact_type'
-                )
-
-                # Editable widget for framework tags (as a multi-select for now, could be more sophisticated)
-                # Need to get all possible framework tags or allow free text input
-                # For now, let's make it a text area for manual editing of the string representation
-                # Or maybe a multi-select with the currently assigned tags? Let's go with multi-select for now.
-                # This requires knowing all possible tags, which we don't have easily.
-                # Let's make it a text area for now, and the user can manually edit the comma-separated list.
-                # This is not ideal, but a starting point. A better approach would involve dynamic tag selection.
-
-                # Convert list of strings to a single string for text area
-                framework_tags_str = "\n".join(st.session_state.editable_classification['framework_tags'])
-
-                edited_framework_tags_str = st.text_area(
-                    "Framework Tags (Edit comma-separated list):",
-                    framework_tags_str,
-                    key='edit_framework_tags'
-                )
-
-                # Convert back to list of strings on update
-                st.session_state.editable_classification['framework_tags'] = [tag.strip() for tag in edited_framework_tags_str.split('\n') if tag.strip()]
-
-
-                if st.button("Save Manual Adjustments"):
-                    if st.session_state.editable_classification and st.session_state.editable_classification.get('db_id') is not None:
-                        # Create a RiskClassification object from the edited data
-                        updated_classification = RiskClassification(
-                            basel_ii_category=st.session_state.editable_classification['basel_ii_category'],
-                            severity_score=st.session_state.editable_classification['severity_score'],
-                            root_cause=st.session_state.editable_classification['root_cause'],
-                            control_recommendations=st.session_state.editable_classification['control_recommendations'],
-                            framework_tags=st.session_state.editable_classification['framework_tags'],
-                            inherent_risk=st.session_state.editable_classification['inherent_risk'],
-                            residual_risk=st.session_state.editable_classification['residual_risk'],
-                            likelihood=st.session_state.editable_classification['likelihood'],
-                            impact_type=st.session_state.editable_classification['impact_type']
-                        )
-                        # Update the database record
-                        update_classification_result(st.session_state.editable_classification['db_id'], updated_classification)
-                        st.success("Manual adjustments saved to database.")
-
-                        # Optionally, update the session_classifications list to reflect the changes
-                        # This requires finding the entry by ID and updating it.
-                        # For simplicity now, we'll just show the success message.
-                        # A more robust solution would refetch data or update the specific entry.
-
-                    else:
-                        st.warning("No classification result available to save adjustments.")
+                # Keep the result in session state so that later reruns (widget edits) never reclassify or refetch
+                classification_result.incident_description = incident_input
+                st.session_state.current_classification = {
+                    "db_id": row_id,
+                    "classification": classification_result.model_dump()
+                }
 
-                # Store classification in session state (this part might need adjustment
-                # if we want the session state to reflect manual edits immediately without refetching)
-                # For now, keeping it as is, it stores the initial classification result.
-                session_entry = {
+                st.session_state.session_classifications.append({
                     "timestamp": datetime.now().isoformat(),
                     "incident_description": incident_input,
                     "basel_ii_category": classification_result.basel_ii_category,
@@ -265,24 +192,105 @@ if st.button("Classify Incident"):
                     "residual_risk": classification_result.residual_risk,
                     "likelihood": classification_result.likelihood,
                     "impact_type": ", ".join(classification_result.impact_type) # Join impacts for CSV
-                }
-                st.session_state.session_classifications.append(session_entry)
-
-
-                # Add a text area for easy copy-paste
-                classification_text = f"""
-                Basel II Category: {classification_result.basel_ii_category}
-                Severity Score: {classification_result.severity_score}
-                Root Cause: {classification_result.root_cause}
-                Control Recommendations: {classification_result.control_recommendations}
-                """
-                st.text_area("Copy Classification Result:", classification_text, height=200)
-
+                })
             else:
                 st.error("Failed to classify incident. Check API key and logs.")
     else:
         st.warning("Please enter an incident description or upload a file.")
 
+current = st.session_state.get('current_classification')
+if current:
+    classification_result = RiskClassification.model_validate(current['classification'])
+
+    st.markdown("###  Classification Result")
+
+    st.markdown(f"** Basel II Category:** {classification_result.basel_ii_category}")
+    st.markdown(f"** Severity Score:** {classification_result.severity_score}")
+    st.markdown(f"** Root Cause:** {classification_result.root_cause}")
+
+    st.markdown("**🛡 Control Recommendations:**")
+    if isinstance(classification_result.control_recommendations, list):
+        for rec in classification_result.control_recommendations:
+            st.markdown(f"- {rec}")
+    else:
+        st.markdown(classification_result.control_recommendations)
+
+    st.markdown("### Risk Profile")
+    st.markdown(f"**Inherent Risk:** {classification_result.inherent_risk}")
+    st.markdown(f"**Residual Risk:** {classification_result.residual_risk}")
+    st.markdown(f"**Likelihood:** {classification_result.likelihood}")
+    st.markdown(f"**Impact Type(s):** {', '.join(classification_result.impact_type)}")
+
+    st.markdown("### Framework Mappings")
+    if classification_result.framework_tags:
+        for tag in classification_result.framework_tags:
+            st.markdown(f"- {tag}")
+    else:
+        st.info("No framework mappings found.")
+
+    st.markdown("---")
+    st.markdown("### Manually Adjust Risk Profile and Framework Mappings")
+
+    # A form batches the edit widgets: changing a selectbox no longer reruns the script until Save is pressed
+    with st.form(key=f"manual_adjustments_{current['db_id']}"):
+        edited_inherent_risk = st.selectbox(
+            "Inherent Risk:",
+            RISK_LEVELS,
+            index=RISK_LEVELS.index(classification_result.inherent_risk) if classification_result.inherent_risk in RISK_LEVELS else 0
+        )
+
+        edited_residual_risk = st.selectbox(
+            "Residual Risk:",
+            RISK_LEVELS,
+            index=RISK_LEVELS.index(classification_result.residual_risk) if classification_result.residual_risk in RISK_LEVELS else 0
+        )
+
+        edited_likelihood = st.selectbox(
+            "Likelihood:",
+            LIKELIHOOD_LEVELS,
+            index=LIKELIHOOD_LEVELS.index(classification_result.likelihood) if classification_result.likelihood in LIKELIHOOD_LEVELS else 0
+        )
+
+        edited_impact_type = st.multiselect(
+            "Impact Type(s):",
+            IMPACT_TYPES,
+            default=[impact for impact in classification_result.impact_type if impact in IMPACT_TYPES]
+        )
+
+        # Framework tags are edited as one tag line per row
+        edited_framework_tags_str = st.text_area(
+            "Framework Tags (one per line):",
+            "\n".join(classification_result.framework_tags)
+        )
+
+        save_adjustments = st.form_submit_button("Save Manual Adjustments")
+
+    if save_adjustments:
+        if current.get('db_id') is not None:
+            updated_classification = classification_result.model_copy(update={
+                "inherent_risk": edited_inherent_risk,
+                "residual_risk": edited_residual_risk,
+                "likelihood": edited_likelihood,
+                "impact_type": edited_impact_type,
+                "framework_tags": [tag.strip() for tag in edited_framework_tags_str.split('\n') if tag.strip()]
+            })
+            # Update the database record
+            update_classification_result(current['db_id'], updated_classification)
+            invalidate_classification_data()
+            current['classification'] = updated_classification.model_dump()
+            st.success("Manual adjustments saved to database.")
+        else:
+            st.warning("No classification result available to save adjustments.")
+
+    # Add a text area for easy copy-paste
+    classification_text = f"""
+    Basel II Category: {classification_result.basel_ii_category}
+    Severity Score: {classification_result.severity_score}
+    Root Cause: {classification_result.root_cause}
+    Control Recommendations: {classification_result.control_recommendations}
+    """
+    st.text_area("Copy Classification Result:", classification_text, height=200)
+
 st.markdown("---")
 st.markdown("### Session Classifications")
 
@@ -306,92 +314,276 @@ if st.session_state.session_classifications:
 else:
     st.info("No classifications in the current session yet.")
 
+st.markdown("---")
+st.markdown("### Export Classification History")
+
+export_cols = st.columns(3)
+export_format = export_cols[0].selectbox("Format:", EXPORT_FORMATS, key='export_format')
+export_start = export_cols[1].date_input("From:", value=None, key='export_start')
+export_end = export_cols[2].date_input("Until (exclusive):", value=None, key='export_end')
+export_category = st.text_input("Basel II Category (optional):", key='export_category')
+export_severity = st.multiselect("Severity Score(s):", [1, 2, 3, 4, 5], key='export_severity')
+
+def discard_export_file() -> None:
+    """Deletes this session's previous export, if any."""
+    path = st.session_state.pop('export_path', None)
+    if path and os.path.exists(path):
+        os.unlink(path)
+
+if st.button("Prepare Export"):
+    discard_export_file()
+    prune_export_files(settings.EXPORT_DIRECTORY, settings.EXPORT_FILE_TTL_SECONDS) # Exports of abandoned sessions
+    os.makedirs(settings.EXPORT_DIRECTORY, exist_ok=True)
+    # Stream the rows to a temporary file on disk instead of building the extract in memory
+    with tempfile.NamedTemporaryFile(dir=settings.EXPORT_DIRECTORY, suffix=f".{export_format}", delete=False) as export_file:
+        export_path = export_file.name
+        try:
+            exported_count = export_classifications(
+                export_file,
+                fmt=export_format,
+                user_identity=st.session_state.user_identity,
+                start=export_start,
+                end=export_end,
+                basel_ii_category=export_category or None,
+                severity_score=export_severity or None
+            )
+        except Exception as e:
+            exported_count = None
+            st.error(f"Export failed: {e}")
+    export_mb = os.path.getsize(export_path) / (1024 * 1024)
+    if exported_count is None:
+        os.unlink(export_path)
+    elif export_mb > settings.EXPORT_UI_MAX_MB:
+        # The download button holds the whole file in the Streamlit process; big extracts go through the API
+        os.unlink(export_path)
+        st.warning(
+            f"The export has {exported_count} classifications ({export_mb:.0f} MB), more than the "
+            f"{settings.EXPORT_UI_MAX_MB} MB that can be downloaded here. Narrow the filters, or download it from "
+            f"the API (GET /classifications/export?format={export_format}) or with python -m src.database.export."
+        )
+    else:
+        st.session_state.export_path = export_path
+        st.success(f"Exported {exported_count} classifications.")
+
+if st.session_state.get('export_path') and os.path.exists(st.session_state.export_path):
+    with open(st.session_state.export_path, "rb") as export_file:
+        st.download_button(
+            label="Download Export",
+            data=export_file,
+            file_name=f"classification_history{os.path.splitext(st.session_state.export_path)[1]}",
+            mime="application/octet-stream"
+        )
+
+st.markdown("---")
+st.markdown("### Search Past Incidents")
+
+SEARCH_PAGE_SIZE = 10
+
+def highlight_snippet(snippet: dict) -> str:
+    """Renders a search snippet as HTML with the matched terms marked."""
+    text, parts, position = snippet["text"], [], 0
+    for start, end in snippet["highlights"]:
+        parts.append(html.escape(text[position:start]))
+        parts.append(f"<mark>{html.escape(text[start:end])}</mark>")
+        position = end
+    parts.append(html.escape(text[position:]))
+    return "".join(parts)
+
+search_query = st.text_input("Search incidents, root causes and controls:", placeholder='e.g. phishing "customer data" vend*')
+# Start from the first page whenever the query changes
+if st.session_state.get('search_query') != search_query:
+    st.session_state.search_query = search_query
+    st.session_state.search_page = 0
+
+if search_query.strip():
+    search_results, search_total = search_classifications(
+        search_query, limit=SEARCH_PAGE_SIZE, offset=st.session_state.search_page * SEARCH_PAGE_SIZE
+    )
+    if search_total == 0:
+        st.info("No matching incidents.")
+    else:
+        first = st.session_state.search_page * SEARCH_PAGE_SIZE
+        st.caption(f"Results {first + 1}-{first + len(search_results)} of {search_total}"
+                   + (" (only the newest matches are ranked; refine the query to reach older ones)"
+                      if search_total >= SEARCH_RANK_WINDOW else ""))
+        for result in search_results:
+            st.markdown(f"**#{result['id']}** · {result['basel_ii_category']} · Severity {result['severity_score']} · {result['timestamp']}")
+            for column, snippet in result["snippets"].items():
+                label = column.replace("_", " ").capitalize()
+                st.markdown(f"<small>{label}:</small> {highlight_snippet(snippet)}", unsafe_allow_html=True)
+        previous_column, next_column = st.columns(2)
+        if previous_column.button("Previous", disabled=st.session_state.search_page == 0):
+            st.session_state.search_page -= 1
+            st.rerun()
+        if next_column.button("Next", disabled=first + SEARCH_PAGE_SIZE >= search_total):
+            st.session_state.search_page += 1
+            st.rerun()
+
 st.markdown("---")
 st.markdown("### Risk Heatmap (Likelihood vs. Impact)")
 
-# Fetch all classifications from the database
-all_classifications_db = get_all_classifications()
-
-if all_classifications_db:
-    # Convert to pandas DataFrame
-    all_classifications_df = pd.DataFrame(all_classifications_db)
-
-    # Map likelihood and impact to numerical scales
-    likelihood_map = {"Rare": 1, "Unlikely": 2, "Possible": 3, "Likely": 4, "Certain": 5}
-    impact_map = {"Financial": 1, "Legal": 2, "Reputational": 3, "Operational": 4} # Simplified mapping for heatmap
-
-    # Process impact_type (which is stored as a JSON string list)
-    # Expand rows for multiple impact types
-    heatmap_data = []
-    for index, row in all_classifications_df.iterrows():
-        impact_types = json.loads(row['impact_type']) if row['impact_type'] else []
-        for impact in impact_types:
-            if impact in impact_map:
-                heatmap_data.append({
-                    'likelihood': row['likelihood'],
-                    'impact_type': impact,
-                    'likelihood_score': likelihood_map.get(row['likelihood'], 0),
-                    'impact_score': impact_map.get(impact, 0),
-                    'incident_description': row['incident_description'] # Include description for tooltip
-                })
+# Fetch the (likelihood, impact type) cells from the rollup table
+heatmap_cells = load_heatmap_cells()
+
+# Map likelihood and impact to numerical scales
+likelihood_map = {"Rare": 1, "Unlikely": 2, "Possible": 3, "Likely": 4, "Certain": 5}
+impact_map = {"Financial": 1, "Legal": 2, "Reputational": 3, "Operational": 4} # Simplified mapping for heatmap
+
+heatmap_data = [
+    {
+        'likelihood': cell['likelihood'],
+        'impact_type': cell['impact_type'],
+        'likelihood_score': likelihood_map.get(cell['likelihood'], 0),
+        'impact_score': impact_map[cell['impact_type']],
+        'count': cell['count'],
+        'sample_incidents': " | ".join(cell['samples']) # A few recent descriptions for the tooltip
+    }
+    for cell in heatmap_cells
+    if cell['impact_type'] in impact_map
+]
+
+heatmap_df = pd.DataFrame(heatmap_data)
+
+if not heatmap_df.empty:
+    # Create the heatmap using Altair
+    chart = alt.Chart(heatmap_df).mark_circle().encode(
+        x=alt.X('likelihood_score:O', title='Likelihood', axis=alt.Axis(values=list(likelihood_map.values()), labelExpr="['Rare', 'Unlikely', 'Possible', 'Likely', 'Certain'][datum.value - 1]")),
+        y=alt.Y('impact_score:O', title='Impact Type', axis=alt.Axis(values=list(impact_map.values()), labelExpr="['Financial', 'Legal', 'Reputational', 'Operational'][datum.value - 1]")),
+        size='count:Q', # Size of circles based on count of incidents
+        color=alt.Color('count:Q', legend=alt.Legend(title="Number of Incidents")),
+        tooltip=['likelihood', 'impact_type', 'count', 'sample_incidents']
+    ).properties(
+        title='Risk Heatmap'
+    ).interactive() # Enable zooming and panning
+
+    st.altair_chart(chart, use_container_width=True)
+else:
+    st.info("No data available to generate heatmap.")
 
-    heatmap_df = pd.DataFrame(heatmap_data)
-
-    if not heatmap_df.empty:
-        # Create the heatmap using Altair
-        chart = alt.Chart(heatmap_df).mark_circle().encode(
-            x=alt.X('likelihood_score:O', title='Likelihood', axis=alt.Axis(values=list(likelihood_map.values()), labelExpr="['Rare', 'Unlikely', 'Possible', 'Likely', 'Certain'][datum.value - 1]")),
-            y=alt.Y('impact_score:O', title='Impact Type', axis=alt.Axis(values=list(impact_map.values()), labelExpr="['Financial', 'Legal', 'Reputational', 'Operational'][datum.value - 1]")),
-            size='count()', # Size of circles based on count of incidents
-            color=alt.Color('count()', legend=alt.Legend(title="Number of Incidents")),
-            tooltip=['likelihood', 'impact_type', 'incident_description', 'count()']
-        ).properties(
-            title='Risk Heatmap'
-        ).interactive() # Enable zooming and panning
-
-        st.altair_chart(chart, use_container_width=True)
-    else:
-        st.info("No data available to generate heatmap.")
+st.markdown("---")
+st.markdown("### Risk Trends")
+
+trend_rollups = load_trend_rollups()
+if trend_rollups["categories"]:
+    category_df = pd.DataFrame(trend_rollups["categories"]).replace({"basel_ii_category": {"": "Unknown"}})
+    st.altair_chart(alt.Chart(category_df).mark_line(point=True).encode(
+        x=alt.X('period:O', title='Month'),
+        y=alt.Y('count:Q', title='Incidents'),
+        color=alt.Color('basel_ii_category:N', title='Basel II Category'),
+        tooltip=['period', 'basel_ii_category', 'count']
+    ).properties(title='Incidents per Month by Basel II Category'), use_container_width=True)
+
+    severity_column, transition_column = st.columns(2)
+    severity_df = pd.DataFrame(trend_rollups["severity"])
+    severity_df = severity_df[severity_df['severity_score'] > 0]
+    severity_column.altair_chart(alt.Chart(severity_df).mark_bar().encode(
+        x=alt.X('severity_score:O', title='Severity'),
+        y=alt.Y('count:Q', title='Incidents'),
+        tooltip=['severity_score', 'count']
+    ).properties(title='Severity Distribution'), use_container_width=True)
+
+    transitions_df = pd.DataFrame(trend_rollups["transitions"]).replace({"inherent_risk": {"": "Unknown"}, "residual_risk": {"": "Unknown"}})
+    transition_column.altair_chart(alt.Chart(transitions_df).mark_rect().encode(
+        x=alt.X('residual_risk:O', title='Residual Risk', sort=list(RISK_LEVELS) + ['Unknown']),
+        y=alt.Y('inherent_risk:O', title='Inherent Risk', sort=list(RISK_LEVELS) + ['Unknown']),
+        color=alt.Color('count:Q', legend=alt.Legend(title="Incidents")),
+        tooltip=['inherent_risk', 'residual_risk', 'count']
+    ).properties(title='Inherent vs. Residual Risk'), use_container_width=True)
+
+    if trend_rollups["framework_tags"]:
+        tags_df = pd.DataFrame(trend_rollups["framework_tags"])
+        tags_df['label'] = tags_df['framework'] + ": " + tags_df['tag']
+        st.altair_chart(alt.Chart(tags_df).mark_bar().encode(
+            x=alt.X('count:Q', title='Incidents'),
+            y=alt.Y('label:N', title='Framework Tag', sort='-x'),
+            color=alt.Color('framework:N', title='Framework'),
+            tooltip=['framework', 'tag', 'count']
+        ).properties(title='Most Frequent Framework Tags'), use_container_width=True)
+else:
+    st.info("No data available to generate trends.")
 
 st.markdown("---")
 st.markdown("### Import Legacy Classifications (CSV)")
 
 uploaded_csv_file = st.file_uploader("Upload Legacy Classifications CSV:", type=['csv'])
 
-if uploaded_csv_file is not None:
+# Import each uploaded file once; reruns with the same upload only show the previous outcome
+if uploaded_csv_file is not None and st.session_state.get('imported_csv_id') != uploaded_csv_file.file_id:
+    st.session_state.imported_csv_id = uploaded_csv_file.file_id
     try:
-        # Read the CSV file into a pandas DataFrame
-        legacy_df = pd.read_csv(uploaded_csv_file)
-
-        # Validate expected columns
-        required_columns = ['incident_description', 'basel_ii_category', 'severity_score', 'root_cause', 'control_recommendations']
-        if not all(col in legacy_df.columns for col in required_columns):
-            st.error(f"CSV must contain the following columns: {', '.join(required_columns)}")
-        else:
-            st.info(f"Found {len(legacy_df)} rows in the uploaded CSV. Importing...")
-
-            # Iterate through rows and save to database
-            imported_count = 0
-            for index, row in legacy_df.iterrows():
-                try:
-                    # Create a dummy RiskClassification object from the row data
-                    # This assumes the column names match the RiskClassification attributes
-                    dummy_classification = RiskClassification(
-                        basel_ii_category=row['basel_ii_category'],
-                        severity_score=int(row['severity_score']), # Ensure severity score is integer
-                        root_cause=row['root_cause'],
-                        control_recommendations=row['control_recommendations']
-                    )
-                    save_classification_result(row['incident_description'], dummy_classification)
-                    imported_count += 1
-                except Exception as e:
-                    st.warning(f"Skipping row {index} due to error: {e}")
-                    # Optionally log this error more formally
-
-            st.success(f"Successfully imported {imported_count} classifications from the CSV.")
-
+        st.info("Importing legacy classifications...")
+        import_progress = st.progress(0.0)
+        # Streamlit keeps the whole upload, so the file size gives a cheap progress estimate
+        upload_size = max(uploaded_csv_file.size, 1)
+
+        def show_import_progress(report):
+            import_progress.progress(min(uploaded_csv_file.tell() / upload_size, 1.0),
+                                     text=f"{report.total_rows} rows processed, {report.imported} imported")
+
+        import_report = import_legacy_csv(uploaded_csv_file, progress=show_import_progress)
+        invalidate_classification_data()
+        import_progress.progress(1.0)
+        st.success(f"Successfully imported {import_report.imported} of {import_report.total_rows} classifications from the CSV.")
+
+        if import_report.rejected:
+            rejected_df = import_report.rejected_frame()
+            st.warning(f"{len(rejected_df)} rows were rejected.")
+            st.dataframe(rejected_df.head(100))
+            st.download_button(
+                label="Download Rejected Rows Report",
+                data=rejected_df.to_csv(index=False).encode('utf-8'),
+                file_name="rejected_rows.csv",
+                mime="text/csv"
+            )
+
+    except ValueError as e:
+        st.error(str(e))
     except Exception as e:
         st.error(f"Error processing CSV file: {e}")
 
+st.markdown("---")
+with st.expander("Diagnostics"):
+    # Metrics of this server process: where classifications spend their time and tokens
+    snapshot = metrics.snapshot()
+    stage_rows = [
+        {
+            "stage": labels.get("stage"),
+            "count": count,
+            "mean (ms)": round(total / count * 1000, 1) if count else None,
+            "max (ms)": round(maximum * 1000, 1),
+        }
+        for name, labels, count, total, maximum in snapshot["histograms"]
+        if name == "riskloggr_stage_duration_seconds"
+    ]
+    if stage_rows:
+        st.markdown("**Stage timings**")
+        st.dataframe(pd.DataFrame(stage_rows), hide_index=True)
+    else:
+        st.info("No classifications timed yet in this session's server process.")
+
+    counters = snapshot["counters"]
+    prompt_tokens = sum(value for name, labels, value in counters if name == "riskloggr_llm_tokens_total" and labels.get("kind") == "prompt")
+    completion_tokens = sum(value for name, labels, value in counters if name == "riskloggr_llm_tokens_total" and labels.get("kind") == "completion")
+    llm_calls = sum(value for name, labels, value in counters if name == "riskloggr_llm_requests_total")
+    cost = sum(value for name, labels, value in counters if name == "riskloggr_llm_cost_usd_total")
+    gauges = {name: value for name, labels, value in snapshot["gauges"] if not labels}
+    lock_waits = [(count, total, maximum) for name, labels, count, total, maximum in snapshot["histograms"] if name == "riskloggr_db_lock_wait_seconds"]
+
+    metric_columns = st.columns(4)
+    metric_columns[0].metric("LLM calls", int(llm_calls))
+    metric_columns[1].metric("Tokens (prompt / completion)", f"{int(prompt_tokens)} / {int(completion_tokens)}")
+    metric_columns[2].metric("Estimated cost (USD)", f"{cost:.4f}")
+    metric_columns[3].metric("Cache hit rate", f"{gauges.get('riskloggr_cache_hit_ratio', 0.0):.0%}")
+    if lock_waits:
+        count, total, maximum = lock_waits[0]
+        st.caption(f"DB write lock waits: {count} transactions, mean {total / count * 1000:.1f} ms, max {maximum * 1000:.1f} ms")
+
+    st.download_button(
+        label="Download Metrics (Prometheus format)",
+        data=metrics.render_prometheus(),
+        file_name="riskloggr_metrics.prom",
+        mime="text/plain"
+    )
+
 st.markdown("---")
 st.write("user management or API access will probably be integrated here.")
\ No newline at end of file
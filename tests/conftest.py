@@ -0,0 +1,114 @@
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+
+# Settings are read at import time, so the test environment must be in place before src is imported
+_cache_directory = tempfile.mkdtemp(prefix="riskloggr-tests-")
+os.environ["LLM_BACKEND"] = "fake"
+os.environ["FAKE_LLM_PROFILE"] = "instant"
+os.environ["SIMILARITY_THRESHOLD"] = "2" # No background index loads
+os.environ["CACHE_DATABASE_FILE"] = os.path.join(_cache_directory, "cache.db")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import pytest
+
+from src.database import database, rollups
+from src.database.connection import begin_immediate, close_all_pools, get_connection
+from src.models import RiskClassification
+
+
+@pytest.fixture
+def database_file(tmp_path, monkeypatch):
+    """A freshly initialized database, used by every database function for the test."""
+    path = str(tmp_path / "riskloggr.db")
+    monkeypatch.setattr(database, "DATABASE_FILE", path)
+    database.initialize_database()
+    yield path
+    close_all_pools()
+
+
+@pytest.fixture
+def legacy_database_file(tmp_path, monkeypatch):
+    """A database written by the original release, then brought up to date by initialize_database."""
+    path = str(tmp_path / "legacy.db")
+    create_legacy_database(path)
+    monkeypatch.setattr(database, "DATABASE_FILE", path)
+    database.initialize_database()
+    yield path
+    close_all_pools()
+
+
+def make_classification(**overrides) -> RiskClassification:
+    fields = {
+        "incident_description": "Phishing email led to unauthorized access to customer data",
+        "basel_ii_category": "External Fraud",
+        "severity_score": 4,
+        "root_cause": "Weak access control",
+        "control_recommendations": ["Enable multi-factor authentication.", "Run phishing awareness training."],
+        "framework_tags": ["GDPR: GDPR - Article 5: Integrity & Confidentiality"],
+        "inherent_risk": "High",
+        "residual_risk": "Medium",
+        "likelihood": "Likely",
+        "impact_type": ["Financial", "Reputational"],
+    }
+    fields.update(overrides)
+    return RiskClassification(**fields)
+
+
+LEGACY_SCHEMA = '''
+    CREATE TABLE classifications (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+        basel_ii_category TEXT,
+        severity_score INTEGER,
+        root_cause TEXT,
+        control_recommendations TEXT,
+        incident_description TEXT,
+        framework_tags TEXT,
+        inherent_risk TEXT,
+        residual_risk TEXT,
+        likelihood TEXT,
+        impact_type TEXT
+    )
+'''
+
+LEGACY_ROWS = [
+    ("External Fraud", 4, "Weak passwords", "Upgrade all servers to TLS 1.2\n2FA for every admin account.", "Phishing email compromised payroll",
+     json.dumps(["GDPR: GDPR - Article 5: Integrity & Confidentiality", "Manual note"]), "High", "Medium", "Likely",
+     json.dumps(["Financial", "Reputational"])),
+    ("Business Disruption and System Failures", 3, "Expired certificate", "Monitor certificate expiry.",
+     "Payment gateway outage", "not json", "Medium", "Low", "Possible", None),
+]
+
+
+def create_legacy_database(path: str) -> None:
+    """A database written by the original release: one table, lists stored as JSON text, user_version 0."""
+    conn = sqlite3.connect(path)
+    conn.execute(LEGACY_SCHEMA)
+    conn.executemany('''
+        INSERT INTO classifications (basel_ii_category, severity_score, root_cause, control_recommendations,
+            incident_description, framework_tags, inherent_risk, residual_risk, likelihood, impact_type)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', LEGACY_ROWS)
+    conn.commit()
+    conn.close()
+
+
+def rollup_contents(conn: sqlite3.Connection) -> dict:
+    return {
+        table: sorted(conn.execute(f"SELECT * FROM {table} WHERE count != 0").fetchall())
+        for table in rollups.ROLLUP_TABLES
+    }
+
+def assert_rollups_match_rebuild() -> None:
+    """The trigger-maintained rollups must equal a rebuild from the base tables."""
+    with get_connection(database.DATABASE_FILE) as conn:
+        maintained = rollup_contents(conn)
+        begin_immediate(conn)
+        rollups.populate_rollups(conn)
+        rebuilt = rollup_contents(conn)
+        conn.rollback()
+    assert maintained == rebuilt
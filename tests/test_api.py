@@ -0,0 +1,87 @@
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from conftest import make_classification
+from src.api import jobs
+from src.api.app import app
+from src.database import database
+
+
+@pytest.fixture
+def client(database_file, tmp_path, monkeypatch):
+    monkeypatch.setattr("src.api.app.settings.EXPORT_DIRECTORY", str(tmp_path / "exports"))
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+def test_classify_saves_and_returns_the_classification(client):
+    response = client.post("/classify", json={"incident_description": "Phishing email exposed customer records"})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["incident_description"] == "Phishing email exposed customer records"
+    assert isinstance(body["control_recommendations"], list) and body["control_recommendations"]
+    assert client.get(f"/classifications/{body['id']}").json() == body
+
+
+def test_jobs_run_in_the_background(client):
+    response = client.post("/jobs", json={"incident_description": "Server room flooded after a pipe burst"})
+    assert response.status_code == 202
+    job_id = response.json()["job_id"]
+    deadline = time.monotonic() + 10
+    while (job := client.get(f"/jobs/{job_id}").json())["status"] != jobs.SUCCEEDED:
+        assert job["status"] != jobs.FAILED and time.monotonic() < deadline, job
+        time.sleep(0.05)
+    assert job["classification"]["incident_description"] == "Server room flooded after a pipe burst"
+
+    events = client.get(f"/jobs/{job_id}/events").text
+    assert events.startswith("event: succeeded\n")
+    assert client.get("/jobs/unknown").status_code == 404
+
+
+def test_get_put_round_trip_keeps_recommendations(client):
+    recommendations = ["Upgrade all servers to TLS 1.2", "2FA for every admin account", "Review vendor contracts."]
+    row_id = database.save_classification_result("Weak TLS", make_classification(control_recommendations=recommendations))
+    stored = client.get(f"/classifications/{row_id}").json()
+    assert stored["control_recommendations"] == recommendations
+
+    stored["severity_score"] = 2
+    stored["incident_description"] = ""
+    updated = client.put(f"/classifications/{row_id}", json=stored).json()
+    assert updated["severity_score"] == 2
+    assert updated["incident_description"] == "Weak TLS"
+    assert updated["control_recommendations"] == recommendations
+    assert client.put("/classifications/999", json=stored).status_code == 404
+
+
+def test_list_pages_with_a_cursor(client):
+    row_ids = [database.save_classification_result(f"Incident {number}", make_classification()) for number in range(5)]
+    first = client.get("/classifications", params={"limit": 3, "fields": "id,severity_score"}).json()
+    assert [item["id"] for item in first["items"]] == row_ids[:1:-1]
+    assert set(first["items"][0]) == {"id", "severity_score"}
+    second = client.get("/classifications", params={"limit": 3, "cursor": first["next_cursor"]}).json()
+    assert [item["id"] for item in second["items"]] == row_ids[1::-1]
+    assert second["next_cursor"] is None
+    assert client.get("/classifications", params={"fields": "id,password"}).status_code == 400
+    assert client.get("/classifications/999").status_code == 404
+
+
+def test_search_and_export(client):
+    database.save_classification_result("Ransomware encrypted the file server", make_classification())
+    database.save_classification_result("Payment gateway outage", make_classification(severity_score=2))
+    search = client.get("/classifications/search", params={"q": "ransomware"}).json()
+    assert search["total"] == 1 and search["items"][0]["snippets"]["incident_description"]["highlights"]
+
+    export = client.get("/classifications/export", params={"format": "jsonl", "severity_score": 2})
+    assert export.status_code == 200
+    assert len(export.text.splitlines()) == 1
+    assert client.get("/classifications/export", params={"format": "xml"}).status_code == 400
+
+
+def test_metrics_are_prometheus_text(client):
+    client.post("/classify", json={"incident_description": "Laptop stolen from a car"})
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert "# TYPE" in response.text
@@ -0,0 +1,86 @@
+import json
+import os
+import subprocess
+import sys
+
+import openai
+import pytest
+
+from src.classification.backends import (OPENAI_API_KEY_PLACEHOLDER, BackendError, FakeBackend, OpenAIBackend,
+                                         ReplayBackend, get_backend)
+from src.models import RiskClassification
+
+REPOSITORY = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+MESSAGES = [{"role": "system", "content": "Classify."}, {"role": "user", "content": "Laptop stolen from a car"}]
+
+
+def run_without_api_key(backend: str, code: str, tmp_path) -> str:
+    """Runs code in a fresh interpreter whose environment has no OpenAI API key."""
+    environment = {key: value for key, value in os.environ.items() if key != "OPENAI_API_KEY"}
+    environment.update(LLM_BACKEND=backend, FAKE_LLM_PROFILE="instant", LLM_REPLAY_DIRECTORY=str(tmp_path / "recordings"),
+                       CACHE_DATABASE_FILE=str(tmp_path / "cache.db"), LOG_LEVEL="ERROR")
+    result = subprocess.run([sys.executable, "-c", code], cwd=REPOSITORY, env=environment,
+                            capture_output=True, text=True, timeout=120)
+    assert result.returncode == 0, result.stderr
+    return result.stdout.strip()
+
+
+@pytest.mark.parametrize("backend", ["fake", "replay"])
+def test_offline_backends_need_no_api_key(backend, tmp_path):
+    output = run_without_api_key(backend, "from src.classification import classifier; print(classifier.backend.is_configured())", tmp_path)
+    assert output.splitlines()[-1] == "True"
+
+
+def test_fake_backend_classifies_without_api_key(tmp_path):
+    output = run_without_api_key("fake", (
+        "from src.classification.classifier import classify_incident\n"
+        "print(classify_incident('Laptop stolen from a car').basel_ii_category)"
+    ), tmp_path)
+    assert output.splitlines()[-1]
+
+
+def test_openai_backend_reports_a_missing_key(tmp_path):
+    output = run_without_api_key("openai", (
+        "from src.classification import classifier\n"
+        "print(classifier.backend.is_configured(), classifier.classify_incident('Laptop stolen'))"
+    ), tmp_path)
+    assert output.splitlines()[-1] == "False None"
+
+
+@pytest.mark.parametrize("key, configured", [(None, False), ("", False), (OPENAI_API_KEY_PLACEHOLDER, False), ("sk-test", True)])
+def test_openai_backend_is_configured(key, configured, monkeypatch):
+    monkeypatch.setattr(openai, "api_key", key)
+    assert OpenAIBackend().is_configured() is configured
+
+
+def test_fake_responses_are_deterministic_valid_classifications():
+    backend = FakeBackend()
+    first = backend.complete(MESSAGES, "gpt-4o").content
+    assert first == FakeBackend().complete(MESSAGES, "gpt-4o").content
+    RiskClassification.model_validate_json(first)
+    assert "".join(backend.stream(MESSAGES, "gpt-4o")) == first
+
+
+def test_fake_errors_carry_retryable_status_codes():
+    backend = FakeBackend(error_rate=1.0, error_status_codes=(503,), seed=1)
+    with pytest.raises(BackendError) as error:
+        backend.complete(MESSAGES, "gpt-4o")
+    assert error.value.status_code == 503
+
+
+def test_recorded_responses_replay_offline(tmp_path):
+    recorder = ReplayBackend(str(tmp_path), mode="record", backend=FakeBackend())
+    recorded = recorder.complete(MESSAGES, "gpt-4o")
+    [recording] = os.listdir(tmp_path)
+    assert json.loads((tmp_path / recording).read_text())["content"] == recorded.content
+
+    replay = ReplayBackend(str(tmp_path))
+    assert replay.complete(MESSAGES, "gpt-4o").content == recorded.content
+    with pytest.raises(BackendError):
+        replay.complete(MESSAGES, "gpt-4o-mini")
+
+
+def test_unknown_backend_names_raise():
+    assert isinstance(get_backend("fake"), FakeBackend)
+    with pytest.raises(ValueError):
+        get_backend("local-llama")
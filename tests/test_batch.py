@@ -0,0 +1,95 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from src.classification import batch
+from src.classification.backends import BackendError
+from src.classification.batch import (RETRY_MAX_DELAY_SECONDS, TokenBucket, _retry_delay, classify_incidents,
+                                      is_retryable_error)
+
+
+def rate_limited(retry_after: str) -> BackendError:
+    error = BackendError("rate limited", status_code=429)
+    error.response = SimpleNamespace(headers={"retry-after": retry_after})
+    return error
+
+
+def test_token_bucket_blocks_until_tokens_refill():
+    bucket = TokenBucket(rate_per_minute=600, capacity=2) # 10 tokens per second
+    start = time.monotonic()
+    bucket.acquire()
+    bucket.acquire()
+    assert time.monotonic() - start < 0.05
+    bucket.acquire()
+    assert time.monotonic() - start == pytest.approx(0.1, abs=0.06)
+    bucket.acquire(50) # clamped to the capacity
+    assert time.monotonic() - start == pytest.approx(0.3, abs=0.1)
+
+
+@pytest.mark.parametrize("error, retryable", [
+    (BackendError("rate limited", status_code=429), True),
+    (BackendError("unavailable", status_code=503), True),
+    (BackendError("bad request", status_code=400), False),
+    (ValueError("invalid JSON"), False),
+])
+def test_retryable_errors(error, retryable):
+    assert is_retryable_error(error) is retryable
+
+
+def test_retry_after_is_honoured_up_to_the_maximum_delay():
+    assert _retry_delay(rate_limited("2.5"), attempt=0) == 2.5
+    assert _retry_delay(rate_limited("86400"), attempt=0) == RETRY_MAX_DELAY_SECONDS
+    assert _retry_delay(rate_limited("inf"), attempt=0) == RETRY_MAX_DELAY_SECONDS
+
+
+@pytest.mark.parametrize("header", ["soon", "-5", "nan"])
+def test_unusable_retry_after_falls_back_to_backoff(header):
+    delays = [_retry_delay(rate_limited(header), attempt=2) for _ in range(50)]
+    assert all(0 <= delay <= batch.RETRY_BASE_DELAY_SECONDS * 4 for delay in delays)
+
+
+def test_backoff_is_capped():
+    error = BackendError("unavailable", status_code=503)
+    assert all(0 <= _retry_delay(error, attempt=30) <= RETRY_MAX_DELAY_SECONDS for _ in range(50))
+
+
+def test_batch_retries_transient_errors_and_reports_the_rest(monkeypatch):
+    failures = {"flaky": 2, "down": 10}
+    active, peak = [0], [0]
+    lock = threading.Lock()
+    def request(incident_description, before_request=None):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        try:
+            time.sleep(0.01)
+            if incident_description == "invalid":
+                raise ValueError("invalid JSON")
+            if failures.get(incident_description, 0) > 0:
+                failures[incident_description] -= 1
+                raise BackendError("rate limited", status_code=429)
+            return incident_description.upper()
+        finally:
+            with lock:
+                active[0] -= 1
+    monkeypatch.setattr(batch, "request_classification", request)
+    monkeypatch.setattr(batch, "_retry_delay", lambda error, attempt: 0)
+
+    incidents = ["flaky", "invalid", "down"] + [f"incident {number}" for number in range(10)]
+    results = sorted(classify_incidents(incidents, max_concurrency=3, max_retries=3), key=lambda result: result.index)
+    assert [result.incident_description for result in results] == incidents
+    assert results[0].classification == "FLAKY" and results[0].error is None
+    assert isinstance(results[1].error, ValueError)
+    assert results[2].error.status_code == 429 and failures["down"] == 6 # one call plus three retries
+    assert [result.classification for result in results[3:]] == [f"INCIDENT {number}" for number in range(10)]
+    assert peak[0] <= 3
+
+
+def test_batch_classifies_with_the_fake_backend():
+    incidents = [f"Batch incident {number}: card skimmer found on ATM {number}" for number in range(5)]
+    results = list(classify_incidents(incidents, max_concurrency=2))
+    assert sorted(result.index for result in results) == list(range(5))
+    assert all(result.error is None and result.classification.incident_description == incidents[result.index]
+               for result in results)
@@ -0,0 +1,62 @@
+import time
+
+from src.cache.classification_cache import ClassificationCache, make_cache_key, normalize_incident_text
+from src.classification import classifier
+from src.classification.backends import FakeBackend
+
+
+def test_trivially_different_text_shares_a_key():
+    assert normalize_incident_text("  Server outage\n\tin  branch ") == "Server outage in branch"
+    assert make_cache_key("Server outage", "v1", "gpt-4o") == make_cache_key(" Server   outage\n", "v1", "gpt-4o")
+    assert make_cache_key("Server outage", "v1", "gpt-4o") != make_cache_key("server outage", "v1", "gpt-4o")
+    assert make_cache_key("Server outage", "v1", "gpt-4o") != make_cache_key("Server outage", "v2", "gpt-4o")
+    assert make_cache_key("Server outage", "v1", "gpt-4o") != make_cache_key("Server outage", "v1", "gpt-4o-mini")
+
+
+def test_entries_survive_a_restart_through_the_disk_tier(tmp_path):
+    path = str(tmp_path / "cache.db")
+    ClassificationCache(path).set("key", "payload")
+    restarted = ClassificationCache(path)
+    assert restarted.get("key") == "payload"
+    assert restarted.get("key") == "payload"
+    stats = restarted.stats()
+    assert (stats["disk_hits"], stats["memory_hits"], stats["misses"]) == (1, 1, 0)
+
+
+def test_memory_tier_evicts_the_least_recently_used_entry(tmp_path):
+    cache = ClassificationCache(str(tmp_path / "cache.db"), max_memory_entries=2)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    cache.get("a")
+    cache.set("c", "3")
+    assert list(cache._memory) == ["a", "c"]
+    assert cache.get("b") == "2" # still on disk
+    assert cache.stats()["disk_hits"] == 1
+
+
+def test_disk_tier_keeps_the_most_recently_accessed_entries(tmp_path):
+    path = str(tmp_path / "cache.db")
+    cache = ClassificationCache(path, max_memory_entries=1, max_disk_entries=2)
+    for key in ("a", "b", "c"):
+        cache.set(key, key)
+        time.sleep(0.01)
+    restarted = ClassificationCache(path)
+    assert [restarted.get(key) for key in ("a", "b", "c")] == [None, "b", "c"]
+    assert cache.stats()["evictions"] == 1
+
+
+def test_expired_entries_are_misses(tmp_path):
+    cache = ClassificationCache(str(tmp_path / "cache.db"), ttl_seconds=0)
+    cache.set("key", "payload")
+    time.sleep(0.01)
+    assert cache.get("key") is None
+    assert cache.stats()["hit_rate"] == 0.0
+
+
+def test_repeated_incidents_call_the_llm_once(monkeypatch):
+    backend = FakeBackend()
+    monkeypatch.setattr(classifier, "backend", backend)
+    first = classifier.classify_incident("Branch vault count short by 4,000 after the weekend shift")
+    second = classifier.classify_incident("  Branch vault count short by 4,000\nafter the weekend shift ")
+    assert backend.calls == 1
+    assert second.model_dump(exclude={"incident_description"}) == first.model_dump(exclude={"incident_description"})
@@ -0,0 +1,88 @@
+import io
+
+import pandas as pd
+import pytest
+
+from src.data_parser.csv_import import import_legacy_csv
+from src.database import database
+
+HEADER = "incident_description,basel_ii_category,severity_score,root_cause,control_recommendations,timestamp,impact_type\n"
+
+
+def import_text(text: str, **kwargs):
+    return import_legacy_csv(io.StringIO(HEADER + text), **kwargs)
+
+def stored_rows() -> list[dict]:
+    rows, _ = database.query_classifications(limit=1000)
+    return sorted(rows, key=lambda row: row["id"])
+
+
+def test_valid_rows_are_imported_with_their_lists(database_file):
+    report = import_text(
+        'Phishing,External Fraud,4,Weak MFA,"Enable MFA\nTrain staff",2024-01-02 10:00:00,"[""Financial"", ""Legal""]"\n'
+        'Outage,Business Disruption and System Failures,3,Expired certificate,Monitor expiry,,Operational\n'
+    )
+    assert (report.total_rows, report.imported, report.rejected) == (2, 2, [])
+    phishing, outage = stored_rows()
+    assert phishing["timestamp"] == "2024-01-02 10:00:00"
+    assert database.classification_row_to_dict(phishing)["impact_type"] == ["Financial", "Legal"]
+    assert outage["timestamp"] is not None # defaults to the import time
+
+
+def test_invalid_rows_are_reported_by_record_number(database_file):
+    report = import_text(
+        'Phishing,External Fraud,4,Weak MFA,"Enable MFA\nacross\nall accounts",,\n'
+        ',External Fraud,4,Weak MFA,Enable MFA,,\n'
+        'Outage,Business Disruption and System Failures,seven,Expired certificate,Monitor expiry,,\n'
+        'Outage,Business Disruption and System Failures,6,Expired certificate,Monitor expiry,,\n',
+        chunksize=2,
+    )
+    assert report.imported == 1
+    assert [(row["record"], row["reason"]) for row in report.rejected] == [
+        (2, "missing incident_description"),
+        (3, "severity_score is not a number"),
+        (4, "severity_score must be an integer from 1 to 5"),
+    ]
+    frame = report.rejected_frame()
+    assert list(frame["record"]) == [2, 3, 4]
+
+
+def test_mixed_timestamps_are_normalized_or_rejected(database_file):
+    report = import_text(
+        "Phishing,External Fraud,4,Weak MFA,Enable MFA,2024-01-01T00:00:00Z,\n"
+        "Phishing,External Fraud,4,Weak MFA,Enable MFA,2024-01-02 10:00,\n"
+        "Phishing,External Fraud,4,Weak MFA,Enable MFA,2024-01-03T12:00:00+02:00,\n"
+        "Phishing,External Fraud,4,Weak MFA,Enable MFA,garbage,\n"
+        "Phishing,External Fraud,4,Weak MFA,Enable MFA,03/04/2024,\n"
+    )
+    assert report.imported == 4
+    assert [(row["record"], row["reason"], row["timestamp"]) for row in report.rejected] == [
+        (4, "timestamp is not a valid date", "garbage"),
+    ]
+    assert [row["timestamp"] for row in stored_rows()] == [
+        "2024-01-01 00:00:00", "2024-01-02 10:00:00", "2024-01-03 10:00:00", "2024-03-04 00:00:00",
+    ]
+
+
+def test_bad_timestamp_after_an_aware_one_does_not_abort_later_chunks(database_file):
+    progress = []
+    report = import_text(
+        "Phishing,External Fraud,4,Weak MFA,Enable MFA,2024-01-01T00:00:00Z,\n"
+        "Phishing,External Fraud,4,Weak MFA,Enable MFA,garbage,\n"
+        "Outage,Business Disruption and System Failures,3,Expired certificate,Monitor expiry,2024-02-01,\n",
+        chunksize=2, progress=lambda r: progress.append(r.imported),
+    )
+    assert progress == [1, 2]
+    assert [row["record"] for row in report.rejected] == [2]
+
+
+def test_missing_required_columns_raise(database_file):
+    with pytest.raises(ValueError, match="basel_ii_category"):
+        import_legacy_csv(io.StringIO("incident_description\nPhishing\n"))
+    assert stored_rows() == []
+
+
+def test_rejected_frame_has_the_report_columns():
+    report = import_legacy_csv(io.StringIO(HEADER))
+    assert isinstance(report.rejected_frame(), pd.DataFrame)
+    assert list(report.rejected_frame().columns[:2]) == ["record", "reason"]
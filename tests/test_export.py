@@ -0,0 +1,81 @@
+import csv
+import io
+import json
+import os
+import sqlite3
+
+import pyarrow.parquet as pq
+import pytest
+
+from conftest import make_classification
+from src.database import database, export
+from src.database.connection import get_connection
+from src.database.export import export_classifications, prune_export_files
+
+
+@pytest.fixture
+def saved(database_file):
+    return [
+        database.save_classification_result(f"Incident {number}", make_classification(
+            incident_description=f"Incident {number}", severity_score=number % 5 + 1))
+        for number in range(7)
+    ]
+
+
+def download_types() -> list[str]:
+    with get_connection(database.DATABASE_FILE) as conn:
+        return [row[0] for row in conn.execute('SELECT download_type FROM download_logs ORDER BY id')]
+
+
+def test_csv_export_streams_every_row_in_id_order(saved):
+    output = io.BytesIO()
+    assert export_classifications(output, "csv", chunk_size=3) == len(saved)
+    rows = list(csv.DictReader(io.StringIO(output.getvalue().decode("utf-8"))))
+    assert [int(row["id"]) for row in rows] == saved
+    assert json.loads(rows[0]["framework_tags"]) == make_classification().framework_tags
+    assert download_types() == ["export_csv"]
+
+
+def test_jsonl_export_decodes_list_columns(saved):
+    output = io.BytesIO()
+    export_classifications(output, "jsonl", chunk_size=2, columns=["id", "impact_type"], severity_score=[1, 2])
+    records = [json.loads(line) for line in output.getvalue().decode("utf-8").splitlines()]
+    assert [record["id"] for record in records] == [saved[0], saved[1], saved[5], saved[6]]
+    assert records[0] == {"id": saved[0], "impact_type": ["Financial", "Reputational"]}
+
+
+def test_parquet_export_writes_one_row_group_per_chunk(saved, tmp_path):
+    path = str(tmp_path / "history.parquet")
+    export_classifications(path, "parquet", chunk_size=3)
+    parquet = pq.ParquetFile(path)
+    assert parquet.metadata.num_row_groups == 3
+    table = parquet.read()
+    assert table.column("id").to_pylist() == saved
+    assert table.column("impact_type").to_pylist()[0] == ["Financial", "Reputational"]
+
+
+def test_failed_export_leaves_no_partial_file(saved, tmp_path, monkeypatch):
+    def failing_chunks(*args, **kwargs):
+        yield database.query_classifications(columns=export.EXPORT_COLUMNS, limit=2)[0]
+        raise sqlite3.OperationalError("disk I/O error")
+    monkeypatch.setattr(export, "iter_classification_chunks", failing_chunks)
+    path = tmp_path / "history.csv"
+    with pytest.raises(sqlite3.OperationalError):
+        export_classifications(str(path), "csv")
+    assert not path.exists()
+    assert download_types() == []
+
+
+def test_unknown_formats_are_rejected(database_file):
+    with pytest.raises(ValueError):
+        export_classifications(io.BytesIO(), "xlsx")
+
+
+def test_old_export_files_are_pruned(tmp_path):
+    old, new = tmp_path / "old.csv", tmp_path / "new.csv"
+    old.write_text("id\n")
+    new.write_text("id\n")
+    os.utime(old, (0, 0))
+    assert prune_export_files(str(tmp_path), max_age_seconds=3600) == 1
+    assert os.listdir(tmp_path) == ["new.csv"]
+    assert prune_export_files(str(tmp_path / "missing"), max_age_seconds=0) == 0
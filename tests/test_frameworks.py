@@ -0,0 +1,88 @@
+import random
+
+import pytest
+
+from conftest import make_classification
+from src.frameworks.coso import map_to_coso
+from src.frameworks.framework_router import (FRAMEWORK_RULES, classify_across_frameworks, format_framework_tags,
+                                             split_framework_tags)
+from src.frameworks.gdpr import map_to_gdpr
+from src.frameworks.iso31000 import map_to_iso31000
+from src.frameworks.matcher import INCIDENT, ROOT_CAUSE, FrameworkRule, KeywordMatcher, extract_fields
+from src.frameworks.sox import map_to_sox
+
+MAPPERS = {"COSO": map_to_coso, "ISO 31000": map_to_iso31000, "SOX": map_to_sox, "GDPR": map_to_gdpr}
+KEYWORDS = sorted({keyword for rule in FRAMEWORK_RULES for keyword in rule.keywords})
+FILLER = ["the", "team", "noticed", "an", "issue", "during", "review", "of", "systems"]
+
+
+def reference_tags(fields: dict[str, str]) -> dict[str, set[str]]:
+    """The per-keyword `keyword in text` evaluation the matcher replaces."""
+    tags = {}
+    for rule in FRAMEWORK_RULES:
+        tags.setdefault(rule.framework, set())
+        if any(keyword in fields[field] for keyword in rule.keywords for field in rule.fields):
+            tags[rule.framework].update(rule.tags)
+    return tags
+
+def random_text(rng: random.Random) -> str:
+    words = rng.choices(FILLER, k=rng.randint(0, 6)) + rng.sample(KEYWORDS, rng.randint(0, 3))
+    rng.shuffle(words)
+    text = " ".join(words)
+    if text and rng.random() < 0.3: # keywords glued to their neighbours still match as substrings
+        text = text.replace(" ", "", 1)
+    return text
+
+
+def test_matcher_equals_reference_evaluation():
+    rng = random.Random(20240611)
+    categories = ["External Fraud", "Clients, Products & Business Practices", "Execution, Delivery & Process Management"]
+    for _ in range(500):
+        classification = make_classification(
+            incident_description=random_text(rng).capitalize(), root_cause=random_text(rng).upper(),
+            control_recommendations=[random_text(rng) for _ in range(rng.randint(0, 2))],
+            basel_ii_category=rng.choice(categories),
+        )
+        expected = reference_tags(extract_fields(classification))
+        mappings = classify_across_frameworks(classification)
+        assert {framework: set(tags) for framework, tags in mappings.items()} == expected
+        for framework, mapper in MAPPERS.items():
+            assert mapper(classification) == mappings[framework]
+
+
+def test_overlapping_keywords_are_all_found():
+    matcher = KeywordMatcher([
+        FrameworkRule("A", ("long",), ("data breach notice",), (INCIDENT,)),
+        FrameworkRule("A", ("short",), ("data breach",), (INCIDENT,)),
+        FrameworkRule("B", ("inner",), ("breach",), (ROOT_CAUSE,)),
+        FrameworkRule("B", ("suffix",), ("notice",), (INCIDENT,)),
+    ])
+    assert matcher.scan("a data breach notice") == {"data breach notice", "data breach", "breach", "notice"}
+    fields = {INCIDENT: "data breach notice", ROOT_CAUSE: "", "controls": "", "category": ""}
+    assert matcher.match_fields(fields) == {"A": ["long", "short"], "B": ["suffix"]}
+
+
+def test_legacy_placeholder_rules_still_apply():
+    classification = make_classification(
+        incident_description="Quarterly financial reporting was late", root_cause="staff shortage",
+        control_recommendations=["Hire staff."], basel_ii_category="Execution, Delivery & Process Management",
+    )
+    assert set(map_to_sox(classification)) == {"SOX - Section 302", "SOX - Section 404", "SOX - Section 906"}
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_formatted_tags_split_back_into_pairs(seed):
+    rng = random.Random(seed)
+    classification = make_classification(
+        incident_description=" ".join(rng.sample(KEYWORDS, 4)), root_cause=" ".join(rng.sample(KEYWORDS, 2)),
+    )
+    mappings = classify_across_frameworks(classification)
+    pairs = split_framework_tags(format_framework_tags(mappings))
+    assert len(pairs) == len(set(pairs))
+    assert set(pairs) == {(framework, tag) for framework, tags in mappings.items() for tag in tags}
+
+
+def test_unknown_tags_are_kept():
+    assert split_framework_tags(["Manual review", "SOX: SOX - Section 302, custom note", ""]) == [
+        ("Other", "Manual review"), ("SOX", "SOX - Section 302"), ("SOX", "custom note"),
+    ]
@@ -0,0 +1,103 @@
+import sqlite3
+
+from conftest import make_classification
+from src.cache.singleflight import FlightTimeout
+from src.database import database
+from src.database.connection import get_connection
+from src.ingestion import daemon
+from src.ingestion.daemon import (DONE, FAILED, PENDING, IngestionDaemon, claim_file, complete_file,
+                                  pending_file_paths, release_file, requeue_interrupted_files)
+
+
+def manifest(path: str) -> dict[str, tuple]:
+    with get_connection(path) as conn:
+        rows = conn.execute("SELECT file_hash, status, attempts, classification_id FROM ingested_files").fetchall()
+    return {row[0]: tuple(row[1:]) for row in rows}
+
+def write_files(directory, contents: dict[str, str]) -> None:
+    for name, text in contents.items():
+        (directory / name).write_text(text)
+
+
+def test_content_is_claimed_once(database_file):
+    assert claim_file("abc", "/in/a.txt") == 1
+    assert claim_file("abc", "/in/copy-of-a.txt") is None # processing
+    row_id = complete_file("abc", "Phishing", make_classification())
+    assert row_id is not None
+    assert claim_file("abc", "/in/a-again.txt") is None # done
+    assert complete_file("abc", "Phishing", make_classification()) is None
+    assert manifest(database_file) == {"abc": (DONE, 1, row_id)}
+    assert len(database.query_classifications()[0]) == 1
+
+
+def test_released_files_are_retried_until_they_fail(database_file):
+    assert claim_file("abc", "/in/a.txt") == 1
+    release_file("abc", PENDING, "rate limited")
+    assert pending_file_paths() == ["/in/a.txt"]
+    assert claim_file("abc", "/in/renamed.txt") == 2
+    assert pending_file_paths() == []
+    release_file("abc", FAILED, "bad request")
+    assert claim_file("abc", "/in/renamed.txt") is None
+    assert manifest(database_file) == {"abc": (FAILED, 2, None)}
+
+
+def test_interrupted_files_are_requeued(database_file):
+    claim_file("abc", "/in/a.txt")
+    claim_file("def", "/in/b.txt")
+    complete_file("def", "Outage", make_classification())
+    assert requeue_interrupted_files() == 1
+    assert manifest(database_file)["abc"][0] == PENDING
+    assert claim_file("abc", "/in/a.txt") == 2
+
+
+def test_daemon_classifies_each_content_once(database_file, tmp_path):
+    inbox = tmp_path / "inbox"
+    inbox.mkdir()
+    write_files(inbox, {
+        "phishing.txt": "A phishing email led to unauthorized access to customer data.",
+        "phishing-copy.txt": "A phishing email led to unauthorized access to customer data.",
+        "outage.txt": "The payment gateway was down for three hours after a failed deployment.",
+        "empty.txt": "   ",
+    })
+    ingestion = IngestionDaemon(str(inbox), workers=2, use_watchdog=False)
+    ingestion.start(watch=False)
+    try:
+        ingestion.ingest_existing()
+    finally:
+        ingestion.stop()
+    statuses = sorted(status for status, _, _ in manifest(database_file).values())
+    assert statuses == [DONE, DONE, FAILED]
+    descriptions = sorted(row["incident_description"] for row in database.query_classifications()[0])
+    assert descriptions == [
+        "A phishing email led to unauthorized access to customer data.",
+        "The payment gateway was down for three hours after a failed deployment.",
+    ]
+
+
+def test_retryable_failures_wait_in_the_manifest(database_file, tmp_path, monkeypatch):
+    inbox = tmp_path / "inbox"
+    inbox.mkdir()
+    write_files(inbox, {"fraud.txt": "Card skimming device found on an ATM."})
+    available = daemon.request_classification
+    def unavailable(_text):
+        raise FlightTimeout("backend busy")
+    monkeypatch.setattr(daemon, "request_classification", unavailable)
+    ingestion = IngestionDaemon(str(inbox), workers=1, max_attempts=1, use_watchdog=False, retry_interval=0)
+    ingestion._process(str(inbox / "fraud.txt"))
+    assert [status for status, _, _ in manifest(database_file).values()] == [PENDING]
+
+    monkeypatch.setattr(daemon, "request_classification", available)
+    ingestion._resubmit_pending()
+    ingestion._process(ingestion._queue.get_nowait())
+    assert list(manifest(database_file).values())[0][:2] == (DONE, 2)
+
+
+def test_database_errors_do_not_strand_claimed_files(database_file, tmp_path, monkeypatch):
+    inbox = tmp_path / "inbox"
+    inbox.mkdir()
+    write_files(inbox, {"fraud.txt": "Card skimming device found on an ATM."})
+    def locked(*_args):
+        raise sqlite3.OperationalError("database is locked")
+    monkeypatch.setattr(daemon, "complete_file", locked)
+    IngestionDaemon(str(inbox), workers=1, use_watchdog=False)._process(str(inbox / "fraud.txt"))
+    assert [status for status, _, _ in manifest(database_file).values()] == [PENDING]
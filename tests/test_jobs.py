@@ -0,0 +1,103 @@
+import time
+
+from src.api import jobs
+from src.database import database
+from src.database.connection import get_connection
+
+
+def set_heartbeat(database_file: str, job_id: str, age_seconds: int) -> None:
+    with get_connection(database_file) as conn:
+        conn.execute(
+            "UPDATE classification_jobs SET heartbeat_at = datetime('now', ?) WHERE id = ?",
+            (f"-{age_seconds} seconds", job_id)
+        )
+
+
+def test_jobs_are_claimed_oldest_first_and_once(database_file):
+    first, second = jobs.create_job("Phishing"), jobs.create_job("Outage")
+    assert jobs.claim_next_job("worker-a") == (first, "Phishing", 1)
+    assert jobs.claim_next_job("worker-b") == (second, "Outage", 1)
+    assert jobs.claim_next_job("worker-a") is None
+
+
+def test_only_the_lease_holder_records_the_outcome(database_file):
+    job_id = jobs.create_job("Phishing")
+    jobs.claim_next_job("worker-a")
+    assert not jobs.finish_job(job_id, jobs.SUCCEEDED, worker_id="worker-b")
+    assert jobs.finish_job(job_id, jobs.FAILED, error="bad request", worker_id="worker-a")
+    assert not jobs.finish_job(job_id, jobs.SUCCEEDED, worker_id="worker-a") # lease already ended
+    job = jobs.get_job(job_id)
+    assert (job["status"], job["error"]) == (jobs.FAILED, "bad request")
+    assert job["finished_at"] is not None
+
+
+def test_expired_leases_are_requeued(database_file):
+    live, dead = jobs.create_job("Phishing"), jobs.create_job("Outage")
+    jobs.claim_next_job("worker-a")
+    jobs.claim_next_job("worker-b")
+    set_heartbeat(database_file, live, 5)
+    set_heartbeat(database_file, dead, 120)
+    assert jobs.requeue_expired_jobs(60, max_attempts=3) == (1, 0)
+    assert jobs.get_job(live)["status"] == jobs.RUNNING
+    assert jobs.get_job(dead)["status"] == jobs.QUEUED
+    assert jobs.renew_job_leases("worker-b") == 0 # worker-b lost its lease
+    assert not jobs.finish_job(dead, jobs.SUCCEEDED, worker_id="worker-b")
+    assert jobs.claim_next_job("worker-c") == (dead, "Outage", 2)
+
+
+def test_jobs_that_keep_losing_their_worker_fail(database_file):
+    job_id = jobs.create_job("Poison pill")
+    for attempt in range(1, 4):
+        assert jobs.claim_next_job(f"worker-{attempt}") == (job_id, "Poison pill", attempt)
+        set_heartbeat(database_file, job_id, 120)
+        expected = (1, 0) if attempt < 3 else (0, 1)
+        assert jobs.requeue_expired_jobs(60, max_attempts=3) == expected
+    job = jobs.get_job(job_id)
+    assert job["status"] == jobs.FAILED and job["finished_at"] is not None
+    assert "stopped responding" in job["error"]
+    assert jobs.claim_next_job("worker-4") is None
+
+
+def test_retried_jobs_wait_for_their_delay(database_file):
+    job_id = jobs.create_job("Phishing")
+    jobs.claim_next_job("worker-a")
+    assert jobs.finish_job(job_id, jobs.QUEUED, error="rate limited", worker_id="worker-a", retry_after=30)
+    assert jobs.get_job(job_id)["finished_at"] is None
+    assert jobs.claim_next_job("worker-a") is None
+    with get_connection(database_file) as conn:
+        conn.execute("UPDATE classification_jobs SET not_before = datetime('now', '-1 seconds') WHERE id = ?", (job_id,))
+    assert jobs.claim_next_job("worker-a") == (job_id, "Phishing", 2)
+
+
+def test_worker_pool_classifies_queued_jobs(database_file):
+    job_ids = [jobs.create_job(f"Phishing email number {number} exposed customer data") for number in range(3)]
+    pool = jobs.JobWorkerPool(workers=2, poll_interval=0.05)
+    pool.start()
+    try:
+        pool.notify()
+        deadline = time.monotonic() + 10
+        while any(jobs.get_job(job_id)["status"] != jobs.SUCCEEDED for job_id in job_ids):
+            assert time.monotonic() < deadline, [jobs.get_job(job_id) for job_id in job_ids]
+            time.sleep(0.02)
+    finally:
+        pool.stop()
+    classification_ids = {jobs.get_job(job_id)["classification_id"] for job_id in job_ids}
+    assert len(classification_ids) == 3 and None not in classification_ids
+
+
+def test_a_locked_database_on_save_is_retried(database_file, monkeypatch):
+    job_id = jobs.create_job("Phishing email exposed customer data")
+    pool = jobs.JobWorkerPool(workers=1, max_attempts=3)
+    save = database.save_classification_result
+    monkeypatch.setattr(database, "save_classification_result", lambda *_args: None)
+    pool._process(*jobs.claim_next_job(pool.worker_id))
+    job = jobs.get_job(job_id)
+    assert (job["status"], job["error"]) == (jobs.QUEUED, "classification could not be saved")
+
+    monkeypatch.setattr(database, "save_classification_result", save)
+    with get_connection(database_file) as conn:
+        conn.execute("UPDATE classification_jobs SET not_before = NULL WHERE id = ?", (job_id,))
+    pool._process(*jobs.claim_next_job(pool.worker_id))
+    job = jobs.get_job(job_id)
+    assert (job["status"], job["attempts"]) == (jobs.SUCCEEDED, 2)
+    assert database.get_classification(job["classification_id"]) is not None
@@ -0,0 +1,50 @@
+from conftest import make_classification
+from src.database import database
+from src.database.connection import get_connection
+
+
+def test_legacy_database_is_migrated_to_the_latest_version(legacy_database_file):
+    with get_connection(legacy_database_file) as conn:
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == len(database.SCHEMA_MIGRATIONS)
+        impacts = conn.execute("SELECT classification_id, impact_type FROM classification_impacts ORDER BY 1, 2").fetchall()
+        tags = conn.execute("SELECT classification_id, framework, tag FROM classification_framework_tags ORDER BY 1, 2, 3").fetchall()
+        controls = conn.execute("SELECT classification_id, position, recommendation FROM classification_controls ORDER BY 1, 2").fetchall()
+        job_columns = {row[1] for row in conn.execute("PRAGMA table_info(classification_jobs)")}
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    assert [tuple(row) for row in impacts] == [(1, "Financial"), (1, "Reputational")]
+    assert [tuple(row) for row in tags] == [
+        (1, "GDPR", "GDPR - Article 5: Integrity & Confidentiality"), (1, "Other", "Manual note"),
+    ]
+    assert [tuple(row) for row in controls] == [
+        (1, 0, "Upgrade all servers to TLS 1.2"), (1, 1, "2FA for every admin account."), (2, 0, "Monitor certificate expiry."),
+    ]
+    assert {"worker_id", "heartbeat_at", "not_before"} <= job_columns
+    assert {"ingested_files", "classifications_fts"} <= tables
+    assert database.get_classification(1)["impact_type"] == ["Financial", "Reputational"]
+
+
+def test_initialization_is_idempotent(legacy_database_file):
+    with get_connection(legacy_database_file) as conn:
+        before = [conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                  for table in ("classification_impacts", "classification_framework_tags", "classification_controls")]
+    database.initialize_database()
+    with get_connection(legacy_database_file) as conn:
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == len(database.SCHEMA_MIGRATIONS)
+        after = [conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                 for table in ("classification_impacts", "classification_framework_tags", "classification_controls")]
+    assert after == before
+
+
+def test_child_rows_follow_updates(database_file):
+    row_id = database.save_classification_result("Phishing", make_classification())
+    database.update_classification_result(row_id, make_classification(
+        impact_type=["Legal"], framework_tags=["SOX: SOX - Section 302, SOX - Section 404"],
+        control_recommendations=["Review access rights."],
+    ))
+    with get_connection(database_file) as conn:
+        impacts = conn.execute("SELECT impact_type FROM classification_impacts").fetchall()
+        tags = conn.execute("SELECT framework, tag FROM classification_framework_tags ORDER BY tag").fetchall()
+    assert [tuple(row) for row in impacts] == [("Legal",)]
+    assert [tuple(row) for row in tags] == [("SOX", "SOX - Section 302"), ("SOX", "SOX - Section 404")]
+    rows, _ = database.query_classifications(framework="SOX")
+    assert [row["id"] for row in rows] == [row_id]
@@ -0,0 +1,44 @@
+from conftest import make_classification
+from src.models import Categories, ClassificationRecord, impact_mask, impact_types
+
+
+def test_known_values_keep_their_declared_codes():
+    categories = Categories(["Low", "High"])
+    assert [categories.code("Low"), categories.code("High"), categories.code(None)] == [0, 1, -1]
+    assert categories.code("Custom") == 2
+    assert categories.value(2) == "Custom" and categories.value(-1) is None
+
+
+def test_unknown_values_overflow_once_the_cap_is_reached():
+    categories = Categories(["Low", "High"], max_size=5)
+    codes = [categories.code(f"value {number}") for number in range(100)]
+    assert codes[:2] == [2, 3]
+    assert set(codes[2:]) == {4}
+    assert categories.value(4) == "Other"
+    assert len(categories) == 5
+    assert categories.code("value 0") == 2 # earlier values keep round-tripping
+    assert categories.code("Other") == 4
+
+
+def test_impact_masks_stay_below_64_bits():
+    impacts = ["Financial", "Legal"] + [f"impact {number}" for number in range(200)]
+    mask = impact_mask(impacts)
+    assert mask.bit_length() <= 63
+    assert impact_types(mask)[:2] == ["Financial", "Legal"]
+    assert impact_types(impact_mask(["Reputational", "Financial"])) == ["Financial", "Reputational"]
+
+
+def test_record_round_trips_a_classification():
+    classification = make_classification(likelihood=None)
+    record = ClassificationRecord.from_model(classification, id=7)
+    assert record.to_model().model_dump() == classification.model_dump()
+
+
+def test_stored_recommendations_keep_their_leading_digits():
+    row = {"id": 1, "timestamp": "2024-01-01 00:00:00", "incident_description": "Admin account taken over",
+           "basel_ii_category": "External Fraud", "severity_score": 4, "root_cause": "No second factor",
+           "control_recommendations": "2FA for every admin account.\n\nUpgrade all servers to TLS 1.2",
+           "framework_tags": "[]", "inherent_risk": "High", "residual_risk": "Low", "likelihood": "Likely",
+           "impact_type": '["Financial"]'}
+    record = ClassificationRecord.from_row(row)
+    assert record.control_recommendations == ["2FA for every admin account.", "Upgrade all servers to TLS 1.2"]
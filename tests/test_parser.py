@@ -0,0 +1,79 @@
+import io
+import zipfile
+
+import pytest
+
+from src.data_parser import parser
+from src.data_parser.parser import extract_text, get_parser, parse_input, parse_uploaded_file, supported_extensions
+
+DOCX_DOCUMENT = (
+    '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"><w:body>'
+    '<w:p><w:r><w:t>Post-incident </w:t></w:r><w:r><w:t>report</w:t></w:r></w:p>'
+    '<w:p><w:r><w:t>Backup job failed for three nights.</w:t></w:r></w:p>'
+    '</w:body></w:document>'
+)
+
+
+@pytest.fixture
+def counted_extractions(monkeypatch):
+    calls = []
+    extract = parser._extract_text
+    monkeypatch.setattr(parser, "_extract_text", lambda *args: calls.append(args) or extract(*args))
+    return calls
+
+
+def test_parsers_are_found_by_extension_then_mime_type():
+    assert get_parser("REPORT.PDF").name == "pdf"
+    assert get_parser("notes", "text/markdown").name == "text"
+    assert get_parser("notes.bin") is None
+    assert {"txt", "pdf", "docx", "eml", "msg"} <= set(supported_extensions())
+
+
+def test_plain_text_is_extracted_once_per_content(tmp_path, counted_extractions):
+    first, second = tmp_path / "first.txt", tmp_path / "second.log"
+    first.write_text("  Teller drawer short by 200 on Friday.\n")
+    second.write_text("  Teller drawer short by 200 on Friday.\n")
+    assert extract_text(str(first)) == "Teller drawer short by 200 on Friday."
+    assert extract_text(str(second)) == "Teller drawer short by 200 on Friday."
+    assert len(counted_extractions) == 1
+    first.write_text("Teller drawer short by 300 on Friday.")
+    assert extract_text(str(first)) == "Teller drawer short by 300 on Friday."
+    assert len(counted_extractions) == 2
+
+
+def test_docx_paragraphs_are_extracted_in_the_process_pool(tmp_path):
+    path = tmp_path / "report.docx"
+    with zipfile.ZipFile(path, "w") as archive:
+        archive.writestr("word/document.xml", DOCX_DOCUMENT)
+    assert extract_text(str(path)) == "Post-incident report\nBackup job failed for three nights."
+
+
+def test_email_bodies_are_extracted_with_headers(tmp_path):
+    path = tmp_path / "alert.eml"
+    path.write_bytes(
+        b"Subject: Wire transfer sent twice\r\nFrom: ops@example.com\r\n"
+        b"Content-Type: text/html; charset=utf-8\r\n\r\n"
+        b"<html><style>p {color: red}</style><p>Duplicate payment of &pound;5,000.</p></html>\r\n"
+    )
+    text = extract_text(str(path))
+    assert text.startswith("Subject: Wire transfer sent twice\nFrom: ops@example.com")
+    assert "Duplicate payment of £5,000." in text and "color" not in text
+
+
+def test_uploads_are_parsed_from_a_temporary_copy(counted_extractions):
+    upload = io.BytesIO(b"Uploaded incident about a lost laptop.")
+    assert parse_uploaded_file("upload.txt", upload) == "Uploaded incident about a lost laptop."
+    temporary_path = counted_extractions[0][0]
+    assert temporary_path.endswith(".txt")
+    with pytest.raises(FileNotFoundError):
+        open(temporary_path)
+    with pytest.raises(ValueError):
+        parse_uploaded_file("upload.exe", io.BytesIO(b"MZ"))
+
+
+def test_parse_input_reports_file_errors(tmp_path):
+    assert parse_input("Freeform text", is_file=False) == "Freeform text"
+    assert parse_input(str(tmp_path / "missing.txt"), is_file=True).startswith("Error: File not found")
+    unsupported = tmp_path / "data.bin"
+    unsupported.write_bytes(b"\x00")
+    assert parse_input(str(unsupported), is_file=True).startswith("Error reading file")
@@ -0,0 +1,91 @@
+import json
+import threading
+
+from src.classification import classifier
+from src.classification.backends import Completion, FakeBackend, LLMBackend
+from src.classification.preprocessing import condense_incident, count_tokens, split_into_chunks, strip_boilerplate
+
+
+class FactsBackend(LLMBackend):
+    """Answers each extraction request with the first words of its excerpt."""
+
+    name = "facts"
+
+    def __init__(self, words: int = 10):
+        self.words = words
+        self.excerpts = []
+        self._lock = threading.Lock()
+
+        self.prompts = []
+
+    def complete(self, messages, model, response_format=None):
+        if "key_facts" not in messages[-1]["content"]:
+            self.prompts.append(messages[-1]["content"])
+            return Completion(FakeBackend.fake_response(messages[-1]["content"]), None)
+        excerpt = messages[-1]["content"].split(":\n", 1)[1]
+        with self._lock:
+            self.excerpts.append(excerpt)
+        return Completion(json.dumps({"key_facts": " ".join(excerpt.split()[:self.words])}), None)
+
+
+def report(paragraphs: int) -> str:
+    return "\n\n".join(
+        f"Paragraph {number}. The payment gateway rejected card transactions for {number} minutes. "
+        f"Engineers traced it to an expired certificate on node {number}."
+        for number in range(paragraphs)
+    )
+
+
+def test_text_within_the_budget_is_unchanged():
+    backend = FactsBackend()
+    text = "Short incident.\n\nNothing to condense."
+    assert condense_incident(text, backend, token_budget=100) == text
+    assert backend.excerpts == []
+
+
+def test_repeated_headers_and_footers_are_stripped():
+    pages = [f"ACME Bank - Confidential\nFinding {number} on page {number}.\nPage footer" for number in range(3)]
+    stripped = strip_boilerplate("\n\n\n\n".join(pages))
+    assert "Confidential" not in stripped and "footer" not in stripped
+    assert stripped == "Finding 0 on page 0.\n\nFinding 1 on page 1.\n\nFinding 2 on page 2."
+
+
+def test_chunks_respect_the_budget_and_overlap():
+    text = report(30)
+    chunks = split_into_chunks(text, chunk_tokens=120, overlap_tokens=40)
+    assert len(chunks) > 1
+    assert all(count_tokens(chunk) <= 120 for chunk in chunks)
+    for previous, chunk in zip(chunks, chunks[1:]):
+        assert chunk.split("\n\n")[0] in previous # Each chunk starts with the end of the previous one
+    assert "Paragraph 29." in chunks[-1]
+
+
+def test_oversized_words_are_split():
+    chunks = split_into_chunks(" ".join(["word"] * 500), chunk_tokens=50)
+    assert all(count_tokens(chunk) <= 50 for chunk in chunks)
+    assert sum(len(chunk.split()) for chunk in chunks) == 500
+
+
+def test_long_reports_are_condensed_into_key_facts(monkeypatch):
+    monkeypatch.setattr("src.config.config.settings.CHUNK_TOKENS", 200)
+    monkeypatch.setattr("src.config.config.settings.CHUNK_OVERLAP_TOKENS", 0)
+    backend = FactsBackend()
+    condensed = condense_incident(report(60), backend, token_budget=300)
+    assert count_tokens(condensed) <= 300
+    assert len(backend.excerpts) == len(split_into_chunks(strip_boilerplate(report(60)), 200))
+    assert condensed.startswith("Paragraph 0.")
+
+
+def test_ignored_instructions_fall_back_to_truncation():
+    condensed = condense_incident(report(60), FakeBackend(), token_budget=200)
+    assert 0 < count_tokens(condensed) <= 200
+
+
+def test_classifier_sends_the_condensed_text(monkeypatch):
+    backend = FactsBackend()
+    monkeypatch.setattr(classifier, "backend", backend)
+    monkeypatch.setattr(classifier.settings, "INCIDENT_TOKEN_BUDGET", 200)
+    text = report(61)
+    assert classifier.classify_incident(text).incident_description == text
+    [prompt] = backend.prompts
+    assert backend.excerpts and count_tokens(prompt) < count_tokens(text) // 2
@@ -0,0 +1,58 @@
+import json
+import re
+
+import pytest
+
+from src.classification import classifier
+from src.classification.backends import FakeBackend
+from src.classification.prompts import (FIELD_VOCABULARIES, LLM_FIELD_DESCRIPTIONS, PROMPT_TEMPLATES,
+                                        classification_json_schema, compact_whitespace, get_prompt_template)
+from src.classification.preprocessing import count_tokens
+from src.models import RiskClassification
+
+
+def test_schema_covers_the_llm_fields_in_model_order():
+    schema = classification_json_schema()
+    llm_fields = [name for name in RiskClassification.model_fields if name in LLM_FIELD_DESCRIPTIONS]
+    assert list(schema["properties"]) == llm_fields == schema["required"]
+    assert schema["additionalProperties"] is False
+    assert schema["properties"]["severity_score"] == {"type": "integer", "enum": [1, 2, 3, 4, 5], "description": "1=low, 5=high"}
+    assert schema["properties"]["impact_type"]["items"]["enum"] == FIELD_VOCABULARIES["impact_type"]
+    assert schema["properties"]["control_recommendations"]["type"] == "array"
+
+
+def test_fake_responses_satisfy_the_schema_vocabularies():
+    properties = classification_json_schema()["properties"]
+    response = json.loads(FakeBackend.fake_response("Trader exceeded the desk's limits for a week"))
+    assert list(response) == list(properties)
+    for name, values in FIELD_VOCABULARIES.items():
+        assert set(response[name] if isinstance(response[name], list) else [response[name]]) <= set(values)
+
+
+def test_versions_change_with_the_template_contents():
+    template = get_prompt_template("compact-v2")
+    assert re.fullmatch(r"compact-v2-[0-9a-f]{12}", template.version)
+    assert template.version == get_prompt_template("compact-v2").version
+    assert template._replace(system=template.system + " Be brief.").version != template.version
+    assert template._replace(compact=False).version != template.version
+    assert classifier.PROMPT_VERSION == get_prompt_template().version
+
+
+def test_incident_text_is_compacted_and_sent_last():
+    messages = PROMPT_TEMPLATES["compact-v2"].messages("  Vault   count\t short.\n\n\n\n  Reported  by branch.  ")
+    assert messages[-1] == {"role": "user", "content": "Vault count short.\n\nReported by branch."}
+    legacy = PROMPT_TEMPLATES["legacy-v1"].messages("  Vault   count short.")
+    assert legacy[-1]["content"].endswith("Incident:\n      Vault   count short.\n    ")
+    assert compact_whitespace(" a   b \r\n\r\n\r\n c ") == "a b\n\nc"
+
+
+def test_compact_prompt_is_smaller_than_the_legacy_prompt():
+    def prompt_tokens(template):
+        text = "".join(message["content"] for message in template.messages("Laptop stolen"))
+        return count_tokens(text + json.dumps(template.response_format or {}))
+    assert prompt_tokens(PROMPT_TEMPLATES["compact-v2"]) < prompt_tokens(PROMPT_TEMPLATES["legacy-v1"])
+
+
+def test_unknown_templates_are_rejected():
+    with pytest.raises(ValueError):
+        get_prompt_template("verbose-v3")
@@ -0,0 +1,67 @@
+from conftest import assert_rollups_match_rebuild, make_classification
+from src.database import database, rollups
+from src.database.connection import get_connection
+
+
+def test_rollups_follow_inserts(database_file):
+    database.save_classification_result("Phishing", make_classification())
+    database.bulk_insert_classifications([
+        {**make_classification(likelihood=likelihood, impact_type=["Legal"]).model_dump(), "timestamp": f"2024-0{month}-15 10:00:00"}
+        for month, likelihood in enumerate(["Rare", "Certain", None], start=1)
+    ])
+    assert_rollups_match_rebuild()
+    histogram = {row["severity_score"]: row["count"] for row in rollups.get_severity_histogram()}
+    assert histogram == {4: 4}
+
+
+def test_rollups_follow_updates(database_file):
+    row_id = database.save_classification_result("Phishing", make_classification())
+    database.save_classification_result("Outage", make_classification(basel_ii_category="Business Disruption and System Failures"))
+    database.update_classification_result(row_id, make_classification(
+        severity_score=2, likelihood="Rare", inherent_risk="Low", residual_risk="Low",
+        impact_type=["Operational"], framework_tags=["SOX: SOX - Section 404"],
+    ))
+    assert_rollups_match_rebuild()
+    transitions = {(row["inherent_risk"], row["residual_risk"]): row["count"] for row in rollups.get_risk_transitions()}
+    assert transitions == {("Low", "Low"): 1, ("High", "Medium"): 1}
+
+
+def test_rollups_follow_deletes(database_file):
+    first = database.save_classification_result("Phishing", make_classification())
+    database.save_classification_result("Fraud", make_classification(likelihood="Possible"))
+    with get_connection(database.DATABASE_FILE) as conn:
+        conn.execute("DELETE FROM classifications WHERE id = ?", (first,))
+        conn.commit()
+    with get_connection(database.DATABASE_FILE) as conn:
+        conn.execute("DELETE FROM classification_impacts WHERE impact_type = 'Financial'")
+        conn.commit()
+    assert_rollups_match_rebuild()
+    cells = {(cell["likelihood"], cell["impact_type"]): cell["count"] for cell in rollups.get_likelihood_impact_cells(samples_per_cell=0)}
+    assert cells == {("Possible", "Reputational"): 1}
+
+
+def test_rebuild_restores_edited_rollups(database_file):
+    database.save_classification_result("Phishing", make_classification())
+    with get_connection(database.DATABASE_FILE) as conn:
+        conn.execute("UPDATE rollup_severity SET count = 99")
+        conn.commit()
+    rollups.rebuild_rollups()
+    assert_rollups_match_rebuild()
+    assert rollups.get_severity_histogram() == [{"severity_score": 4, "count": 1}]
+
+
+def test_category_trend_groups_by_period(database_file):
+    database.bulk_insert_classifications([
+        {**make_classification().model_dump(), "timestamp": timestamp}
+        for timestamp in ("2024-01-03 09:00:00", "2024-01-28 09:00:00", "2024-02-01 09:00:00")
+    ])
+    trend = rollups.get_category_trend(start="2024-01-01", end="2024-03-01", granularity="month")
+    assert trend == [
+        {"period": "2024-01", "basel_ii_category": "External Fraud", "count": 2},
+        {"period": "2024-02", "basel_ii_category": "External Fraud", "count": 1},
+    ]
+
+
+def test_migration_fills_rollups_for_existing_rows(legacy_database_file):
+    assert_rollups_match_rebuild()
+    assert rollups.get_severity_histogram() == [{"severity_score": 3, "count": 1}, {"severity_score": 4, "count": 1}]
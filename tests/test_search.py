@@ -0,0 +1,46 @@
+from conftest import make_classification
+from src.database import database
+from src.database.connection import get_connection
+
+
+def test_fts_triggers_follow_inserts_and_deletes(database_file):
+    row_id = database.save_classification_result("Ransomware encrypted the file server", make_classification())
+    assert [result["id"] for result in database.search_classifications("ransomware")[0]] == [row_id]
+    highlights = database.search_classifications("ransomware")[0][0]["snippets"]["incident_description"]
+    start, end = highlights["highlights"][0]
+    assert highlights["text"][start:end].lower() == "ransomware"
+    with get_connection(database_file) as conn:
+        conn.execute("DELETE FROM classifications WHERE id = ?", (row_id,))
+        conn.commit()
+    assert database.search_classifications("ransomware") == ([], 0)
+
+
+def test_existing_rows_are_indexed_by_the_migration(legacy_database_file):
+    results, total = database.search_classifications("certificate")
+    assert total == 1 and results[0]["id"] == 2
+    assert set(results[0]["snippets"]) == {"root_cause", "control_recommendations"}
+
+    database.update_classification_result(2, make_classification(incident_description="Gateway outage", root_cause="Expired token"))
+    assert database.search_classifications("certificate") == ([], 0)
+    assert [result["id"] for result in database.search_classifications("token")[0]] == [2]
+
+
+def test_filters_and_phrases_narrow_the_matches(database_file):
+    fraud = database.save_classification_result("Phishing email stole card data", make_classification())
+    database.save_classification_result("Email phishing simulation passed", make_classification(severity_score=1))
+    assert {result["id"] for result in database.search_classifications("phishing")[0]} == {fraud, fraud + 1}
+    assert [result["id"] for result in database.search_classifications('"phishing email"')[0]] == [fraud]
+    assert [result["id"] for result in database.search_classifications("phishing", severity_score=[4])[0]] == [fraud]
+
+
+def test_search_pages_cut_from_one_ranking(database_file, monkeypatch):
+    monkeypatch.setattr(database, "SEARCH_RANK_WINDOW", 30)
+    for number in range(45):
+        database.save_classification_result(f"Phishing wave {number}" + " phishing" * (number % 3), make_classification())
+    pages = [database.search_classifications("phishing", limit=7, offset=offset) for offset in range(0, 35, 7)]
+    assert all(total == 30 for _, total in pages)
+    ids = [result["id"] for results, _ in pages for result in results]
+    assert len(ids) == len(set(ids)) == 30
+    assert set(ids) == set(range(16, 46)) # the newest matches
+    scores = [result["score"] for results, _ in pages for result in results]
+    assert scores == sorted(scores)
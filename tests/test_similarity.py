@@ -0,0 +1,110 @@
+import functools
+import random
+
+import numpy as np
+import pytest
+
+from conftest import make_classification
+from src.classification import classifier, similarity
+from src.classification.similarity import SimilarityIndex
+from src.database import database
+from src.frameworks.framework_router import classify_across_frameworks, format_framework_tags
+
+WORDS = ("phishing email payroll outage gateway certificate vendor fraud laptop stolen server flood "
+         "backup failed audit finding customer data leak branch cash shortfall trading error").split()
+
+
+def random_incidents(count: int, seed: int = 7, start: int = 1) -> list[tuple[int, str]]:
+    rng = random.Random(seed)
+    return [(row_id, " ".join(rng.choices(WORDS, k=8))) for row_id in range(start, start + count)]
+
+def similarities(index: SimilarityIndex, texts: list[str]) -> list[tuple[int, float]]:
+    return [index.find_similar(text) for text in texts]
+
+
+def test_identical_text_is_the_closest_match():
+    index = SimilarityIndex(dimensions=256)
+    index.build([(1, "Phishing email led to payroll fraud"), (2, "Payment gateway outage after a failed deployment")])
+    row_id, score = index.find_similar("phishing email led to payroll fraud")
+    assert row_id == 1 and score == pytest.approx(1.0, abs=1e-5)
+    assert index.find_similar("gateway outage")[0] == 2
+    assert index.find_similar("the and of") is None # no features
+
+
+def test_incremental_adds_match_a_full_build():
+    entries = random_incidents(200)
+    incremental = SimilarityIndex(dimensions=256)
+    incremental.build(entries[:10])
+    for row_id, text in entries[10:100]:
+        incremental.add(row_id, text)
+    incremental.add_many(entries[100:])
+    incremental._refit()
+    full = SimilarityIndex(dimensions=256)
+    full.build(entries)
+    queries = [text for _, text in random_incidents(20, seed=11)]
+    incremental_scores = [score for _, score in similarities(incremental, queries)]
+    assert incremental_scores == pytest.approx([score for _, score in similarities(full, queries)], abs=1e-4)
+    np.testing.assert_array_equal(incremental._document_frequency, full._document_frequency)
+
+
+def test_oldest_entries_are_evicted_with_their_document_frequencies():
+    index = SimilarityIndex(dimensions=256, max_entries=50)
+    index.build([])
+    entries = random_incidents(180)
+    for row_id, text in entries[:120]:
+        index.add(row_id, text)
+    index.add_many(entries[120:])
+    assert len(index) <= 50
+    assert set(index._ids[:len(index)]) == set(range(180 - len(index) + 1, 181))
+    rebuilt = SimilarityIndex(dimensions=256)
+    rebuilt.build(entries[-len(index):])
+    np.testing.assert_array_equal(index._document_frequency, rebuilt._document_frequency)
+
+
+def test_entries_recorded_while_loading_are_added_after_the_build():
+    index = SimilarityIndex(dimensions=256)
+    index.record([(1, "ignored before loading")])
+    index.begin_loading()
+    index.record([(2, "Vendor invoice fraud"), (3, "Server room flood")])
+    index.build([(1, "Laptop stolen from a car"), (2, "Vendor invoice fraud")]) # 2 was already loaded
+    assert sorted(index._ids[:len(index)]) == [1, 2, 3]
+    assert index.find_similar("server room flood")[0] == 3
+
+
+@pytest.fixture
+def shared_index(database_file, monkeypatch):
+    """A built shared index with near-duplicate reuse enabled at a 0.8 similarity threshold."""
+    index = SimilarityIndex(dimensions=1024)
+    index.build([])
+    monkeypatch.setattr(similarity, "similarity_index", index)
+    monkeypatch.setattr(classifier, "find_near_duplicate", functools.partial(similarity.find_near_duplicate, threshold=0.8))
+    return index
+
+
+def test_near_duplicates_reuse_the_prior_classification(shared_index):
+    recommendations = ["Upgrade all servers to TLS 1.2", "2FA for every admin account."]
+    prior_id = database.save_classification_result(
+        "Branch cash shortfall found during the quarterly vault count at the Leeds branch",
+        make_classification(basel_ii_category="Internal Fraud", severity_score=3, control_recommendations=recommendations,
+                            framework_tags=["SOX: SOX - Section 906"]),
+    )
+    assert shared_index.find_similar("cash shortfall vault count")[0] == prior_id
+    calls = classifier.backend.calls
+
+    text = "Branch cash shortfall found during the quarterly vault count at the Leeds branch office"
+    reused = classifier.request_classification(text)
+    assert classifier.backend.calls == calls # no LLM call
+    assert (reused.basel_ii_category, reused.severity_score) == ("Internal Fraud", 3)
+    assert reused.incident_description == text
+    assert reused.control_recommendations == recommendations
+    # Tags are mapped from the new incident, not copied from the prior row
+    assert reused.framework_tags == format_framework_tags(classify_across_frameworks(reused))
+    assert "SOX: SOX - Section 906" not in reused.framework_tags
+
+
+def test_unrelated_incidents_are_sent_to_the_llm(shared_index):
+    database.save_classification_result("Branch cash shortfall found during the vault count", make_classification())
+    calls = classifier.backend.calls
+    classification = classifier.request_classification("Ransomware encrypted the trading floor file shares overnight")
+    assert classifier.backend.calls == calls + 1
+    assert classification.incident_description == "Ransomware encrypted the trading floor file shares overnight"
@@ -0,0 +1,125 @@
+import threading
+import time
+
+import pytest
+
+from src.cache.singleflight import FlightCancelled, FlightTimeout, SingleFlight
+
+
+def start_followers(flights: SingleFlight, key: str, count: int, timeout=None) -> tuple[list, list[threading.Thread]]:
+    """Starts follower threads once the leader holds key; each appends its result or exception."""
+    outcomes = []
+    def follow():
+        try:
+            outcomes.append(flights.do(key, lambda: pytest.fail("a follower ran the function"), timeout=timeout))
+        except BaseException as e:
+            outcomes.append(e)
+    threads = [threading.Thread(target=follow) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    return outcomes, threads
+
+def wait_until(condition, message: str) -> None:
+    deadline = time.monotonic() + 5
+    while not condition():
+        if time.monotonic() > deadline:
+            pytest.fail(message)
+        time.sleep(0.001)
+
+def wait_for_followers(flights: SingleFlight, key: str, count: int) -> None:
+    flight = flights._flights[key]
+    wait_until(lambda: flight.followers >= count, "followers did not join the flight")
+
+
+def test_followers_share_the_leaders_result():
+    flights = SingleFlight()
+    release = threading.Event()
+    calls = []
+    def work():
+        calls.append(1)
+        release.wait(5)
+        return "classification"
+
+    leader = threading.Thread(target=lambda: calls.append(flights.do("key", work)))
+    leader.start()
+    wait_until(lambda: flights.in_flight() == 1, "the leader did not start")
+    outcomes, threads = start_followers(flights, "key", 3)
+    wait_for_followers(flights, "key", 3)
+    release.set()
+    for thread in threads + [leader]:
+        thread.join(5)
+
+    assert calls.count(1) == 1
+    assert ("classification", False) in calls
+    assert outcomes == [("classification", True)] * 3
+    assert flights.in_flight() == 0
+
+
+def test_leader_error_reaches_every_follower():
+    flights = SingleFlight()
+    flight, leader = flights.join("key")
+    assert leader
+    outcomes, threads = start_followers(flights, "key", 2)
+    wait_for_followers(flights, "key", 2)
+    error = ValueError("rate limited")
+    flights.finish("key", flight, error=error)
+    for thread in threads:
+        thread.join(5)
+    assert outcomes == [error, error]
+
+
+def test_follower_times_out_while_the_flight_keeps_running():
+    flights = SingleFlight()
+    flight, _ = flights.join("key")
+    with pytest.raises(FlightTimeout):
+        flights.do("key", lambda: "never called", timeout=0.01)
+    assert flights.in_flight() == 1
+    flights.finish("key", flight, result="late")
+    assert flight.wait(0) == "late"
+
+
+def test_interrupted_leader_cancels_followers():
+    flights = SingleFlight()
+    release = threading.Event()
+    def interrupted():
+        release.wait(5)
+        raise KeyboardInterrupt
+    leader_errors = []
+    def lead():
+        try:
+            flights.do("key", interrupted)
+        except BaseException as e:
+            leader_errors.append(e)
+
+    leader = threading.Thread(target=lead)
+    leader.start()
+    wait_until(lambda: flights.in_flight() == 1, "the leader did not start")
+    outcomes, threads = start_followers(flights, "key", 2)
+    wait_for_followers(flights, "key", 2)
+    release.set()
+    for thread in threads + [leader]:
+        thread.join(5)
+
+    assert isinstance(leader_errors[0], KeyboardInterrupt)
+    assert len(outcomes) == 2 and all(isinstance(outcome, FlightCancelled) for outcome in outcomes)
+
+
+def test_key_is_forgotten_after_each_call():
+    flights = SingleFlight()
+    assert flights.do("key", lambda: 1) == (1, False)
+    assert flights.do("key", lambda: 2) == (2, False)
+    with pytest.raises(RuntimeError):
+        flights.do("key", lambda: (_ for _ in ()).throw(RuntimeError("boom")))
+    assert flights.in_flight() == 0
+    assert flights.do("key", lambda: 3) == (3, False)
+
+
+def test_stale_finish_does_not_drop_a_newer_flight():
+    flights = SingleFlight()
+    first, _ = flights.join("key")
+    flights.finish("key", first, result=1)
+    second, leader = flights.join("key")
+    flights.finish("key", first, result=1)
+    assert leader and flights.in_flight() == 1
+    flights.finish("key", second, result=2)
+    assert flights.in_flight() == 0
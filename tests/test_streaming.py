@@ -0,0 +1,66 @@
+import json
+
+import pytest
+
+from src.classification.streaming import IncrementalJSONObjectParser
+
+DOCUMENT = json.dumps({
+    "basel_ii_category": "External Fraud",
+    "severity_score": 4,
+    "root_cause": None,
+    "control_recommendations": ["Rotate \"shared\" keys: now.", "Review {access} lists, weekly."],
+    "likelihood": "Likely",
+    "mitigated": False,
+    "impact": {"type": ["Financial"], "score": 12.5},
+}, indent=1)
+
+
+def feed_in_chunks(text: str, size: int) -> tuple[IncrementalJSONObjectParser, list[dict]]:
+    parser = IncrementalJSONObjectParser()
+    updates = [parser.feed(text[start:start + size]) for start in range(0, len(text), size)]
+    return parser, updates
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 64, len(DOCUMENT)])
+def test_any_chunking_yields_the_whole_object(size):
+    parser, updates = feed_in_chunks(DOCUMENT, size)
+    assert parser.finished
+    assert parser.fields == json.loads(DOCUMENT)
+    reported = [key for update in updates for key in update]
+    assert reported == list(json.loads(DOCUMENT)) # every member reported once, in order
+
+
+def test_members_are_reported_as_soon_as_they_complete():
+    parser = IncrementalJSONObjectParser()
+    assert parser.feed('{"basel_ii_category": "Internal Fr') == {}
+    assert parser.feed('aud", "severity') == {"basel_ii_category": "Internal Fraud"}
+    assert parser.feed('_score"') == {}
+    assert parser.feed(': ') == {}
+    assert parser.feed('[1, 2') == {}
+    assert parser.feed(']') == {"severity_score": [1, 2]}
+    assert not parser.finished
+
+
+def test_numbers_and_literals_wait_for_a_delimiter():
+    parser = IncrementalJSONObjectParser()
+    assert parser.feed('{"severity_score": 4') == {}
+    assert parser.feed('5') == {}
+    assert parser.feed(',"mitigated": tru') == {"severity_score": 45}
+    assert parser.feed('e') == {}
+    assert parser.feed('}') == {"mitigated": True}
+    assert parser.finished
+
+
+def test_text_after_the_object_is_ignored():
+    parser = IncrementalJSONObjectParser()
+    assert parser.feed('{"a": "b"} trailing') == {"a": "b"}
+    assert parser.finished
+    assert parser.feed('{"c": 1}') == {}
+
+
+@pytest.mark.parametrize("text", ['["not", "an", "object"]', "Sure! {", '{4: "x"}', '{"a" "b": 1}'])
+def test_invalid_documents_raise(text):
+    parser = IncrementalJSONObjectParser()
+    with pytest.raises(ValueError):
+        for char in text:
+            parser.feed(char)